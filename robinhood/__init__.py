@@ -1,11 +1,21 @@
-import six
+# The submodules are imported on first use, `import robinhood` itself stays cheap
+# (ie: for the client of `robinhood.daemon`, which does not need requests or pandas).
+import importlib
 
-if six.PY3:
-    from .trader import Trader
-else:
-    from .trader import Trader
+_submodules = ('endpoints', 'crypto_endpoints', 'common')
 
-from . import endpoints
-from . import crypto_endpoints
-from . import common
-from .common.ticker import *
\ No newline at end of file
+
+def __getattr__(name):
+    if name == 'Trader':
+        from .trader import Trader
+        return Trader
+    if name == 'Ticker':
+        from .common.ticker import Ticker
+        return Ticker
+    if name in _submodules:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + ['Trader', 'Ticker'] + list(_submodules))
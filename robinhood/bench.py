@@ -0,0 +1,237 @@
+"""
+Benchmarks of the client hot paths, run against an in-process stub of the api (no network):
+an `InMemoryTransport` answered by a `robinhood.simulator.Simulator`, responses are encoded
+to bytes so that the client's decoding is measured.
+
+    python -m robinhood.bench --output bench.json
+    python -m robinhood.bench --output new.json --compare bench.json
+    python -m robinhood.bench --quick --output smoke.json
+
+Results are written as json so that runs of different versions can be compared.
+"""
+
+import json
+import platform
+import subprocess
+import sys
+import time
+import timeit
+
+
+# a `robinhood.cassette` fixture replayed by the benchmarks (the simulator answers what it lacks)
+cassette_path = None
+
+
+def _stub_trader(canned=None):
+	from .trader import Trader
+	from .transport import InMemoryTransport
+	transport = InMemoryTransport(responses=canned)
+	if cassette_path:
+		from .cassette import Cassette
+		transport = Cassette(cassette_path, transport=transport)
+	trader = Trader(api_url='http://bench.local', transport=transport)
+	trader.login('bench', 'bench')
+	return trader
+
+
+def _percentiles(samples):
+	samples = sorted(samples)
+
+	def at(p):
+		return samples[min(int(p * len(samples)), len(samples) - 1)]
+
+	return {
+		'mean_us': sum(samples) / len(samples) * 1e6,
+		'p50_us': at(0.50) * 1e6,
+		'p90_us': at(0.90) * 1e6,
+		'p99_us': at(0.99) * 1e6,
+	}
+
+
+def bench_place_order(n=500):
+	trader = _stub_trader()
+	transport = trader.transport
+	samples = []
+	requests = transport.requests
+	for i in range(n):
+		start = time.perf_counter()
+		trader.buy('AAPL', 1, price=100.0 + i % 10)
+		samples.append(time.perf_counter() - start)
+
+	result = _percentiles(samples)
+	result['round_trips_per_order'] = (transport.requests - requests) / n
+
+	samples = []
+	requests = transport.requests
+	for i in range(n):
+		start = time.perf_counter()
+		trader.buy('AAPL', 1)
+		samples.append(time.perf_counter() - start)
+	market = _percentiles(samples)
+	market['round_trips_per_order'] = (transport.requests - requests) / n
+	return {'limit': result, 'market': market}
+
+
+def bench_quotes(n=2000, batch=50):
+	from .simulator import default_symbols
+	trader = _stub_trader()
+	start = time.perf_counter()
+	for i in range(n):
+		trader.quote(default_symbols[i % len(default_symbols)])
+	single = n / (time.perf_counter() - start)
+
+	symbols = [default_symbols[i % len(default_symbols)] for i in range(batch)]
+	rounds = max(n // batch, 1)
+	start = time.perf_counter()
+	for _ in range(rounds):
+		trader.quotes(symbols)
+	batched = rounds * batch / (time.perf_counter() - start)
+	return {'single_quotes_per_s': single, 'batched_quotes_per_s': batched, 'batch_size': batch}
+
+
+def bench_historical_quotes(row_counts=(100, 1000, 10000), repeat=5):
+	from .simulator import Simulator
+	simulator = Simulator()
+	results = {}
+	for rows in row_counts:
+		# a fixed response with exactly `rows` bars
+		seconds = rows * 300
+		stop = 1600000000
+		url = f'http://bench.local/marketdata/historicals/AAPL/?interval=5minute&span=all&start=' \
+			  + time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(stop - seconds)) \
+			  + '&end=' + time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(stop))
+		_, payload, _ = simulator.handle('GET', url)
+		trader = _stub_trader(canned={'/marketdata/historicals/': json.dumps(payload).encode()})
+
+		samples = []
+		for _ in range(repeat):
+			start = time.perf_counter()
+			trader.historical_quotes('AAPL', interval='5minute', span='week')
+			samples.append(time.perf_counter() - start)
+		results[str(len(payload['historicals']))] = {'best_ms': min(samples) * 1e3, 'mean_ms': sum(samples) / repeat * 1e3}
+	return results
+
+
+def bench_objects(n=20000):
+	from .quote import Quote, CryptoQuote
+	from .order import Order
+	from .simulator import Simulator
+	simulator = Simulator()
+	_, quotes, _ = simulator.handle('GET', 'http://bench.local/quotes/?symbols=AAPL')
+	quote_json = quotes['results'][0]
+	crypto_json = simulator._crypto_quote_json(simulator.crypto_pairs['BTC'])
+	_, order_json, _ = simulator.handle('POST', 'http://bench.local/orders/', {
+		'instrument': quote_json['instrument'], 'symbol': 'AAPL', 'quantity': 1, 'side': 'buy', 'type': 'limit', 'price': '100.00'})
+
+	quote = Quote(dict(quote_json))
+	order = Order(None, dict(order_json))
+
+	def per_call(statement):
+		return min(timeit.repeat(statement, number=n, repeat=3)) / n * 1e9
+
+	return {
+		'quote_construct_ns': per_call(lambda: Quote(dict(quote_json))),
+		'crypto_quote_construct_ns': per_call(lambda: CryptoQuote(dict(crypto_json))),
+		'order_construct_ns': per_call(lambda: Order(None, dict(order_json))),
+		'quote_properties_ns': per_call(lambda: (quote.ask, quote.bid, quote.mark, quote.time)),
+		'order_properties_ns': per_call(lambda: (order.price, order.side, order.quantity, order.time)),
+	}
+
+
+def bench_import(repeat=5):
+	code = ("import time, resource; start = time.perf_counter(); from robinhood import Trader; "
+			"print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)")
+	samples, rss = [], []
+	for _ in range(repeat):
+		out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+							 cwd=_package_root()).stdout.split()
+		samples.append(float(out[0]))
+		rss.append(int(out[1]))
+	# ru_maxrss is in kilobytes on linux, bytes on macos
+	rss_mb = min(rss) / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+	return {'import_best_ms': min(samples) * 1e3, 'import_mean_ms': sum(samples) / repeat * 1e3, 'peak_rss_mb': rss_mb}
+
+
+def _package_root():
+	import os
+	return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+benchmarks = {
+	'place_order': bench_place_order,
+	'quotes': bench_quotes,
+	'historical_quotes': bench_historical_quotes,
+	'objects': bench_objects,
+	'import': bench_import,
+}
+
+# tiny sizes for a smoke run (--quick): the numbers are noise, only the code paths are exercised
+quick_args = {
+	'place_order': {'n': 5},
+	'quotes': {'n': 10, 'batch': 5},
+	'historical_quotes': {'row_counts': (10,), 'repeat': 1},
+	'objects': {'n': 10},
+	'import': {'repeat': 1},
+}
+
+
+def run(names=None, quick=False):
+	results = {}
+	for name in names or benchmarks:
+		results[name] = benchmarks[name](**(quick_args[name] if quick else {}))
+	return {
+		'python': platform.python_version(),
+		'platform': platform.platform(),
+		'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+		'quick': quick,
+		'results': results,
+	}
+
+
+def _flatten(results, prefix=''):
+	for key, value in results.items():
+		if isinstance(value, dict):
+			yield from _flatten(value, f'{prefix}{key}.')
+		else:
+			yield f'{prefix}{key}', value
+
+
+def compare(new, old):
+	"""Returns {metric: (old, new, new/old)} for the metrics present in both runs"""
+	old_values = dict(_flatten(old['results']))
+	return {key: (old_values[key], value, value / old_values[key] if old_values[key] else None)
+			for key, value in _flatten(new['results']) if key in old_values}
+
+
+def main(argv=None):
+	import argparse
+	parser = argparse.ArgumentParser(description="Benchmarks of the robinhood client hot paths")
+	parser.add_argument('--output', default='bench.json', help='json file the results are written to')
+	parser.add_argument('--compare', help='a previous results file to compare against')
+	parser.add_argument('--quick', action='store_true', help='tiny sizes, a smoke run of every code path')
+	parser.add_argument('--cassette', help='a recorded fixture (robinhood.cassette) served before the simulator')
+	parser.add_argument('benchmarks', nargs='*', help='subset to run: ' + ', '.join(benchmarks))
+	args = parser.parse_args(argv)
+	for name in args.benchmarks:
+		if name not in benchmarks:
+			parser.error(f'unknown benchmark {name}')
+
+	global cassette_path
+	cassette_path = args.cassette
+	results = run(args.benchmarks, quick=args.quick)
+	with open(args.output, 'w') as file:
+		json.dump(results, file, indent=2)
+
+	for key, value in _flatten(results['results']):
+		print(f'{key:<50} {value:>14.2f}')
+
+	if args.compare:
+		with open(args.compare) as file:
+			old = json.load(file)
+		print(f'\n{"metric":<50} {"old":>14} {"new":>14} {"new/old":>8}')
+		for key, (old_value, new_value, ratio) in compare(results, old).items():
+			print(f'{key:<50} {old_value:>14.2f} {new_value:>14.2f} {ratio or 0:>8.2f}')
+
+
+if __name__ == '__main__':
+	main()
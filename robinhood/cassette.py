@@ -0,0 +1,202 @@
+"""
+Record/replay of the api exchanges at the transport boundary (every login, `_req_get` and `_req_post`).
+
+Recording forwards the requests to a real transport and keeps the responses. Replaying serves them
+from memory, deterministically and without a network: a request is matched on its method, host,
+path and normalized query (parameters sorted by name, values kept as is: the batch endpoints answer
+in the order of their comma-separated lists), repeated requests get the recorded responses in order
+(the last one once they run out).
+
+    # once, against the live api or a robinhood.simulator
+    with Cassette('fixtures/session.jsonl', mode='record', transport=RequestsTransport()) as cassette:
+        trader = Trader(transport=cassette)
+        ...
+
+    # tests/benchmarks, offline
+    trader = Trader(transport=Cassette('fixtures/session.jsonl'))
+
+The fixtures are json lines (gzip compressed for a .gz path), one exchange per line. Request bodies
+and headers are never written; the values of the `redact` keys found in the responses (tokens,
+account numbers, ...) are replaced by 'REDACTED' everywhere in the file, urls included.
+"""
+
+from six.moves.urllib.parse import urlsplit, parse_qsl
+from .transport import Transport, Response
+from .detail import codec
+import gzip
+import json
+import os
+import threading
+
+default_redact = ('access_token', 'refresh_token', 'mfa_code', 'device_token', 'account_number', 'rhs_account_number',
+				  'username', 'email', 'password', 'first_name', 'last_name', 'tax_id_ssn', 'ssn', 'phone_number')
+
+_redacted = 'REDACTED'
+_login_path = '/oauth2/token'
+
+
+class CassetteMiss(Exception):
+	"""A replayed request that is not in the fixture"""
+
+
+def _key(method, url, ignore_query=()):
+	parts = urlsplit(url)
+	query = tuple(sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+						 if name not in ignore_query))
+	return method, parts.netloc.lower(), parts.path.rstrip('/'), query
+
+
+def _redact(value, keys, secrets):
+	"""Replaces the values of `keys` (collecting them in `secrets`)"""
+	if isinstance(value, dict):
+		result = {}
+		for key, item in value.items():
+			if key in keys and isinstance(item, (str, int)) and item not in ('', None):
+				secrets.add(str(item))
+				result[key] = _redacted
+			else:
+				result[key] = _redact(item, keys, secrets)
+		return result
+	if isinstance(value, list):
+		return [_redact(item, keys, secrets) for item in value]
+	return value
+
+
+class Cassette(Transport):
+	"""
+	Args:
+		path: the fixture file (.jsonl, .jsonl.gz)
+		mode: 'replay', 'record', or 'once' (replay if the fixture exists, record otherwise)
+		transport: the transport recorded, when replaying it answers the requests missing from the
+			fixture (ie: an InMemoryTransport), without one those raise CassetteMiss. It also answers
+			the logins then, so that it accepts the token of the requests it answers.
+		redact: the response keys whose values are redacted
+		ignore_query: query parameters left out of the matching (ie: time ranges computed from now)
+	"""
+
+	def __init__(self, path, mode='replay', transport=None, redact=default_redact, ignore_query=()):
+		if mode == 'once':
+			mode = 'replay' if os.path.exists(path) else 'record'
+		assert (mode in ['replay', 'record'])
+		if mode == 'record' and transport is None:
+			raise Exception("Recording requires the `transport` recorded")
+		self.path = path
+		self.mode = mode
+		self.transport = transport
+		self.redact = set(redact)
+		self.ignore_query = set(ignore_query)
+		self.exchanges = []   # recorded: (method, url, status, body)
+		self.requests = 0
+		self.misses = 0
+		self._headers = {}
+		self._responses = {}  # {key: [(status, content bytes)]}
+		self._served = {}     # {key: responses served}
+		self._lock = threading.Lock()
+		if mode == 'replay':
+			self.load()
+
+	@property
+	def headers(self):
+		return self.transport.headers if self.transport is not None else self._headers
+
+	@headers.setter
+	def headers(self, headers):
+		if self.transport is not None:
+			self.transport.headers = headers
+		else:
+			self._headers = headers
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	###########################################################################
+	#                               FIXTURES
+	###########################################################################
+
+	def _open(self, mode):
+		if self.path.endswith('.gz'):
+			return gzip.open(self.path, mode + 't', encoding='utf-8')
+		return open(self.path, mode, encoding='utf-8')
+
+	def load(self):
+		with self._open('r') as file:
+			for line in file:
+				if line.strip():
+					exchange = json.loads(line)
+					key = _key(exchange['method'], exchange['url'], self.ignore_query)
+					content = codec.dumps(exchange['body']) if 'body' in exchange else exchange.get('text', '').encode()
+					self._responses.setdefault(key, []).append((exchange['status'], content))
+
+	def save(self):
+		"""Writes the recorded exchanges, redacted"""
+		secrets = set()
+		lines = []
+		for method, url, status, body in self.exchanges:
+			exchange = {'method': method, 'url': url, 'status': status}
+			if isinstance(body, (dict, list)):
+				exchange['body'] = _redact(body, self.redact, secrets)
+			else:
+				exchange['text'] = body
+			lines.append(json.dumps(exchange, separators=(',', ':')))
+
+		# the secrets also appear in urls (ie: account numbers), short values would match too much
+		secrets = sorted((secret for secret in secrets if len(secret) >= 6), key=len, reverse=True)
+		directory = os.path.dirname(os.path.abspath(self.path))
+		os.makedirs(directory, exist_ok=True)
+		with self._open('w') as file:
+			for line in lines:
+				for secret in secrets:
+					line = line.replace(secret, _redacted)
+				file.write(line + '\n')
+
+	def close(self):
+		if self.mode == 'record':
+			self.save()
+		if self.transport is not None:
+			self.transport.close()
+
+	###########################################################################
+	#                               REQUESTS
+	###########################################################################
+
+	def _request(self, method, url, data=None, timeout=None, **kwargs):
+		self.requests += 1
+		if self.mode == 'record':
+			forward = self.transport.get if method == 'GET' else self.transport.post
+			res = forward(url, timeout=timeout, **kwargs) if method == 'GET' else \
+				forward(url, data=data, timeout=timeout, **kwargs)
+			try:
+				body = codec.loads(res.content)
+			except ValueError:
+				body = res.content.decode(errors='replace')
+			with self._lock:
+				self.exchanges.append((method, url, res.status_code, body))
+			return res
+
+		key = _key(method, url, self.ignore_query)
+		with self._lock:
+			responses = self._responses.get(key) if self.transport is None or key[2] != _login_path else None
+			if responses:
+				served = self._served.get(key, 0)
+				self._served[key] = served + 1
+				status, content = responses[min(served, len(responses) - 1)]
+				return Response(status, content, url)
+			if key[2] != _login_path:
+				self.misses += 1
+		if self.transport is None:
+			raise CassetteMiss(f"No recorded response for {method} {url}")
+		forward = self.transport.get if method == 'GET' else self.transport.post
+		return forward(url, timeout=timeout, **kwargs) if method == 'GET' else \
+			forward(url, data=data, timeout=timeout, **kwargs)
+
+	def get(self, url, timeout=None, **kwargs):
+		return self._request('GET', url, timeout=timeout, **kwargs)
+
+	def post(self, url, data=None, timeout=None, **kwargs):
+		return self._request('POST', url, data, timeout=timeout, **kwargs)
+
+	def stats(self):
+		return {'cassette': {'connections': 0, 'requests': self.requests, 'misses': self.misses, 'idle': 0}}
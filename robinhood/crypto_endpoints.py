@@ -22,6 +22,15 @@ crypto_pairs = {
 }
 
 
+def _pair_id(symbol):
+	"""accepts a symbol of the seed table or a currency-pair id"""
+	return crypto_pairs.get(symbol.upper(), symbol)
+
+
+def currency_pairs():
+	return crypto_base_url + 'currency_pairs/'
+
+
 def orders():
 	return crypto_base_url + 'orders/'
 
@@ -36,12 +45,20 @@ def cancel_order(order_id):
 
 
 def quotes(symbol):
-	crypto_id = crypto_pairs[symbol.upper()]
+	crypto_id = _pair_id(symbol)
 	return f'https://api.robinhood.com/marketdata/forex/quotes/{crypto_id}/'
 
 
+def quotes_many(pair_ids):
+	return 'https://api.robinhood.com/marketdata/forex/quotes/?ids=' + ','.join(pair_ids)
+
+
+def holdings():
+	return crypto_base_url + 'holdings/'
+
+
 def historical_quotes(symbol,**kwargs):
-	crypto_id = crypto_pairs[symbol.upper()]
+	crypto_id = _pair_id(symbol)
 	url = f'https://api.robinhood.com/marketdata/forex/historicals/{crypto_id}/'
 	url += _make_query_string(kwargs)
 	return url
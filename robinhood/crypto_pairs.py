@@ -0,0 +1,235 @@
+from . import crypto_endpoints
+from .detail.const_dict import ConstDict
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class CurrencyPair(ConstDict):
+	"""
+	Example json:
+	{
+		'asset_currency': {'code': 'BTC', 'id': '...', 'increment': '0.000000010000000000', 'name': 'Bitcoin', 'type': 'cryptocurrency'},
+		'display_only': False,
+		'id': '3d961844-d360-45fc-989b-f6fca761d511',
+		'max_order_size': '20.0000000000000000',
+		'min_order_size': '0.000001000000000000',
+		'min_order_price_increment': '0.010000000000000000',
+		'min_order_quantity_increment': '0.000000010000000000',
+		'name': 'Bitcoin to US Dollar',
+		'quote_currency': {'code': 'USD', 'id': '...', 'increment': '0.010000000000000000', 'name': 'US Dollar', 'type': 'fiat'},
+		'symbol': 'BTC-USD',
+		'tradability': 'tradable'
+	}
+	"""
+
+	@property
+	def id(self) -> str:
+		return self._dict['id']
+
+	@property
+	def symbol(self) -> str:
+		"""the asset code, ie: 'BTC'"""
+		return self._dict['asset_currency']['code']
+
+	@property
+	def pair_symbol(self) -> str:
+		"""ie: 'BTC-USD'"""
+		return self._dict['symbol']
+
+	@property
+	def quote_currency(self) -> str:
+		return self._dict['quote_currency']['code']
+
+	@property
+	def tradable(self) -> bool:
+		return self._dict.get('tradability', 'tradable') == 'tradable'
+
+	def _decimal(self, key):
+		value = self._dict.get(key)
+		return Decimal(value) if value else None
+
+	@property
+	def min_order_size(self) -> Decimal:
+		return self._decimal('min_order_size')
+
+	@property
+	def max_order_size(self) -> Decimal:
+		return self._decimal('max_order_size')
+
+	@property
+	def price_increment(self) -> Decimal:
+		return self._decimal('min_order_price_increment')
+
+	@property
+	def quantity_increment(self) -> Decimal:
+		return self._decimal('min_order_quantity_increment')
+
+	@property
+	def has_metadata(self) -> bool:
+		return self.quantity_increment is not None
+
+	def round_quantity(self, quantity) -> str:
+		"""Rounds the quantity down to the pair's quantity increment and checks the order size limits"""
+		increment = self.quantity_increment
+		quantity = Decimal(str(quantity))
+		if increment:
+			quantity = quantity.quantize(increment.normalize(), rounding=ROUND_DOWN)
+
+		if self.min_order_size and quantity < self.min_order_size:
+			raise Exception(f"Quantity {quantity} is below the minimum order size "
+							f"{self.min_order_size.normalize()} of {self.pair_symbol}")
+		if self.max_order_size and quantity > self.max_order_size:
+			raise Exception(f"Quantity {quantity} is above the maximum order size "
+							f"{self.max_order_size.normalize()} of {self.pair_symbol}")
+		return format(quantity, 'f')
+
+	def round_price(self, price) -> str:
+		"""Rounds the price to the pair's price increment"""
+		increment = self.price_increment or Decimal('0.01')
+		return format(Decimal(str(price)).quantize(increment.normalize(), rounding=ROUND_HALF_UP), 'f')
+
+
+def _seed_pairs():
+	"""CurrencyPairs (without metadata) built from the hard-coded `crypto_endpoints.crypto_pairs` table"""
+	return [{
+		'id': pair_id,
+		'symbol': symbol + '-USD',
+		'asset_currency': {'code': symbol},
+		'quote_currency': {'code': 'USD'}
+	} for symbol, pair_id in crypto_endpoints.crypto_pairs.items()]
+
+
+def _user_cache_dir():
+	"""A per-user directory rather than the shared temp dir: the pair ids read back from it route orders"""
+	base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+	return os.path.join(base, 'robinhood')
+
+
+class CurrencyPairs:
+	"""
+	Lazily discovered index of the nummus currency-pairs.
+
+	The hard-coded table is used as a warm-start seed, the first lookup loads the pairs from
+	the on-disk cache (if younger than `ttl` seconds) or from the currency-pairs endpoint.
+	Pairs are indexed by symbol ('BTC', 'BTC-USD', 'BTCUSD'), by pair id and by quote currency.
+	"""
+
+	default_cache_path = os.path.join(_user_cache_dir(), 'currency_pairs.json')
+	retry_seconds = 60
+
+	def __init__(self, trader, ttl=24 * 60 * 60, cache_path=default_cache_path):
+		self.trader = trader
+		self.ttl = ttl
+		self.cache_path = cache_path
+		self._lock = threading.RLock()
+		self._loaded_at = None
+		self._index(_seed_pairs())
+
+	def __getstate__(self):
+		state = self.__dict__.copy()
+		del state['_lock']
+		return state
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self._lock = threading.RLock()
+
+	def _index(self, pairs):
+		pairs = [CurrencyPair(pair) for pair in pairs]
+		by_symbol = {}
+		by_quote_currency = {}
+		for pair in pairs:
+			by_quote_currency.setdefault(pair.quote_currency, []).append(pair)
+			by_symbol[pair.pair_symbol] = pair
+			by_symbol[pair.pair_symbol.replace('-', '')] = pair
+			# a bare asset code prefers its USD pair
+			if pair.quote_currency == 'USD' or pair.symbol not in by_symbol:
+				by_symbol[pair.symbol] = pair
+
+		self._pairs = pairs
+		self._by_symbol = by_symbol
+		self._by_id = {pair.id: pair for pair in pairs}
+		self._by_quote_currency = by_quote_currency
+
+	def _stale(self):
+		return self._loaded_at is None or time.time() - self._loaded_at > self.ttl
+
+	def _read_cache(self):
+		try:
+			with open(self.cache_path) as file:
+				cache = json.load(file)
+		except (OSError, ValueError):
+			return None
+		if not isinstance(cache, dict) or not isinstance(cache.get('time'), (int, float)) \
+				or not isinstance(cache.get('pairs'), list) or time.time() - cache['time'] > self.ttl:
+			return None
+		return cache
+
+	def _write_cache(self, pairs, loaded_at):
+		directory = os.path.dirname(os.path.abspath(self.cache_path))
+		try:
+			os.makedirs(directory, mode=0o700, exist_ok=True)
+			fd, tmp_path = tempfile.mkstemp(dir=directory)
+			with os.fdopen(fd, 'w') as file:
+				json.dump({'time': loaded_at, 'pairs': pairs}, file)
+			os.replace(tmp_path, self.cache_path)
+		except OSError:
+			pass  # the disk cache is only an optimization
+
+	def load(self, force=False):
+		"""(Re)loads the currency pairs from the disk cache or the currency-pairs endpoint"""
+		with self._lock:
+			if not force and not self._stale():
+				return
+
+			cache = None if force else self._read_cache()
+			if cache:
+				self._index(cache['pairs'])
+				self._loaded_at = cache['time']
+				return
+
+			try:
+				pairs = list(self.trader._paginate(crypto_endpoints.currency_pairs()))
+			except Exception:
+				# keep serving the current table, retry in a little while
+				self._loaded_at = time.time() - self.ttl + self.retry_seconds
+				return
+
+			self._loaded_at = time.time()
+			self._index(pairs)
+			self._write_cache(pairs, self._loaded_at)
+
+	def get(self, symbol) -> CurrencyPair:
+		"""Returns the CurrencyPair of a symbol ('BTC', 'BTC-USD') or pair id, None if unknown"""
+		self.load()
+		key = symbol.upper()
+		return self._by_symbol.get(key) or self._by_id.get(symbol)
+
+	def __getitem__(self, symbol) -> CurrencyPair:
+		pair = self.get(symbol)
+		if pair is None:
+			raise KeyError(f"Unknown crypto currency pair: {symbol}")
+		return pair
+
+	def __contains__(self, symbol):
+		return self.get(symbol) is not None
+
+	def __iter__(self):
+		self.load()
+		return iter(self._pairs)
+
+	def __len__(self):
+		self.load()
+		return len(self._pairs)
+
+	def by_id(self, pair_id) -> CurrencyPair:
+		self.load()
+		return self._by_id[pair_id]
+
+	def by_quote_currency(self, code) -> list:
+		self.load()
+		return list(self._by_quote_currency.get(code.upper(), []))
@@ -1,15 +1,20 @@
 from . import crypto_endpoints
-from .crypto_endpoints import crypto_pairs as _crypto_pairs
-from .order import CryptoOrder
+from .crypto_pairs import CurrencyPairs
+from .order import CryptoOrder, OrderCollection
+from .tracing import OrderTrace
 from .quote import CryptoQuote, HistoricalQuote
+from .detail.common import _chunks
+from .quote_cache import QuoteCache
+from .market_calendar import ALWAYS_OPEN
 import uuid
-from json import dumps
-import pandas as pd
+from .detail import codec
 
 class CryptoTrader:
 
 	def __init__(self, trader):
 		self.trader = trader
+		self.pairs = CurrencyPairs(trader)
+		self.quote_cache = QuoteCache(self._fetch_quote)
 
 	@property
 	def _req_post(self):
@@ -23,24 +28,63 @@ class CryptoTrader:
 	def _fprice(self):
 		return self.trader._fprice
 
-	def quote(self, symbol):
-		json = self._req_get(crypto_endpoints.quotes(symbol))
+	@property
+	def calendar(self):
+		"""Crypto trades around the clock, the pollers never idle"""
+		return ALWAYS_OPEN
+
+	@property
+	def warm_connections(self):
+		return self.trader.warm_connections
+
+	@property
+	def connection_stats(self):
+		return self.trader.connection_stats
+
+	def quote(self, symbol, max_age=None):
+		"""Fetch crypto quote, `max_age` as for `Trader.quote`"""
+		return self.quote_cache.get(symbol.upper(), max_age)
+
+	def _fetch_quote(self, symbol):
+		json = self._req_get(crypto_endpoints.quotes(self.pairs[symbol].id))
 		return CryptoQuote(json)
 
+	def quote_stats(self):
+		return self.quote_cache.stats()
+
+	def quotes(self, symbols):
+		"""Fetch crypto quotes for many symbols in batched requests,
+			returns a list of CryptoQuote in the order of `symbols` (None if not quoted or without a currency pair)"""
+		pairs = [self.pairs.get(symbol) for symbol in symbols]
+		pair_ids = [pair.id if pair else None for pair in pairs]
+		quotes = {}
+		for chunk in _chunks({id for id in pair_ids if id}, self.trader.batch_size):
+			for quote in self._req_get(crypto_endpoints.quotes_many(chunk))['results']:
+				if quote:
+					quotes[quote['id']] = quote
+		result = [CryptoQuote(dict(quotes[id])) if id in quotes else None for id in pair_ids]
+		for symbol, quote in zip(symbols, result):
+			if quote:
+				self.quote_cache.put(symbol.upper(), quote)
+		return result
+
 	def historical_quotes(self,
 						  symbol,
 						  interval,
 						  span=None,
 						  start=None,
 						  stop=None,
-						  bounds='24_7'):
+						  bounds='24_7',
+						  max_workers=4):
+		"""Fetch historical data for a crypto currency, long ranges are split as by `Trader.historical_quotes`"""
 		return self.trader.historical_quotes(
-			symbol=symbol,
+			symbol=self.pairs[symbol].id,
 			interval=interval,
 			span=span,
 			start=start,
 			stop=stop,
 			bounds=bounds,
+			max_workers=max_workers,
 			_json_key='data_points',
 			_endpoint=crypto_endpoints
 		)
@@ -49,13 +93,19 @@ class CryptoTrader:
 		res = self._req_get(crypto_endpoints.accounts())
 		return res['results'][0]
 
-	def orders(self):
-		orders = self._req_get(crypto_endpoints.orders())['results']
-		return [CryptoOrder(self, order, False) for order in orders]
+	def holdings(self):
+		"""Returns every crypto holding (all pages)"""
+		return list(self.trader._paginate(crypto_endpoints.holdings()))
+
+	def orders(self, all_pages=False):
+		"""Returns an `OrderCollection` of the most recent crypto orders (the first page), or of every order"""
+		orders = list(self.trader._paginate(crypto_endpoints.orders())) if all_pages \
+			else self._req_get(crypto_endpoints.orders())['results']
+		return OrderCollection(self, orders, CryptoOrder)
 
 	def order(self, order):
 		order_id = order['id'] if isinstance(order, dict) else order
-		json = self._req_get(crypto_endpoints.orders() + order_id)
+		json = self._req_get(crypto_endpoints.orders() + order_id + '/')
 		return CryptoOrder(self, json, False)
 
 	def buy(self,
@@ -114,15 +164,26 @@ class CryptoTrader:
 		assert bool(quantity) ^ bool(price_quantity)
 		symbol = symbol.upper()
 		order = 'limit' if price else 'market'
-		crypto_id = _crypto_pairs[symbol]
+		trace = OrderTrace(symbol, order, side)
+		pair = self.pairs[symbol]
+		crypto_id = pair.id
+		trace.mark('instrument')
 
 		if not time_in_force: time_in_force = 'gtc'
-		if not price: price = self.quote(symbol).ask
+		if not price:
+			price = self.quote(symbol).ask
+			trace.mark('quote')
 		if not quantity and price_quantity:
 			quantity = "{0:.6f}".format(price_quantity / price)
 
-		price = self._fprice(price)
+		# round locally to the pair's increments rather than having the order rejected
+		if pair.has_metadata:
+			quantity = pair.round_quantity(quantity)
+			price = pair.round_price(price)
+		else:
+			price = self._fprice(price)
 		account_id = self.account()['id']
+		trace.mark('account')
 
 		payload = {
 			"type": order,
@@ -136,10 +197,22 @@ class CryptoTrader:
 		}
 
 		payload = {k: v for k, v in payload.items() if v}
-		payload = dumps(payload)
+		payload = codec.dumps(payload)
+		trace.mark('sent')
 		json = self._req_post(crypto_endpoints.orders(), data=payload)
-		return CryptoOrder(self, json)
+		trace.on_ack(json)
+		self.trader.latency.record(trace)
+		return CryptoOrder(self, json, trace=trace)
 
 	@property
 	def cancel(self):
-		return self.trader.cancel
\ No newline at end of file
+		return self.trader.cancel
+
+	def cancel_all(self, symbol=None, side=None, older_than=None, max_workers=16):
+		"""Cancel every open crypto order matching the filters, see `Trader.cancel_all`"""
+		pair_id = self.pairs[symbol].id if symbol else None
+
+		def matches(order):
+			return not pair_id or order['currency_pair_id'] == pair_id
+
+		return self.trader._cancel_all(crypto_endpoints.orders(), CryptoOrder, self, matches, side, older_than, max_workers)
\ No newline at end of file
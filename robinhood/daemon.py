@@ -0,0 +1,420 @@
+"""
+A long-running local daemon holding a logged-in Trader, and its thin client.
+
+The daemon keeps the Trader resident: its session, warm connections, quote cache, instrument
+cache and currency pairs. Short-lived scripts then skip the imports, the session unpickling and
+the TLS handshakes, and only pay a round trip over a Unix domain socket.
+
+    python -m robinhood.daemon --session robinhood.session
+    ROBINHOOD_PASSWORD=... python -m robinhood.daemon --username me --session robinhood.session
+
+    from robinhood.daemon import DaemonClient
+    client = DaemonClient()
+    client.quote('AAPL')                # the quote json
+    order = client.buy('AAPL', 1, price=150.0)
+    client.cancel(order['id'])
+
+The protocol is newline-delimited json, any number of requests per connection:
+
+    -> {"id": 1, "method": "quote", "params": {"symbol": "AAPL"}}
+    <- {"id": 1, "result": {...}}   or   {"id": 1, "error": "Invalid symbol: X", "type": "Exception"}
+
+Only the standard library (and the json codec) is imported by the client.
+"""
+
+from .detail import codec
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+
+
+def default_socket_path():
+	"""In $XDG_RUNTIME_DIR, or in a private robinhood-<uid> directory of the temp dir"""
+	directory = os.environ.get('XDG_RUNTIME_DIR') or os.path.join(tempfile.gettempdir(), f'robinhood-{os.getuid()}')
+	return os.path.join(directory, 'robinhood.sock')
+
+
+def _private_directory(path):
+	"""Creates the directory of a socket (0700), refuses one other users own or can write to"""
+	directory = os.path.dirname(os.path.abspath(path))
+	os.makedirs(directory, mode=0o700, exist_ok=True)
+	stat = os.stat(directory)
+	if stat.st_uid != os.getuid() or stat.st_mode & 0o022:
+		raise Exception(f"Not a private directory of this user: {directory}")
+
+
+def _check_owner(path):
+	"""Refuses a socket created by another user, it would receive the orders"""
+	if os.stat(path).st_uid != os.getuid():
+		raise Exception(f"The socket is not owned by this user: {path}")
+
+
+class DaemonError(Exception):
+	"""An error raised by the daemon while handling a request"""
+
+	def __init__(self, message, type=None):
+		Exception.__init__(self, message)
+		self.type = type
+
+
+###########################################################################
+#                               SERVER
+###########################################################################
+
+def _frame_json(df):
+	"""A historical DataFrame as {'index': epoch ns, 'columns', 'data': rows}"""
+	# the index may be in another unit than ns (pandas 2 keeps the unit of what it was parsed from)
+	index = df.index.values.astype('datetime64[ns]').view('int64')
+	return {'index': index.tolist(), 'columns': list(df.columns),
+			'data': df.astype(object).where(df.notna(), None).values.tolist()}
+
+
+def _to_json(value):
+	"""The json of the values returned by the Trader (Quote, Order, OrderCollection, DataFrame)"""
+	if value is None or isinstance(value, (str, int, float, bool)):
+		return value
+	if isinstance(value, dict):
+		return {key: _to_json(item) for key, item in value.items()}
+	if isinstance(value, (list, tuple)):
+		return [_to_json(item) for item in value]
+	if hasattr(value, 'json') and isinstance(value.json, list):  # OrderCollection
+		return value.json
+	if hasattr(value, '_dict'):  # Quote, Order
+		json = dict(value._dict)
+		if getattr(value, 'time_ns', None) is not None:
+			json['time_ns'] = value.time_ns
+		return json
+	if hasattr(value, 'to_dict') and hasattr(value, 'columns'):  # DataFrame
+		return _frame_json(value)
+	if hasattr(value, 'item'):  # numpy scalars
+		return value.item()
+	return str(value)
+
+
+class Daemon:
+	"""
+	Serves a Trader to the local clients.
+
+	Args:
+		trader: the logged-in Trader kept resident
+		path: the Unix socket path, only the current user can connect to it
+		session: the session file, saved again after each refresh of the authentication and on exit
+		refresh_interval: seconds between refreshes of the authentication token, None to never refresh
+		warm: keep the connections to the api hosts warm (`Trader.warm_connections`)
+	"""
+
+	def __init__(self, trader, path=None, session=None, refresh_interval=6 * 3600, warm=True):
+		self.trader = trader
+		self.path = path or default_socket_path()
+		self.session = session
+		self.refresh_interval = refresh_interval
+		self.warm = warm
+		self.requests = 0
+		self.errors = 0
+		self.started_at = None
+		self._lock = threading.Lock()  # the counters, requests are handled on concurrent threads
+		self._server = None
+		self._stopped = threading.Event()
+		self.methods = {
+			'ping': lambda: 'pong',
+			'quote': self.quote,
+			'quotes': self.quotes,
+			'buy': self.buy,
+			'sell': self.sell,
+			'order': self.order,
+			'orders': self.orders,
+			'cancel': self.cancel,
+			'cancel_all': self.cancel_all,
+			'history': self.history,
+			'fundamentals': lambda symbol: trader.fundamentals(symbol),
+			'instrument': lambda symbol: trader.instrument(symbol),
+			'account': lambda: trader.account(),
+			'stats': self.stats,
+		}
+
+	def _owner(self, crypto):
+		return self.trader.crypto if crypto else self.trader
+
+	def quote(self, symbol, max_age=None, crypto=False):
+		return self._owner(crypto).quote(symbol, max_age=max_age)
+
+	def quotes(self, symbols, crypto=False):
+		return self._owner(crypto).quotes(symbols)
+
+	def buy(self, symbol, quantity=None, crypto=False, **kwargs):
+		return self._owner(crypto).buy(symbol, quantity=quantity, **kwargs)
+
+	def sell(self, symbol, quantity=None, crypto=False, **kwargs):
+		return self._owner(crypto).sell(symbol, quantity=quantity, **kwargs)
+
+	def order(self, order_id, crypto=False):
+		return self._owner(crypto).order(order_id)
+
+	def orders(self, all_pages=False, open=False, crypto=False):
+		orders = self._owner(crypto).orders(all_pages=all_pages)
+		return orders.open() if open else orders
+
+	def cancel(self, order_id, crypto=False):
+		"""Cancels an order, returns it as refreshed after the cancel"""
+		owner = self._owner(crypto)
+		self.trader.cancel(owner.order(order_id)._dict)
+		return owner.order(order_id)
+
+	def cancel_all(self, symbol=None, side=None, crypto=False):
+		result = self._owner(crypto).cancel_all(symbol=symbol, side=side)
+		return {key: [order._dict for order in orders] for key, orders in result.items()}
+
+	def history(self, symbol, interval='day', span='year', start=None, stop=None, bounds=None, crypto=False):
+		if crypto:
+			return self.trader.crypto.historical_quotes(symbol, interval, span, start=start, stop=stop, bounds=bounds)
+		return self.trader.historical_quotes(symbol, interval, span, start=start, stop=stop, bounds=bounds)
+
+	def stats(self):
+		return {
+			'uptime': time.time() - self.started_at if self.started_at else None,
+			'requests': self.requests,
+			'errors': self.errors,
+			'quotes': self.trader.quote_stats(),
+			'crypto_quotes': self.trader.crypto.quote_stats(),
+			'connections': self.trader.connection_stats(),
+		}
+
+	def handle(self, request: dict) -> dict:
+		"""Answers a single request"""
+		with self._lock:
+			self.requests += 1
+		response = {'id': request.get('id')}
+		method = self.methods.get(request.get('method'))
+		try:
+			if method is None:
+				raise Exception(f"Unknown method: {request.get('method')}")
+			response['result'] = _to_json(method(**(request.get('params') or {})))
+		except Exception as e:
+			with self._lock:
+				self.errors += 1
+			response['error'] = str(e)
+			response['type'] = type(e).__name__
+		return response
+
+	def _refresh(self):
+		while not self._stopped.wait(self.refresh_interval):
+			try:
+				self.trader.refresh_auth()
+				if self.session:
+					self.trader.save_session(self.session)
+			except Exception as e:
+				print('refreshing the authentication failed:', e)
+
+	def serve(self, background=False):
+		"""Serves until `stop()` (or forever), in a background thread with `background`"""
+		_private_directory(self.path)
+		if os.path.exists(self.path):
+			os.remove(self.path)  # a stale socket of a previous daemon
+		handler = type('Handler', (_Handler,), {'daemon': self})
+		# no os.umask (process wide, it would race the files other threads create): the socket is
+		# created in a 0700 directory, which keeps other users out until it is made 0600 here
+		self._server = _Server(self.path, handler)
+		os.chmod(self.path, 0o600)
+		self.started_at = time.time()
+		if self.warm:
+			self.trader.warm_connections()
+		if self.refresh_interval:
+			threading.Thread(target=self._refresh, daemon=True).start()
+
+		if background:
+			threading.Thread(target=self._server.serve_forever, daemon=True).start()
+			return self
+		try:
+			self._server.serve_forever()
+		finally:
+			self.close()
+		return self
+
+	def stop(self):
+		if self._server:
+			self._server.shutdown()
+		self.close()
+
+	def close(self):
+		self._stopped.set()
+		if self._server:
+			self._server.server_close()
+			self._server = None
+			if os.path.exists(self.path):
+				os.remove(self.path)
+		self.trader.warm_connections(interval=None)
+		if self.session:
+			self.trader.save_session(self.session)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+	daemon = None
+
+	def handle(self):
+		for line in self.rfile:
+			if not line.strip():
+				continue
+			try:
+				request = codec.loads(line)
+			except ValueError as e:
+				response = {'id': None, 'error': f'Invalid json: {e}', 'type': 'ValueError'}
+			else:
+				response = self.daemon.handle(request)
+			self.wfile.write(codec.dumps(response) + b'\n')
+			self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+	daemon_threads = True
+
+
+###########################################################################
+#                               CLIENT
+###########################################################################
+
+class DaemonClient:
+	"""
+	A connection to a running daemon, the methods return the json of the results.
+	Thread-safe, the requests of concurrent threads are serialized on the connection.
+
+	Args:
+		path: the Unix socket path of the daemon
+		timeout: seconds to wait for a response
+	"""
+
+	def __init__(self, path=None, timeout=30):
+		self.path = path or default_socket_path()
+		self.timeout = timeout
+		self._socket = None
+		self._file = None
+		self._next_id = 0
+		self._lock = threading.Lock()
+
+	def _connect(self):
+		_check_owner(self.path)
+		self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		self._socket.settimeout(self.timeout)
+		self._socket.connect(self.path)
+		self._file = self._socket.makefile('rb')
+
+	def close(self):
+		if self._socket:
+			self._file.close()
+			self._socket.close()
+			self._socket = self._file = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def call(self, method, **params):
+		"""Sends a request, returns its result or raises DaemonError"""
+		with self._lock:
+			if self._socket is None:
+				self._connect()
+			self._next_id += 1
+			try:
+				self._socket.sendall(codec.dumps({'id': self._next_id, 'method': method, 'params': params}) + b'\n')
+				line = self._file.readline()
+			except OSError:
+				self.close()
+				raise
+			if not line:
+				self.close()
+				raise ConnectionError("The daemon closed the connection")
+		response = codec.loads(line)
+		if 'error' in response:
+			raise DaemonError(response['error'], response.get('type'))
+		return response['result']
+
+	def ping(self):
+		return self.call('ping')
+
+	def quote(self, symbol, max_age=None, crypto=False):
+		return self.call('quote', symbol=symbol, max_age=max_age, crypto=crypto)
+
+	def quotes(self, symbols, crypto=False):
+		return self.call('quotes', symbols=list(symbols), crypto=crypto)
+
+	def buy(self, symbol, quantity=None, crypto=False, **kwargs):
+		"""The keyword arguments of `Trader.buy` (or `CryptoTrader.buy`), returns the order json"""
+		return self.call('buy', symbol=symbol, quantity=quantity, crypto=crypto, **kwargs)
+
+	def sell(self, symbol, quantity=None, crypto=False, **kwargs):
+		return self.call('sell', symbol=symbol, quantity=quantity, crypto=crypto, **kwargs)
+
+	def order(self, order_id, crypto=False):
+		return self.call('order', order_id=order_id, crypto=crypto)
+
+	def orders(self, all_pages=False, open=False, crypto=False):
+		return self.call('orders', all_pages=all_pages, open=open, crypto=crypto)
+
+	def cancel(self, order_id, crypto=False):
+		return self.call('cancel', order_id=order_id, crypto=crypto)
+
+	def cancel_all(self, symbol=None, side=None, crypto=False):
+		return self.call('cancel_all', symbol=symbol, side=side, crypto=crypto)
+
+	def history(self, symbol, interval='day', span='year', start=None, stop=None, bounds=None, crypto=False,
+				frame=False):
+		"""
+		Returns {'index': epoch ns, 'columns', 'data': rows}, or the DataFrame with `frame`
+		(imports pandas)
+		"""
+		result = self.call('history', symbol=symbol, interval=interval, span=span, start=start, stop=stop,
+						   bounds=bounds, crypto=crypto)
+		if not frame:
+			return result
+		import pandas as pd
+		return pd.DataFrame(result['data'], columns=result['columns'],
+							index=pd.to_datetime(result['index'], unit='ns', utc=True))
+
+	def fundamentals(self, symbol):
+		return self.call('fundamentals', symbol=symbol)
+
+	def instrument(self, symbol):
+		return self.call('instrument', symbol=symbol)
+
+	def account(self):
+		return self.call('account')
+
+	def stats(self):
+		return self.call('stats')
+
+
+def main(argv=None):
+	import argparse
+	parser = argparse.ArgumentParser(description="Serves a logged-in Trader to local clients over a Unix socket")
+	parser.add_argument('--session', help='a session file saved by Trader.save_session')
+	parser.add_argument('--socket', default=default_socket_path(), help='the Unix socket path')
+	parser.add_argument('--api-url', help='ie: a local robinhood.simulator')
+	parser.add_argument('--username', help='the password is read from $ROBINHOOD_PASSWORD, or prompted for')
+	parser.add_argument('--refresh-interval', type=float, default=6 * 3600,
+						help='seconds between authentication refreshes, 0 to never refresh')
+	parser.add_argument('--no-warm', action='store_true', help='do not keep the connections warm')
+	args = parser.parse_args(argv)
+
+	from .trader import Trader
+	if args.session and os.path.exists(args.session):
+		trader = Trader.load_session(args.session)
+	elif args.username:
+		# never a command line argument, those are visible to every user in the process list
+		password = os.environ.get('ROBINHOOD_PASSWORD')
+		if password is None:
+			import getpass
+			password = getpass.getpass(f'password of {args.username}: ')
+		trader = Trader(args.username, password, api_url=args.api_url)
+	else:
+		parser.error('either --session (an existing file) or --username is required')
+
+	print(f'serving the trader on {args.socket}')
+	Daemon(trader, args.socket, args.session, args.refresh_interval or None, not args.no_warm).serve()
+
+
+if __name__ == '__main__':
+	main()
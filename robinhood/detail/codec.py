@@ -0,0 +1,87 @@
+"""
+Json encoding/decoding of the request and response bodies.
+
+The fastest available library is used: orjson, then ujson, falling back to the standard library.
+`loads` decodes directly from the response bytes. Given `keys` only those top-level keys are
+returned, with pysimdjson installed the other keys are not decoded at all.
+"""
+
+import json as _json
+
+try:
+	import orjson as _orjson
+except ImportError:
+	_orjson = None
+
+try:
+	import ujson as _ujson
+except ImportError:
+	_ujson = None
+
+try:
+	import simdjson as _simdjson
+except ImportError:
+	_simdjson = None
+
+
+def _default(obj):
+	"""numpy scalars (ie: a quantity taken from a DataFrame) encode as their python value"""
+	if hasattr(obj, 'item'):
+		return obj.item()
+	raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+if _orjson:
+	name = 'orjson'
+	_loads = _orjson.loads
+
+	def dumps(obj) -> bytes:
+		return _orjson.dumps(obj, default=_default, option=_orjson.OPT_SERIALIZE_NUMPY)
+
+elif _ujson:
+	name = 'ujson'
+	_loads = _ujson.loads
+
+	def dumps(obj) -> bytes:
+		return _ujson.dumps(obj, ensure_ascii=False, default=_default).encode()
+
+else:
+	name = 'json'
+	_loads = _json.loads
+
+	def dumps(obj) -> bytes:
+		return _json.dumps(obj, separators=(',', ':'), default=_default).encode()
+
+
+def _loads_keys_simdjson(data, keys):
+	document = _simdjson.Parser().parse(data)
+	if not isinstance(document, _simdjson.Object):
+		return document.as_list() if isinstance(document, _simdjson.Array) else document
+	result = {}
+	for key in keys:
+		if key in document:
+			value = document[key]
+			result[key] = value.as_list() if isinstance(value, _simdjson.Array) \
+				else value.as_dict() if isinstance(value, _simdjson.Object) else value
+	return result
+
+
+def loads(data, keys=None):
+	"""
+	Args:
+		data: the json document (bytes or str)
+		keys: optional, only these top-level keys of the document are returned
+	"""
+	if not data:
+		return None
+
+	if keys is None:
+		return _loads(data)
+
+	if _simdjson and isinstance(data, bytes):
+		return _loads_keys_simdjson(data, keys)
+
+	document = _loads(data)
+	if not isinstance(document, dict):
+		return document
+	return {key: document[key] for key in keys if key in document}
@@ -1,7 +1,6 @@
-import pandas as pd
 import pprint
-from datetime import datetime
-from dateutil import parser
+import time
+from datetime import datetime, timedelta, timezone
 
 class PrettyDict:
 	def __init__(self, dict):
@@ -17,8 +16,82 @@ class PrettyDict:
 		return pprint.pformat(self._dict)
 
 
+###########################################################################
+#                               TIME
+###########################################################################
+# Times are kept as int64 nanoseconds since the epoch (UTC), pd.Timestamp/datetime objects are
+# only created when asked for. Robinhood's ISO-8601 formats ('...Z', '...-04:00', with or without
+# fractions) are parsed with `datetime.fromisoformat`, dateutil is only the fallback.
+
+_epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_microsecond = timedelta(microseconds=1)
+
+
+def time_ns_now() -> int:
+	"""the current time, epoch nanoseconds"""
+	return time.time_ns()
+
+
 def timestamp_now():
-	return pd.Timestamp.now()
+	"""the current (local, naive) time as a pd.Timestamp"""
+	return ns_to_timestamp(time_ns_now())
+
+
+def _parse_iso(value: str) -> datetime:
+	try:
+		# python < 3.11 does not accept the 'Z' suffix
+		return datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+	except ValueError:
+		from dateutil import parser
+		return parser.parse(value)
+
+
+def iso_to_ns(value: str) -> int:
+	"""epoch nanoseconds of an ISO-8601 timestamp (naive timestamps are UTC), None for empty values"""
+	if not value:
+		return None
+	date = _parse_iso(value)
+	if date.tzinfo is None:
+		date = date.replace(tzinfo=timezone.utc)
+	return (date - _epoch) // _microsecond * 1000
+
+
+def iso_to_ns_array(values):
+	"""
+	Vectorized `iso_to_ns`, returns an int64 NumPy array.
+	Uniform '...Z' timestamps (ie: `begins_at` of historical quotes) are parsed by NumPy directly.
+	"""
+	import numpy as np
+	values = list(values)
+	if values and all(isinstance(v, str) and v.endswith('Z') for v in values):
+		try:
+			return np.array([v[:-1] for v in values], dtype='datetime64[ns]').view('int64')
+		except ValueError:
+			pass
+	import pandas as pd
+	if int(pd.__version__.split('.')[0]) < 2:
+		# no format='ISO8601' (nor `as_unit`) before pandas 2, parsed one by one, None as NaT
+		nat = np.iinfo(np.int64).min
+		return np.array([iso_to_ns(v) if v else nat for v in values], dtype='int64')
+	return pd.to_datetime(values, utc=True, format='ISO8601').as_unit('ns').asi8
+
+
+def ns_to_index(values, tz='UTC'):
+	"""a DatetimeIndex (UTC by default) of epoch nanoseconds"""
+	import numpy as np
+	import pandas as pd
+	return pd.DatetimeIndex(np.asarray(values, dtype='int64').view('datetime64[ns]')).tz_localize('UTC').tz_convert(tz)
+
+
+def ns_to_timestamp(value, tz=None):
+	"""
+	A pd.Timestamp of epoch nanoseconds, local and naive without `tz` (like `pd.Timestamp.now()`)
+	"""
+	import pandas as pd
+	timestamp = pd.Timestamp(value, unit='ns', tz='UTC')
+	if tz:
+		return timestamp.tz_convert(tz)
+	return timestamp.tz_convert(datetime.now().astimezone().tzinfo).tz_localize(None)
 
 
 def _to_float(value):
@@ -49,6 +122,23 @@ def _datelike_to_datetime(date: [int, str, datetime], default=None):
 		if date.isnumeric() and len(date) == len('yyyymmdd'):
 			return datetime.strptime(str(date), '%Y%m%d')
 		else:
-			return parser.parse(date)
+			return _parse_iso(date)
+
+	raise Exception("Unable to detect format of : " + str(date))
+
+
+def _chunks(items, size):
+	"""Splits `items` into lists of at most `size` items"""
+	items = list(items)
+	return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _map_concurrent(func, items, max_workers=16):
+	"""Apply `func` to every item on a thread pool, results are returned in input order"""
+	items = list(items)
+	if len(items) <= 1 or max_workers <= 1:
+		return [func(item) for item in items]
 
-	raise Exception("Unable to detect format of : " + str(date))
\ No newline at end of file
+	from concurrent.futures import ThreadPoolExecutor
+	with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+		return list(pool.map(func, items))
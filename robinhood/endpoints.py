@@ -1,4 +1,5 @@
 from .detail.common import _make_query_string
+from six.moves.urllib.parse import quote
 api_url = "https://api.robinhood.com"
 
 
@@ -42,15 +43,17 @@ def edocuments():
     return api_url + "/documents/"
 
 
-def instruments(instrumentId=None, option=None):
+def instruments(instrumentId=None, option=None, ids=None):
     '''
     Return information about a specific instrument by providing its instrument id.
     Add extra options for additional information such as "popularity"
+    Supplying `ids` returns the instruments of multiple instrument ids in one request.
     '''
     return api_url \
            + "/instruments/" \
            + ("{id}/".format(id=instrumentId) if instrumentId else "") \
-           + ("{_option}/".format(_option=option) if option else "")
+           + ("{_option}/".format(_option=option) if option else "") \
+           + ("?ids=" + ",".join(ids) if ids else "")
 
 
 def margin_upgrades():
@@ -61,6 +64,10 @@ def markets():
     return api_url + "/markets/"
 
 
+def market_hours(mic, date):
+    return api_url + "/markets/{mic}/hours/{date}/".format(mic=mic, date=date)
+
+
 def notifications():
     return api_url + "/notifications/"
 
@@ -77,12 +84,12 @@ def portfolios():
     return api_url + "/portfolios/"
 
 
-def positions():
-    return api_url + "/positions/"
+def positions(nonzero=None):
+    return api_url + "/positions/" + ("?nonzero=true" if nonzero else "")
 
 
-def quotes():
-    return api_url + "/quotes/"
+def quotes(symbols=None):
+    return api_url + "/quotes/" + ("?symbols=" + ",".join(symbols) if symbols else "")
 
 
 def orderbook(id):
@@ -111,7 +118,10 @@ def news(stock):
     return api_url + "/midlands/news/{_stock}/".format(_stock=stock)
 
 
-def fundamentals(stock):
+def fundamentals(stock=None, symbols=None):
+    """Supplying `symbols` returns the fundamentals of multiple symbols in one request"""
+    if symbols:
+        return api_url + "/fundamentals/?symbols=" + ",".join(symbols)
     return api_url + "/fundamentals/{_stock}/".format(_stock=stock)
 
 
@@ -134,5 +144,9 @@ def market_data(optionid):
     return api_url + "/marketdata/options/{_optionid}/".format(_optionid=optionid)
 
 
+def market_data_many(instrument_urls):
+    return api_url + "/marketdata/options/?instruments=" + ",".join(quote(url, safe='') for url in instrument_urls)
+
+
 def convert_token():
     return api_url + "/oauth2/migrate_token/"
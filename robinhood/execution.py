@@ -0,0 +1,435 @@
+"""
+Execution algorithms: parent orders sliced into child limit orders over time.
+
+ - twap:    equal slices at equal intervals
+ - vwap:    slices weighted by the intraday volume profile (from `historical_quotes`)
+ - iceberg: at most `display` shares/coins shown at a time until the whole quantity is filled
+
+Every parent order runs on one scheduler thread. Each tick makes one batched quote request and
+one batched order refresh per asset class (stocks/crypto), whatever the number of parent orders.
+It then places the child orders that are due. Children priced away from the market for longer
+than `reprice_after` seconds are canceled and re-sliced at the new price.
+
+    scheduler = ExecutionScheduler(trader)
+    parent = scheduler.vwap('AAPL', 'buy', 3000, duration=3600, limit=260.0)
+    scheduler.iceberg('btc', 'sell', 2.0, display=0.1, crypto=True)
+    scheduler.start()
+    ...
+    print(scheduler.report())  # fill progress and slippage of every parent order
+"""
+
+from .detail.common import _map_concurrent
+from .order import closed_states
+from collections import deque
+import threading
+import time
+
+
+def _float(value):
+	return float(value) if value not in (None, '') else 0.0
+
+
+class _Child:
+	__slots__ = ('order', 'price', 'quantity', 'placed_at', 'filled', 'notional', 'canceling')
+
+	def __init__(self, order, price, quantity, placed_at):
+		self.order = order
+		self.price = price
+		self.quantity = quantity
+		self.placed_at = placed_at
+		self.filled = 0.0
+		self.notional = 0.0
+		self.canceling = False
+
+	@property
+	def remaining(self):
+		return max(self.quantity - self.filled, 0.0)
+
+
+class ParentOrder:
+	"""
+	A parent order being worked by an `ExecutionScheduler`.
+
+	Args:
+		schedule: [(epoch seconds, cumulative fraction of the quantity due by then), ...], ending at 1.0
+		limit: the worst price of any child order
+		display: the most quantity shown (open in child orders) at once
+		aggressiveness: where children are priced in the spread, 0: at the near touch (bid for buys), 1: crossing
+		reprice_after: seconds after which a child priced away from the market is canceled and re-sliced
+		grace: seconds after the end of the schedule during which the rest is worked crossing the spread,
+			after which the parent order expires
+
+	`errors` keeps the most recent `max_errors` errors of its child orders, `error_count` counts them all.
+	"""
+
+	max_errors = 100
+
+	def __init__(self, algo, symbol, side, quantity, schedule, limit=None, display=None, crypto=False,
+				 aggressiveness=0.5, reprice_after=30, grace=60):
+		assert (side in ['buy', 'sell'])
+		self.algo = algo
+		self.symbol = symbol.upper()
+		self.side = side
+		self.quantity = float(quantity)
+		self.schedule = schedule
+		self.limit = limit
+		self.display = display
+		self.crypto = crypto
+		self.aggressiveness = aggressiveness
+		self.reprice_after = reprice_after
+		self.grace = grace
+
+		self.state = 'working'  # 'working', 'filled', 'canceled' or 'expired'
+		self.filled = 0.0
+		self.notional = 0.0
+		self.arrival_price = None  # the mark when the first quote was seen
+		self.children = {}         # {order id: _Child} of the open children
+		self.child_count = 0
+		self.errors = deque(maxlen=self.max_errors)
+		self.error_count = 0
+		self._error_lock = threading.Lock()
+
+	@property
+	def end(self):
+		return self.schedule[-1][0]
+
+	@property
+	def deadline(self):
+		return self.end + self.grace
+
+	@property
+	def remaining(self):
+		return max(self.quantity - self.filled, 0.0)
+
+	@property
+	def open_quantity(self):
+		return sum(child.remaining for child in self.children.values())
+
+	@property
+	def average_price(self):
+		return self.notional / self.filled if self.filled else None
+
+	def due(self, now):
+		"""The quantity scheduled to be filled by `now`"""
+		fraction = 0.0
+		for at, cumulative in self.schedule:
+			if at > now:
+				break
+			fraction = cumulative
+		return self.quantity * fraction
+
+	def slippage_bps(self):
+		"""The average fill price against the arrival price, in basis points (positive: worse)"""
+		if not self.filled or not self.arrival_price:
+			return None
+		sign = 1 if self.side == 'buy' else -1
+		return sign * (self.average_price - self.arrival_price) / self.arrival_price * 1e4
+
+	def progress(self) -> dict:
+		return {
+			'algo': self.algo,
+			'symbol': self.symbol,
+			'side': self.side,
+			'state': self.state,
+			'quantity': self.quantity,
+			'filled': self.filled,
+			'filled_pct': self.filled / self.quantity * 100 if self.quantity else None,
+			'open': self.open_quantity,
+			'due': min(self.due(time.time()), self.quantity),
+			'children': self.child_count,
+			'average_price': self.average_price,
+			'arrival_price': self.arrival_price,
+			'slippage_bps': self.slippage_bps(),
+			'errors': self.error_count,
+			'last_error': repr(self.errors[-1]) if self.errors else None,
+		}
+
+	def error(self, e):
+		"""Records an error of a child order (children are placed/canceled concurrently)"""
+		with self._error_lock:
+			self.errors.append(e)
+			self.error_count += 1
+
+	def __repr__(self):
+		return f'<ParentOrder {self.algo} {self.side} {self.filled:g}/{self.quantity:g} {self.symbol} {self.state}>'
+
+
+def volume_profile(trader, symbol, crypto=False, days='week'):
+	"""
+	The average volume per 5 minute bucket of the day (UTC), from the recent 5 minute bars.
+
+	Returns: {minute of the day: volume}
+	"""
+	source = trader.crypto if crypto else trader
+	df = source.historical_quotes(symbol, interval='5minute', span=days)
+	if df is None or not len(df):
+		return {}
+	minutes = df.index.hour * 60 + df.index.minute
+	return df['volume'].astype(float).groupby(minutes).mean().to_dict()
+
+
+def _even_schedule(start, duration, slices):
+	return [(start + duration * i / slices, (i + 1) / slices) for i in range(slices)]
+
+
+def _weighted_schedule(start, duration, slices, weights):
+	total = sum(weights)
+	if not total:
+		return _even_schedule(start, duration, slices)
+	schedule, cumulative = [], 0.0
+	for i, weight in enumerate(weights):
+		cumulative += weight / total
+		schedule.append((start + duration * i / slices, cumulative))
+	schedule[-1] = (schedule[-1][0], 1.0)
+	return schedule
+
+
+class ExecutionScheduler:
+	"""
+	Works parent orders on a single thread.
+
+	Args:
+		trader: the Trader the child orders are placed with (crypto through `trader.crypto`)
+		interval: seconds between ticks
+		max_workers: child orders placed/canceled at once within a tick
+	"""
+
+	def __init__(self, trader, interval=1.0, max_workers=8):
+		self.trader = trader
+		self.interval = interval
+		self.max_workers = max_workers
+		self.parents = []
+		self._lock = threading.Lock()
+		self._thread = None
+		self._stopped = threading.Event()
+		self._wake = threading.Event()  # cuts an idle sleep short (new parent order, stop)
+
+	###########################################################################
+	#                               PARENT ORDERS
+	###########################################################################
+
+	def add(self, parent: ParentOrder) -> ParentOrder:
+		with self._lock:
+			self.parents.append(parent)
+		self._wake.set()
+		return parent
+
+	def twap(self, symbol, side, quantity, duration, slices=10, **kwargs) -> ParentOrder:
+		"""`quantity` in equal slices over `duration` seconds"""
+		schedule = _even_schedule(time.time(), duration, slices)
+		return self.add(ParentOrder('twap', symbol, side, quantity, schedule, **kwargs))
+
+	def vwap(self, symbol, side, quantity, duration, slices=10, profile=None, **kwargs) -> ParentOrder:
+		"""
+		`quantity` over `duration` seconds in slices weighted by the volume profile
+		(`volume_profile` of the symbol by default), evenly if the profile has no volume.
+		"""
+		if profile is None:
+			profile = volume_profile(self.trader, symbol, crypto=kwargs.get('crypto', False))
+		start = time.time()
+		weights = []
+		for i in range(slices):
+			at = time.gmtime(start + duration * (i + 0.5) / slices)
+			weights.append(profile.get(at.tm_hour * 60 + at.tm_min - at.tm_min % 5, 0.0))
+		schedule = _weighted_schedule(start, duration, slices, weights)
+		return self.add(ParentOrder('vwap', symbol, side, quantity, schedule, **kwargs))
+
+	def iceberg(self, symbol, side, quantity, display, limit=None, duration=None, **kwargs) -> ParentOrder:
+		"""`quantity` with no more than `display` shown at a time, until filled (or `duration` seconds)"""
+		schedule = [(time.time(), 1.0), (time.time() + (duration or 365 * 86400), 1.0)]
+		kwargs.setdefault('aggressiveness', 0.0)
+		kwargs.setdefault('grace', 0)
+		return self.add(ParentOrder('iceberg', symbol, side, quantity, schedule, limit=limit, display=display, **kwargs))
+
+	def cancel(self, parent: ParentOrder):
+		"""Stops a parent order, its open children are canceled on the next tick"""
+		parent.state = 'canceled'
+
+	###########################################################################
+	#                               RUNNING
+	###########################################################################
+
+	def start(self):
+		if self._thread and self._thread.is_alive():
+			return
+		self._stopped.clear()
+		self._thread = threading.Thread(target=self._run, daemon=True)
+		self._thread.start()
+
+	def stop(self, cancel=True):
+		"""Stops the scheduler thread, canceling the open children of every parent order"""
+		self._stopped.set()
+		self._wake.set()
+		if self._thread:
+			self._thread.join()
+		if cancel:
+			for parent in self.parents:
+				if parent.state == 'working':
+					parent.state = 'canceled'
+			self.run_once()
+
+	def _run(self):
+		while not self._stopped.is_set():
+			started = time.monotonic()
+			try:
+				self.run_once()
+			except Exception as e:
+				print('execution tick failed:', e)
+			interval = max(self.interval - (time.monotonic() - started), 0)
+			self._calendar().sleep(interval, self._wake)
+			self._wake.clear()
+
+	def _calendar(self):
+		"""The stock market calendar, unless crypto orders are being worked (or nothing is)"""
+		active = self.active()
+		if not active or any(parent.crypto for parent in active):
+			return self.trader.crypto.calendar
+		return self.trader.calendar
+
+	def active(self):
+		"""The parent orders being worked or with children still open"""
+		with self._lock:
+			return [parent for parent in self.parents if parent.state == 'working' or parent.children]
+
+	def run_once(self, now=None):
+		"""One tick: batched quotes and order refreshes, then reprices, cancels and new children"""
+		now = now or time.time()
+		parents = self.active()
+		if not parents:
+			return
+
+		quotes = self._quotes(parents)
+		self._refresh(parents)
+
+		cancels, placements = [], []
+		for parent in parents:
+			quote = quotes.get((parent.crypto, parent.symbol))
+			if parent.arrival_price is None and quote:
+				parent.arrival_price = quote.mark
+
+			if parent.state == 'working':
+				if parent.remaining <= 1e-12:
+					parent.state = 'filled'
+				elif now >= parent.deadline:
+					parent.state = 'expired'
+
+			for child in parent.children.values():
+				if child.canceling:
+					continue
+				if parent.state != 'working':
+					cancels.append((parent, child))
+				elif quote and now - child.placed_at > parent.reprice_after \
+						and abs(self._price(parent, quote, now) - child.price) > 1e-9:
+					cancels.append((parent, child))
+
+			if parent.state == 'working' and quote:
+				placement = self._next_child(parent, quote, now)
+				if placement:
+					placements.append(placement)
+
+		def cancel(item):
+			parent, child = item
+			child.canceling = True
+			try:
+				self.trader.cancel(child.order)
+			except Exception as e:  # filled in the meantime (the refresh drops it) or a failure, retried next tick
+				child.canceling = False
+				parent.error(e)
+
+		_map_concurrent(cancel, cancels, self.max_workers)
+		_map_concurrent(self._place, placements, self.max_workers)
+
+	###########################################################################
+	#                               INTERNALS
+	###########################################################################
+
+	def _quotes(self, parents):
+		"""{(crypto, symbol): quote} in one batched request per asset class"""
+		quotes = {}
+		for crypto in (False, True):
+			symbols = sorted({parent.symbol for parent in parents if parent.crypto == crypto})
+			if symbols:
+				source = self.trader.crypto if crypto else self.trader
+				for symbol, quote in zip(symbols, source.quotes(symbols)):
+					if quote:
+						quotes[(crypto, symbol)] = quote
+		return quotes
+
+	def _refresh(self, parents):
+		"""Applies the fills and closes of the open children, one order-list request per asset class"""
+		for crypto in (False, True):
+			children = [(parent, order_id, child) for parent in parents if parent.crypto == crypto
+						for order_id, child in parent.children.items()]
+			if not children:
+				continue
+			source = self.trader.crypto if crypto else self.trader
+			orders = source.orders()
+			for parent, order_id, child in children:
+				try:
+					json = orders.by_id(order_id)._dict
+				except KeyError:  # not on the first page anymore
+					json = source.order(order_id)._dict
+				self._apply(parent, order_id, child, json)
+
+	def _apply(self, parent, order_id, child, json):
+		filled = _float(json.get('cumulative_quantity'))
+		if filled > child.filled:
+			notional = filled * (_float(json.get('average_price')) or child.price)
+			parent.filled += filled - child.filled
+			parent.notional += notional - child.notional
+			child.filled, child.notional = filled, notional
+		child.order._dict = json
+		if json['state'] in closed_states:
+			del parent.children[order_id]
+			if parent.state == 'working' and parent.remaining <= 1e-12:
+				parent.state = 'filled'
+
+	def _price(self, parent, quote, now):
+		"""The child price: `aggressiveness` into the spread (crossing once the schedule ended), within `limit`"""
+		bid, ask = quote.bid or quote.mark, quote.ask or quote.mark
+		aggressiveness = 1.0 if now >= parent.end and parent.algo != 'iceberg' else parent.aggressiveness
+		if parent.side == 'buy':
+			price = bid + (ask - bid) * aggressiveness
+			if parent.limit is not None:
+				price = min(price, parent.limit)
+		else:
+			price = ask - (ask - bid) * aggressiveness
+			if parent.limit is not None:
+				price = max(price, parent.limit)
+		return float(self.trader._fprice(price)) if not parent.crypto else price
+
+	def _next_child(self, parent, quote, now):
+		open_quantity = parent.open_quantity
+		quantity = min(parent.due(now), parent.quantity) - parent.filled - open_quantity
+		if parent.display is not None:
+			quantity = min(quantity, parent.display - open_quantity)
+		if parent.crypto:
+			pair = self.trader.crypto.pairs[parent.symbol]
+			minimum = float(pair.min_order_size or 0)
+			if quantity < minimum or quantity <= 0:
+				return None
+			quantity = float(pair.round_quantity(quantity)) if pair.has_metadata else round(quantity, 8)
+		else:
+			quantity = int(quantity)  # whole shares
+		if quantity <= 0:
+			return None
+		return parent, quantity, self._price(parent, quote, now)
+
+	def _place(self, placement):
+		parent, quantity, price = placement
+		source = self.trader.crypto if parent.crypto else self.trader
+		try:
+			if parent.crypto:
+				order = getattr(source, parent.side)(parent.symbol, quantity=quantity, price=price)
+			else:
+				order = getattr(source, parent.side)(parent.symbol, quantity, price=price)
+		except Exception as e:  # ie: RiskRejected or an http error, retried on the next tick
+			parent.error(e)
+			return
+		parent.children[order['id']] = _Child(order, price, float(quantity), time.time())
+		parent.child_count += 1
+
+	def report(self):
+		"""DataFrame of the progress of every parent order"""
+		import pandas as pd
+		return pd.DataFrame([parent.progress() for parent in self.parents])
@@ -0,0 +1,246 @@
+"""
+Streaming export of the account history.
+
+Each paginated endpoint is walked one page at a time and its rows are written out
+before the next page is requested, so memory use does not depend on the size of the history.
+After every write a checkpoint (next page url + file offset) is written, an interrupted export
+given the same checkpoint file resumes where it stopped.
+"""
+
+from . import endpoints, crypto_endpoints
+import csv
+import json
+import os
+import tempfile
+
+# (column, path into the json) for every kind of export,
+# orders have one row per execution (or a single row with empty execution columns)
+_order_columns = [
+	('id', 'id'), ('ref_id', 'ref_id'), ('account', 'account'), ('instrument', 'instrument'),
+	('symbol', None), ('state', 'state'), ('side', 'side'), ('type', 'type'), ('trigger', 'trigger'),
+	('time_in_force', 'time_in_force'), ('extended_hours', 'extended_hours'), ('quantity', 'quantity'),
+	('cumulative_quantity', 'cumulative_quantity'), ('price', 'price'), ('average_price', 'average_price'),
+	('stop_price', 'stop_price'), ('fees', 'fees'), ('reject_reason', 'reject_reason'),
+	('created_at', 'created_at'), ('updated_at', 'updated_at'), ('last_transaction_at', 'last_transaction_at'),
+]
+
+_execution_columns = [
+	('execution_id', 'id'), ('execution_price', 'price'), ('execution_quantity', 'quantity'),
+	('execution_timestamp', 'timestamp'), ('execution_settlement_date', 'settlement_date'),
+]
+
+_crypto_order_columns = [
+	('id', 'id'), ('ref_id', 'ref_id'), ('account_id', 'account_id'), ('currency_pair_id', 'currency_pair_id'),
+	('symbol', None), ('state', 'state'), ('side', 'side'), ('type', 'type'), ('time_in_force', 'time_in_force'),
+	('quantity', 'quantity'), ('cumulative_quantity', 'cumulative_quantity'), ('price', 'price'),
+	('average_price', 'average_price'), ('rounded_executed_notional', 'rounded_executed_notional'),
+	('created_at', 'created_at'), ('updated_at', 'updated_at'), ('last_transaction_at', 'last_transaction_at'),
+]
+
+_crypto_execution_columns = [
+	('execution_id', 'id'), ('execution_price', 'effective_price'), ('execution_quantity', 'quantity'),
+	('execution_timestamp', 'timestamp'),
+]
+
+_dividend_columns = [
+	('id', 'id'), ('account', 'account'), ('instrument', 'instrument'), ('symbol', None), ('state', 'state'),
+	('amount', 'amount'), ('rate', 'rate'), ('position', 'position'), ('withholding', 'withholding'),
+	('record_date', 'record_date'), ('payable_date', 'payable_date'), ('paid_at', 'paid_at'),
+]
+
+_position_columns = [
+	('account', 'account'), ('instrument', 'instrument'), ('symbol', None), ('quantity', 'quantity'),
+	('average_buy_price', 'average_buy_price'), ('pending_average_buy_price', 'pending_average_buy_price'),
+	('intraday_quantity', 'intraday_quantity'), ('intraday_average_buy_price', 'intraday_average_buy_price'),
+	('shares_held_for_buys', 'shares_held_for_buys'), ('shares_held_for_sells', 'shares_held_for_sells'),
+	('created_at', 'created_at'), ('updated_at', 'updated_at'),
+]
+
+kinds = {
+	# kind: (url, columns, execution columns)
+	'orders': (endpoints.orders, _order_columns, _execution_columns),
+	'crypto_orders': (crypto_endpoints.orders, _crypto_order_columns, _crypto_execution_columns),
+	'dividends': (endpoints.dividends, _dividend_columns, None),
+	'positions': (endpoints.positions, _position_columns, None),
+}
+
+
+def columns(kind):
+	"""The flattened column names of an export kind"""
+	_, columns, execution_columns = kinds[kind]
+	return [c for c, _ in columns] + [c for c, _ in execution_columns or []]
+
+
+def _value(value):
+	return '' if value is None else value
+
+
+def _symbols(trader, kind, results):
+	"""Resolves the symbol of each result, instruments are looked up in bulk (and cached)"""
+	if kind == 'crypto_orders':
+		by_id = {pair.id: pair.symbol for pair in trader.crypto.pairs}
+		return [by_id.get(result['currency_pair_id'], '') for result in results]
+
+	ids = [result['instrument'].rstrip('/').rsplit('/', 1)[-1] for result in results]
+	instruments = trader._instruments_by_id(ids)
+	return [instruments[id]['symbol'] if id in instruments else '' for id in ids]
+
+
+def flatten(trader, kind, results):
+	"""Yields the flattened rows (dicts) of one page of results"""
+	_, columns, execution_columns = kinds[kind]
+	for result, symbol in zip(results, _symbols(trader, kind, results)):
+		row = {column: _value(result.get(key)) if key else symbol for column, key in columns}
+		if execution_columns is None:
+			yield row
+			continue
+
+		executions = result.get('executions') or [{}]
+		for execution in executions:
+			yield dict(row, **{column: _value(execution.get(key)) for column, key in execution_columns})
+
+
+class _CsvWriter:
+
+	def __init__(self, path, columns, offset):
+		exists = offset and os.path.exists(path)
+		self.file = open(path, 'r+' if exists else 'w', newline='')
+		if exists:
+			self.file.seek(offset)
+			self.file.truncate()
+		self.writer = csv.DictWriter(self.file, fieldnames=columns)
+		if not exists:
+			self.writer.writeheader()
+
+	def write(self, rows):
+		self.writer.writerows(rows)
+		self.file.flush()
+
+	def offset(self):
+		return self.file.tell()
+
+	def close(self):
+		self.file.close()
+
+
+class _JsonLinesWriter(_CsvWriter):
+
+	def __init__(self, path, columns, offset):
+		exists = offset and os.path.exists(path)
+		self.file = open(path, 'r+' if exists else 'w')
+		if exists:
+			self.file.seek(offset)
+			self.file.truncate()
+
+	def write(self, rows):
+		self.file.writelines(json.dumps(row, separators=(',', ':')) + '\n' for row in rows)
+		self.file.flush()
+
+
+class _ParquetWriter:
+	"""
+	Writes each flush of `row_group_size` rows as its own parquet file `<name>.<part>.parquet`,
+	(a parquet file can not be appended to, this keeps every checkpointed row durable)
+	"""
+
+	def __init__(self, path, columns, part):
+		try:
+			import pyarrow as pa
+			import pyarrow.parquet as pq
+		except ImportError:
+			raise Exception("Exporting to parquet requires `pyarrow` (pip install pyarrow)")
+
+		self.pa = pa
+		self.pq = pq
+		self.root, self.ext = os.path.splitext(path)
+		self.part = part
+		self.columns = columns
+		self.schema = pa.schema([(column, pa.string()) for column in columns])
+
+	def write(self, rows):
+		if not rows:
+			return
+		arrays = [self.pa.array([str(row[c]) for row in rows], type=self.pa.string()) for c in self.columns]
+		table = self.pa.Table.from_arrays(arrays, schema=self.schema)
+		self.pq.write_table(table, f'{self.root}.{self.part:05d}{self.ext}')
+		self.part += 1
+
+	def offset(self):
+		return self.part
+
+	def close(self):
+		pass
+
+
+_writers = {
+	'csv': _CsvWriter,
+	'jsonl': _JsonLinesWriter,
+	'parquet': _ParquetWriter,
+}
+
+
+def _read_checkpoint(path):
+	try:
+		with open(path) as file:
+			return json.load(file)
+	except (OSError, ValueError):
+		return None
+
+
+def _write_checkpoint(path, checkpoint):
+	fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+	with os.fdopen(fd, 'w') as file:
+		json.dump(checkpoint, file)
+	os.replace(tmp_path, path)
+
+
+def export(trader, kind, path, format=None, checkpoint=None, row_group_size=10000):
+	"""
+	Stream the account history of `kind` to `path`.
+
+	Args:
+		trader: a logged in Trader
+		kind: 'orders', 'crypto_orders', 'dividends' or 'positions'
+		path: output file (for parquet the files are named `<name>.<part>.parquet`)
+		format: 'csv', 'jsonl' or 'parquet', defaults to the extension of `path`
+		checkpoint: checkpoint file, when supplied an interrupted export is resumed from it
+		row_group_size: rows per parquet file/row group (csv/jsonl are written per page)
+
+	Returns: (int) the number of rows written in total
+	"""
+	if kind not in kinds:
+		raise Exception("Invalid argument `kind` must be one of " + str(list(kinds)))
+
+	format = format or os.path.splitext(path)[1].lstrip('.')
+	if format not in _writers:
+		raise Exception("Invalid argument `format` must be one of " + str(list(_writers)))
+
+	state = _read_checkpoint(checkpoint) if checkpoint else None
+	if state and (state['kind'], state['format']) != (kind, format):
+		raise Exception(f"Checkpoint {checkpoint} belongs to a different export")
+	if not state:
+		state = {'kind': kind, 'format': format, 'next': kinds[kind][0](), 'rows': 0, 'offset': 0}
+
+	writer = _writers[format](path, columns(kind), state['offset'])
+	flush_size = row_group_size if format == 'parquet' else 0
+
+	buffer = []
+	try:
+		for page in trader._pages(state['next']):
+			buffer.extend(flatten(trader, kind, page['results']))
+			if len(buffer) < flush_size and page.get('next'):
+				continue
+
+			writer.write(buffer)
+			state['rows'] += len(buffer)
+			state['next'] = page.get('next')
+			state['offset'] = writer.offset()
+			buffer = []
+			if checkpoint:
+				_write_checkpoint(checkpoint, state)
+	finally:
+		writer.close()
+
+	if checkpoint and os.path.exists(checkpoint):
+		os.remove(checkpoint)
+	return state['rows']
@@ -0,0 +1,265 @@
+"""
+Incremental technical indicators for many symbols at once.
+
+The state of every indicator is held in NumPy arrays indexed by symbol. `init` seeds a symbol
+from a historical frame (as returned by `Trader.historical_quotes`) in one vectorized pass, after
+which every new bar (`update_bars`) or quote (`update_quotes`) costs O(1) per symbol.
+
+    engine = IndicatorEngine(['AAPL', 'MSFT'], ema_periods=(9, 21), atr_period=14, range_period=20)
+    for symbol in engine.symbols:
+        engine.init(symbol, trader.historical_quotes(symbol, interval='5minute', span='week'))
+
+    while True:
+        engine.poll(trader, bar_seconds=300)
+        print(engine.frame())
+        trader.calendar.sleep(5)  # idles while the market is closed
+"""
+
+import numpy as np
+import pandas as pd
+import time
+
+
+class _RollingExtreme:
+	"""
+	Rolling max (or min) over the last `window` values of each row, O(1) amortized per update
+	(van Herk/Gil-Werman: suffix extremes of the previous block + prefix extreme of the current block)
+	"""
+
+	def __init__(self, rows, window, op):
+		self.window = window
+		self.op = op
+		self.empty = -np.inf if op is np.maximum else np.inf
+		self.block = np.full((rows, window), self.empty)
+		self.suffix = np.full((rows, window), self.empty)
+		self.prefix = np.full(rows, self.empty)
+		self.position = np.zeros(rows, dtype=np.int64)
+		self.value = np.full(rows, np.nan)
+
+	def update(self, index, values):
+		position = self.position[index]
+		self.block[index, position] = values
+		self.prefix[index] = np.where(position == 0, values, self.op(self.prefix[index], values))
+
+		tail = np.minimum(position + 1, self.window - 1)
+		previous = np.where(position + 1 < self.window, self.suffix[index, tail], self.empty)
+		self.value[index] = self.op(self.prefix[index], previous)
+
+		position = position + 1
+		full = position == self.window
+		if full.any():
+			rows = index[full]
+			self.suffix[rows] = self.op.accumulate(self.block[rows, ::-1], axis=1)[:, ::-1]
+			position[full] = 0
+		self.position[index] = position
+
+	def peek(self, index, values):
+		"""the extreme if `values` were the next values, without updating"""
+		return self.op(self.value[index], values)
+
+
+class IndicatorEngine:
+	"""
+	Args:
+		symbols: the symbols tracked
+		ema_periods: periods of the exponential moving averages of the close
+		atr_period: period of the (Wilder) average true range
+		range_period: bars of the rolling high/low
+
+	Indicators: ema_<period>, atr, vwap (reset every session/day), high_<range_period>, low_<range_period>
+	"""
+
+	def __init__(self, symbols, ema_periods=(9, 21, 50), atr_period=14, range_period=20):
+		self.symbols = [symbol.upper() for symbol in symbols]
+		self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+		self.ema_periods = np.array(ema_periods, dtype=float)
+		self.atr_period = atr_period
+		self.range_period = range_period
+
+		n = len(self.symbols)
+		self._alpha = 2 / (self.ema_periods + 1)
+		self.ema = np.full((n, len(ema_periods)), np.nan)
+		self.atr = np.full(n, np.nan)
+		self.close = np.full(n, np.nan)
+		self.cum_pv = np.zeros(n)
+		self.cum_volume = np.zeros(n)
+		self.session = np.full(n, -1, dtype=np.int64)
+		self.high = _RollingExtreme(n, range_period, np.maximum)
+		self.low = _RollingExtreme(n, range_period, np.minimum)
+
+		# the bar being formed from quotes
+		self.bar_open = np.full(n, np.nan)
+		self.bar_high = np.full(n, np.nan)
+		self.bar_low = np.full(n, np.nan)
+		self.bar_close = np.full(n, np.nan)
+		self.bar_volume = np.zeros(n)
+		self.bar_start = None
+
+	def _indices(self, symbols):
+		if symbols is None:
+			return np.arange(len(self.symbols))
+		if isinstance(symbols, str):
+			symbols = [symbols]
+		return np.array([self.index[symbol.upper()] for symbol in symbols], dtype=np.int64)
+
+	@staticmethod
+	def _session(times):
+		"""day number of each (UTC) timestamp, a new day starts a new vwap session"""
+		if times is None:
+			return None
+		times = pd.DatetimeIndex(np.atleast_1d(times))
+		return np.asarray((times - pd.Timestamp(0, tz=times.tz)) // pd.Timedelta(days=1), dtype=np.int64)
+
+	###########################################################################
+	#                               INITIALIZE
+	###########################################################################
+
+	def init(self, symbol, history):
+		"""
+		Seeds a symbol's indicators from historical bars in one vectorized pass.
+
+		Args:
+			history: a DataFrame with open/high/low/close(/volume) columns and a DatetimeIndex
+				(the frame of `Trader.historical_quotes`), or a dict of arrays with the same keys
+		"""
+		i = self.index[symbol.upper()]
+		history = pd.DataFrame(history)
+		close = history['close'].astype(float)
+		high = history['high'].astype(float)
+		low = history['low'].astype(float)
+		volume = history['volume'].astype(float) if 'volume' in history else pd.Series(0.0, index=history.index)
+
+		self.ema[i] = [close.ewm(span=period, adjust=False).mean().iloc[-1] for period in self.ema_periods]
+
+		previous_close = close.shift(1).fillna(close)
+		true_range = np.maximum(high, previous_close) - np.minimum(low, previous_close)
+		self.atr[i] = true_range.ewm(alpha=1 / self.atr_period, adjust=False).mean().iloc[-1]
+		self.close[i] = close.iloc[-1]
+
+		sessions = self._session(history.index) if isinstance(history.index, pd.DatetimeIndex) \
+			else np.zeros(len(history), dtype=np.int64)
+		last_session = sessions == sessions[-1]
+		typical = ((high + low + close) / 3).to_numpy()
+		self.cum_pv[i] = (typical * volume.to_numpy())[last_session].sum()
+		self.cum_volume[i] = volume.to_numpy()[last_session].sum()
+		self.session[i] = sessions[-1]
+
+		index = np.array([i])
+		for h, l in zip(high.to_numpy()[-self.range_period:], low.to_numpy()[-self.range_period:]):
+			self.high.update(index, np.array([h]))
+			self.low.update(index, np.array([l]))
+
+	###########################################################################
+	#                               UPDATE
+	###########################################################################
+
+	def update_bars(self, symbols, open, high, low, close, volume=None, time=None):
+		"""
+		Applies one new (completed) bar for each of `symbols`, O(1) per symbol.
+		Every argument besides `symbols` may be a scalar or an array (one value per symbol).
+		"""
+		index = self._indices(symbols)
+		high = np.broadcast_to(np.asarray(high, dtype=float), index.shape)
+		low = np.broadcast_to(np.asarray(low, dtype=float), index.shape)
+		close = np.broadcast_to(np.asarray(close, dtype=float), index.shape)
+		volume = np.broadcast_to(np.asarray(0.0 if volume is None else volume, dtype=float), index.shape)
+
+		ema = self.ema[index]
+		alpha = self._alpha
+		self.ema[index] = np.where(np.isnan(ema), close[:, None], alpha * close[:, None] + (1 - alpha) * ema)
+
+		previous_close = np.where(np.isnan(self.close[index]), close, self.close[index])
+		true_range = np.maximum(high, previous_close) - np.minimum(low, previous_close)
+		atr = self.atr[index]
+		self.atr[index] = np.where(np.isnan(atr), true_range, atr + (true_range - atr) / self.atr_period)
+		self.close[index] = close
+
+		session = self._session(time)
+		if session is not None:
+			session = np.broadcast_to(session, index.shape)
+			new_session = session != self.session[index]
+			self.cum_pv[index] = np.where(new_session, 0.0, self.cum_pv[index])
+			self.cum_volume[index] = np.where(new_session, 0.0, self.cum_volume[index])
+			self.session[index] = session
+		self.cum_pv[index] += (high + low + close) / 3 * volume
+		self.cum_volume[index] += volume
+
+		self.high.update(index, high)
+		self.low.update(index, low)
+
+	def update_quotes(self, symbols, prices, volumes=None):
+		"""
+		Updates the bar being formed with the latest quote prices, O(1) per symbol.
+		`volumes` (traded since the previous update) accumulate into the bar's volume.
+		"""
+		index = self._indices(symbols)
+		prices = np.broadcast_to(np.asarray(prices, dtype=float), index.shape)
+		volumes = np.broadcast_to(np.asarray(0.0 if volumes is None else volumes, dtype=float), index.shape)
+		valid = ~np.isnan(prices)
+		index, prices = index[valid], prices[valid]
+		self.bar_volume[index] += np.nan_to_num(volumes[valid])
+
+		fresh = np.isnan(self.bar_open[index])
+		self.bar_open[index] = np.where(fresh, prices, self.bar_open[index])
+		self.bar_high[index] = np.where(fresh, prices, np.fmax(self.bar_high[index], prices))
+		self.bar_low[index] = np.where(fresh, prices, np.fmin(self.bar_low[index], prices))
+		self.bar_close[index] = prices
+
+	def close_bars(self, time=None):
+		"""Commits the bars formed from quotes (of the symbols that received any) as completed bars"""
+		index = np.flatnonzero(~np.isnan(self.bar_open))
+		if len(index):
+			self.update_bars([self.symbols[i] for i in index], self.bar_open[index], self.bar_high[index],
+							 self.bar_low[index], self.bar_close[index], self.bar_volume[index], time=time)
+		for bar in (self.bar_open, self.bar_high, self.bar_low, self.bar_close):
+			bar.fill(np.nan)
+		self.bar_volume.fill(0.0)
+
+	def poll(self, trader, bar_seconds=60, crypto=False):
+		"""
+		One polling step: fetches batched quotes (`trader.quotes` or `trader.crypto.quotes`),
+		updates the forming bars and closes them when a `bar_seconds` boundary was crossed.
+		"""
+		now = time.time()
+		bar_start = now - now % bar_seconds
+		if self.bar_start is not None and bar_start > self.bar_start:
+			self.close_bars(pd.Timestamp(self.bar_start, unit='s'))
+		self.bar_start = bar_start
+
+		quotes = (trader.crypto if crypto else trader).quotes(self.symbols)
+		prices = [quote.mark if quote else np.nan for quote in quotes]
+		self.update_quotes(None, np.array(prices, dtype=float))
+
+	###########################################################################
+	#                               VALUES
+	###########################################################################
+
+	def frame(self, live=True) -> pd.DataFrame:
+		"""
+		The current indicator values, one row per symbol.
+		With `live` the bar being formed from quotes is included provisionally.
+		"""
+		ema, atr, close = self.ema, self.atr, self.close
+		high, low = self.high.value, self.low.value
+
+		forming = ~np.isnan(self.bar_close) if live else np.zeros(len(self.symbols), dtype=bool)
+		if forming.any():
+			bar_close = self.bar_close[:, None]
+			ema = np.where(forming[:, None] & ~np.isnan(ema), self._alpha * bar_close + (1 - self._alpha) * ema, ema)
+			close = np.where(forming, self.bar_close, close)
+			index = np.arange(len(self.symbols))
+			high = np.where(forming, self.high.peek(index, self.bar_high), high)
+			low = np.where(forming, self.low.peek(index, self.bar_low), low)
+
+		with np.errstate(divide='ignore', invalid='ignore'):
+			vwap = np.where(self.cum_volume > 0, self.cum_pv / self.cum_volume, np.nan)
+
+		columns = {f'ema_{int(p)}': ema[:, j] for j, p in enumerate(self.ema_periods)}
+		columns.update({
+			'atr': atr,
+			'vwap': vwap,
+			f'high_{self.range_period}': high,
+			f'low_{self.range_period}': low,
+			'close': close,
+		})
+		return pd.DataFrame(columns, index=self.symbols)
@@ -0,0 +1,92 @@
+"""
+Warm connections for latency-critical order submission.
+
+The `ConnectionWarmer` opens `connections` connections to each api host up front, then keeps them
+alive with lightweight requests every `interval` seconds. Idle connections are otherwise dropped
+(by the server or on the way), which makes the first order after a quiet spell pay a new DNS/TCP/TLS
+handshake. After a failed request of the Trader, or a failed keep-alive, the hosts are re-warmed
+straight away.
+
+    trader.warm_connections(interval=20, connections=2)
+    ...
+    trader.connection_stats()  # {host: {'connections': 2, 'requests': 1530, 'idle': 2}}
+"""
+
+from . import endpoints
+from . import crypto_endpoints
+from .detail.common import _map_concurrent
+import threading
+
+
+class ConnectionWarmer:
+	"""
+	Args:
+		trader: the Trader whose transport is kept warm
+		interval: seconds between keep-alive rounds, below the idle timeout of the servers/proxies
+		connections: the connections held open per host (the concurrent order requests expected)
+		urls: the lightweight urls requested, defaults to one per api host (stocks and crypto)
+	"""
+
+	def __init__(self, trader, interval=20, connections=2, urls=None):
+		self.trader = trader
+		self.interval = interval
+		self.connections = connections
+		self.urls = urls or [endpoints.markets(), crypto_endpoints.accounts()]
+		self.rounds = 0
+		self.errors = 0
+		self.rewarms = 0
+		self._wake = threading.Event()
+		self._stopped = threading.Event()
+		self._thread = None
+
+	def start(self):
+		if self._thread and self._thread.is_alive():
+			return self
+		self._stopped.clear()
+		self.warm()
+		self._thread = threading.Thread(target=self._run, daemon=True)
+		self._thread.start()
+		return self
+
+	def stop(self):
+		self._stopped.set()
+		self._wake.set()
+		if self._thread:
+			self._thread.join()
+
+	def rewarm(self):
+		"""Re-warms on the keep-alive thread without delay (ie: after a failed request)"""
+		self.rewarms += 1
+		self._wake.set()
+
+	def warm(self):
+		"""Sends `connections` concurrent requests to every url, each on its own (pooled) connection"""
+		trader = self.trader
+
+		def ping(url):
+			try:
+				trader.transport.get(trader._url(url), timeout=trader.request_timeout)
+				return True
+			except Exception:
+				return False
+
+		results = _map_concurrent(ping, [url for url in self.urls for _ in range(self.connections)],
+								  len(self.urls) * self.connections)
+		self.rounds += 1
+		self.errors += results.count(False)
+		return all(results)
+
+	def _run(self):
+		while not self._stopped.is_set():
+			self._wake.wait(self.interval)
+			self._wake.clear()
+			if self._stopped.is_set():
+				return
+			if not self.warm():
+				# retried a second later rather than after a full interval
+				self._wake.set()
+				self._stopped.wait(1)
+
+	def stats(self):
+		return {'rounds': self.rounds, 'errors': self.errors, 'rewarms': self.rewarms,
+				'hosts': self.trader.transport.stats()}
@@ -0,0 +1,187 @@
+"""
+Market hours for the polling loops.
+
+`MarketCalendar` loads the hours of each trading day once (`markets/{mic}/hours/{date}/`, regular and
+extended sessions) and tells a poller how long to sleep: its interval during the regular session, a
+slower cadence during pre-market and after-hours, and until the next (extended) open while the market
+is closed. Every sleep is cut short at the next session boundary, so polling resumes right at the open.
+
+    while True:
+        trader.calendar.sleep(5)  # 5s in the regular session, 50s in extended hours, else until the open
+        ...
+
+Crypto trades around the clock, `trader.crypto.calendar` is `ALWAYS_OPEN`.
+"""
+
+from . import endpoints
+from .detail.common import iso_to_ns
+from datetime import datetime, timedelta, timezone
+import threading
+import time
+
+REGULAR = 'regular'
+EXTENDED = 'extended'
+CLOSED = 'closed'
+
+
+class MarketCalendar:
+	"""
+	Args:
+		trader: the Trader whose requests load the hours
+		mic: the market (ie: 'XNYS'), defaults to the first of `markets()` (preferring XNYS)
+		extended_slowdown: the poll intervals are multiplied by this during extended hours
+		lookahead_days: the most days looked ahead for the next open (weekends, holidays)
+	"""
+
+	def __init__(self, trader, mic=None, extended_slowdown=10, lookahead_days=10):
+		self.trader = trader
+		self.mic = mic
+		self.extended_slowdown = extended_slowdown
+		self.lookahead_days = lookahead_days
+		self._hours = {}  # {'YYYY-MM-DD': (extended open, open, close, extended close) epoch seconds, or None}
+		self._lock = threading.Lock()
+
+	def __getstate__(self):
+		state = self.__dict__.copy()
+		del state['_lock']
+		return state
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self._lock = threading.Lock()
+
+	###########################################################################
+	#                               HOURS
+	###########################################################################
+
+	def _market(self):
+		if self.mic is None:
+			markets = self.trader._req_get(endpoints.markets())['results']
+			mics = [market['mic'] for market in markets]
+			self.mic = 'XNYS' if 'XNYS' in mics else mics[0]
+		return self.mic
+
+	def hours(self, date):
+		"""
+		The (cached) sessions of a day as epoch seconds: (extended open, open, close, extended close),
+		None if the market does not open that day.
+
+		Args:
+			date: 'YYYY-MM-DD' or a date
+		"""
+		date = str(date)[:10]
+		with self._lock:
+			if date in self._hours:
+				return self._hours[date]
+
+		json = self.trader._req_get(endpoints.market_hours(self._market(), date))
+		sessions = None
+		if json.get('is_open'):
+			opens, closes = iso_to_ns(json['opens_at']) / 1e9, iso_to_ns(json['closes_at']) / 1e9
+			extended_opens = json.get('extended_opens_at')
+			extended_closes = json.get('extended_closes_at')
+			sessions = (iso_to_ns(extended_opens) / 1e9 if extended_opens else opens, opens, closes,
+						iso_to_ns(extended_closes) / 1e9 if extended_closes else closes)
+		with self._lock:
+			self._hours[date] = sessions
+		return sessions
+
+	def _sessions(self, now):
+		"""The sessions of the trading day in progress or the next one, None if none is found"""
+		# the day before too: the trading day in progress may have started on the previous utc date
+		day = datetime.fromtimestamp(now, timezone.utc).date() - timedelta(days=1)
+		for i in range(self.lookahead_days + 1):
+			sessions = self.hours(day + timedelta(days=i))
+			if sessions and now < sessions[3]:
+				return sessions
+		return None
+
+	def session(self, now=None) -> str:
+		"""REGULAR, EXTENDED or CLOSED"""
+		now = now or time.time()
+		sessions = self._sessions(now)
+		if sessions is None or now < sessions[0]:
+			return CLOSED
+		return REGULAR if sessions[1] <= now < sessions[2] else EXTENDED
+
+	def is_open(self, extended=False, now=None) -> bool:
+		session = self.session(now)
+		return session == REGULAR or (extended and session == EXTENDED)
+
+	def next_boundary(self, now=None):
+		"""The epoch seconds of the next open or close (regular or extended), None if unknown"""
+		now = now or time.time()
+		sessions = self._sessions(now)
+		return next((at for at in sessions if at > now), None) if sessions else None
+
+	def next_open(self, extended=True, now=None):
+		"""The epoch seconds of the next (extended) open, `now` if already open"""
+		now = now or time.time()
+		sessions = self._sessions(now)
+		if sessions is None:
+			return None
+		opens = sessions[0] if extended else sessions[1]
+		if now >= opens and (extended or now < sessions[2]):
+			return now
+		if now < opens:
+			return opens
+		return self.next_open(extended, sessions[3])
+
+	###########################################################################
+	#                               POLLING
+	###########################################################################
+
+	def delay(self, interval, now=None) -> float:
+		"""Seconds a poller with `interval` should sleep now"""
+		now = now or time.time()
+		try:
+			session = self.session(now)
+			boundary = self.next_boundary(now)
+		except Exception:
+			# the hours could not be loaded, keep polling as usual
+			return interval
+		delay = {REGULAR: interval, EXTENDED: interval * self.extended_slowdown}.get(session, float('inf'))
+		if boundary is not None:
+			delay = min(delay, boundary - now)
+		elif delay == float('inf'):
+			delay = 3600.0  # no open within the lookahead, check again in a while
+		return max(delay, 0.0)
+
+	def sleep(self, interval, stop: threading.Event = None):
+		"""
+		Sleeps for `delay(interval)`, or until `stop` is set.
+		Returns True if `stop` was set.
+		"""
+		delay = self.delay(interval)
+		if stop is not None:
+			return stop.wait(delay)
+		time.sleep(delay)
+		return False
+
+
+class _AlwaysOpen:
+	"""The calendar of the markets that never close (crypto)"""
+
+	def session(self, now=None) -> str:
+		return REGULAR
+
+	def is_open(self, extended=False, now=None) -> bool:
+		return True
+
+	def next_boundary(self, now=None):
+		return None
+
+	def next_open(self, extended=True, now=None):
+		return now or time.time()
+
+	def delay(self, interval, now=None) -> float:
+		return interval
+
+	def sleep(self, interval, stop: threading.Event = None):
+		if stop is not None:
+			return stop.wait(interval)
+		time.sleep(interval)
+		return False
+
+
+ALWAYS_OPEN = _AlwaysOpen()
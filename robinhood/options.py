@@ -0,0 +1,140 @@
+from . import endpoints
+from .detail.common import _map_concurrent, _chunks
+import numpy as np
+import pandas as pd
+
+# option instrument urls per market-data request (the urls make up the query string)
+market_data_batch_size = 40
+
+try:
+	from scipy.special import ndtr as _norm_cdf
+except ImportError:
+	def _norm_cdf(x):
+		"""standard normal cdf, Abramowitz & Stegun 7.1.26 (absolute error < 1.5e-7)"""
+		z = np.abs(x) / np.sqrt(2)
+		t = 1 / (1 + 0.3275911 * z)
+		poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+		erf = 1 - poly * np.exp(-z * z)
+		return 0.5 * (1 + np.sign(x) * erf)
+
+
+def _norm_pdf(x):
+	return np.exp(-0.5 * x * x) / np.sqrt(2 * np.pi)
+
+
+def black_scholes(spot, strike, years, volatility, is_call, rate=0.0, dividend_yield=0.0):
+	"""
+	Vectorized Black-Scholes(-Merton) values and greeks, every argument may be an array.
+
+	Returns: dict of arrays
+		theo, delta, gamma, vega (per 1.00 of volatility), theta (per year), rho (per 1.00 of rate)
+	Options that are expired or lack a volatility are NaN.
+	"""
+	spot, strike, years, volatility, is_call = np.broadcast_arrays(
+		np.asarray(spot, dtype=float), np.asarray(strike, dtype=float), np.asarray(years, dtype=float),
+		np.asarray(volatility, dtype=float), np.asarray(is_call, dtype=bool))
+
+	with np.errstate(divide='ignore', invalid='ignore'):
+		valid = (years > 0) & (volatility > 0)
+		years = np.where(valid, years, np.nan)
+		sqrt_t = np.sqrt(years)
+		d1 = (np.log(spot / strike) + (rate - dividend_yield + 0.5 * volatility ** 2) * years) / (volatility * sqrt_t)
+		d2 = d1 - volatility * sqrt_t
+
+		discount = np.exp(-rate * years)
+		carry = np.exp(-dividend_yield * years)
+		sign = np.where(is_call, 1.0, -1.0)
+
+		cdf_d1 = _norm_cdf(sign * d1)
+		cdf_d2 = _norm_cdf(sign * d2)
+		pdf_d1 = _norm_pdf(d1)
+
+		theo = sign * (spot * carry * cdf_d1 - strike * discount * cdf_d2)
+		delta = sign * carry * cdf_d1
+		gamma = carry * pdf_d1 / (spot * volatility * sqrt_t)
+		vega = spot * carry * pdf_d1 * sqrt_t
+		theta = -spot * carry * pdf_d1 * volatility / (2 * sqrt_t) \
+			- sign * rate * strike * discount * cdf_d2 \
+			+ sign * dividend_yield * spot * carry * cdf_d1
+		rho = sign * strike * years * discount * cdf_d2
+
+	return {'theo': theo, 'delta': delta, 'gamma': gamma, 'vega': vega, 'theta': theta, 'rho': rho}
+
+
+def _float_column(rows, key):
+	return np.array([row.get(key) if row else None for row in rows], dtype=float)
+
+
+def option_chain(trader, symbol, expirations=None, type=None, rate=0.0, dividend_yield=0.0, max_workers=8):
+	"""
+	Loads an options chain.
+
+	The chain is resolved through the (cached) instrument id, option instruments are paged through
+	per type, market data is fetched with batched multi-instrument requests (concurrently) and the
+	greeks are computed with NumPy over the whole chain at once.
+
+	Returns: DataFrame with the columns
+		id, expiration_date, strike_price, type, bid, ask, mark, volume, open_interest,
+		implied_volatility, years, theo, delta, gamma, vega, theta, rho
+		The underlying price used is stored in `DataFrame.attrs['underlying_price']`.
+	"""
+	symbol = symbol.upper()
+	instrument_id = trader._instrument_id(symbol)
+	chains = trader._req_get(endpoints.chain(instrument_id))['results']
+	chain = next((c for c in chains if c.get('can_open_position', True)), None)
+	if not chain:
+		raise Exception(f"No options chain for: {symbol}")
+
+	if isinstance(expirations, str):
+		expirations = [expirations]
+	expirations = sorted(expirations or chain['expiration_dates'])
+	types = [type] if type else ['call', 'put']
+	for option_type in types:
+		assert (option_type in ['call', 'put'])
+
+	def fetch_instruments(option_type):
+		return list(trader._paginate(endpoints.options(chain['id'], ','.join(expirations), option_type)))
+
+	instruments = [i for page in _map_concurrent(fetch_instruments, types, max_workers) for i in page]
+
+	def fetch_market_data(urls):
+		return trader._req_get(endpoints.market_data_many(urls))['results']
+
+	chunks = _chunks([instrument['url'] for instrument in instruments], market_data_batch_size)
+	market_data = {}
+	for page in _map_concurrent(fetch_market_data, chunks, max_workers):
+		for data in page:
+			if data:
+				market_data[data['instrument'].rstrip('/').rsplit('/', 1)[-1]] = data
+
+	underlying_price = trader.quote(symbol).mark
+	data = [market_data.get(instrument['id']) for instrument in instruments]
+
+	expiration_dates = pd.DatetimeIndex([instrument['expiration_date'] for instrument in instruments])
+	# options expire at the close, 16:00 New York time
+	expiry = (expiration_dates + pd.Timedelta(hours=16)).tz_localize('America/New_York')
+	now = pd.Timestamp.now(tz='UTC')
+	years = ((expiry - now) / pd.Timedelta(days=365)).to_numpy(dtype=float)
+
+	strike = np.array([instrument['strike_price'] for instrument in instruments], dtype=float)
+	is_call = np.array([instrument['type'] == 'call' for instrument in instruments], dtype=bool)
+	volatility = _float_column(data, 'implied_volatility')
+	greeks = black_scholes(underlying_price, strike, years, volatility, is_call, rate, dividend_yield)
+
+	df = pd.DataFrame({
+		'id': [instrument['id'] for instrument in instruments],
+		'expiration_date': expiration_dates,
+		'strike_price': strike,
+		'type': [instrument['type'] for instrument in instruments],
+		'bid': _float_column(data, 'bid_price'),
+		'ask': _float_column(data, 'ask_price'),
+		'mark': _float_column(data, 'adjusted_mark_price'),
+		'volume': _float_column(data, 'volume'),
+		'open_interest': _float_column(data, 'open_interest'),
+		'implied_volatility': volatility,
+		'years': years,
+		**greeks,
+	})
+	df.sort_values(['expiration_date', 'type', 'strike_price'], inplace=True, ignore_index=True)
+	df.attrs.update({'symbol': symbol, 'underlying_price': underlying_price, 'time': now})
+	return df
@@ -1,17 +1,23 @@
 from .detail.const_dict import ConstDict
-from .detail.common import timestamp_now, _to_float
+from .detail.common import time_ns_now, ns_to_timestamp, iso_to_ns_array, ns_to_index, _to_float
 from datetime import datetime
-from .common.ticker import Ticker
+
+# states from which an order can no longer be filled or canceled
+closed_states = ['cancelled', 'canceled', 'filled', 'rejected', 'failed']
+canceled_states = ['cancelled', 'canceled']
 
 class OrderBase(ConstDict):
 	def __init__(self, order: dict, init_local_time=True):
-		if init_local_time:
-			order['time'] = timestamp_now()
 		ConstDict.__init__(self, order)
+		# epoch nanoseconds of when the order was placed, only for the orders placed in this session
+		self.time_ns = time_ns_now() if init_local_time else None
+		self._time = None
 
 	@property
 	def time(self) -> datetime:
-		return self._dict['time'] if 'time' in self._dict else None
+		if self._time is None and self.time_ns is not None:
+			self._time = ns_to_timestamp(self.time_ns)
+		return self._time
 
 
 class Order(OrderBase):
@@ -36,22 +42,22 @@ class Order(OrderBase):
 	}
 	"""
 
-	def __init__(self, trader, order: dict, init_local_time=True):
+	def __init__(self, trader, order: dict, init_local_time=True, trace=None):
 		OrderBase.__init__(self, order, init_local_time)
 		self._trader = trader
+		self.trace = trace  # the `robinhood.tracing.OrderTrace` of orders placed in this session
 		self.__trailing_stoploss_max_price = self.price #not always used
 		self.__trailing_stoploss_percent = None
 
 	def update(self):
 		"""Update this order's information by pinging robinhood"""
-		update_dict = self._trader.order(self._dict)._dict
-
-		# historical orders will not have time,
-		# orders made during this session will have a pd.Timestamp added to them
-		if 'time' in self:
-			update_dict['time'] = self.time
+		# the local `time` (of orders made during this session) is kept, it is not part of the json
+		self._dict = self._trader.order(self._dict)._dict
+		self._trace_update()
 
-		self._dict = update_dict
+	def _trace_update(self):
+		if self.trace and self._dict.get('state') == 'filled':
+			self.trace.on_filled(self._dict)
 
 	def cancel(self):
 		"""Cancel this order, does not check if ordered has been executed"""
@@ -66,12 +72,12 @@ class Order(OrderBase):
 		return self.status(update) in ['cancelled', 'canceled']
 
 	def is_open(self, update=True):
-		return self.status(update) not in ['cancelled', 'canceled', 'filled']
+		return self.status(update) not in closed_states
 
 	def status(self, update=True):
 		"""Returns state of order, return values are 'filled', 'cancelled', 'pending', 'queued'?"""
 		status = self._dict['state']
-		if update and status not in ['cancelled', 'canceled', 'filled']:
+		if update and status not in closed_states:
 			self.update()
 			status = self._dict['state']
 		return status
@@ -94,7 +100,7 @@ class Order(OrderBase):
 			raise Exception("add_stop_loss must be called on a buy-order")
 
 		thread = Thread(target=self._poll_for_stoploss, args=[percent, poll_rate_seconds])
-		setattr(self, '__max_price_since_order', self.price)
+		self._stoploss_max_price = self.price
 		thread.run()
 
 	def _poll_for_stoploss(self, percent, poll_rate_seconds):
@@ -102,24 +108,24 @@ class Order(OrderBase):
 		def __sell_off():
 			self._trader.sell(self.symbol, quantity=self.quantity)
 
-		ticker = Ticker(poll_rate_seconds)
 		relative_percent = 1 - percent
 
 		while True:
-			if ticker.tick():
-				self.update()
-				if self.filled():
-					quote = self._trader.quote(self.symbol)
-					price = quote.price
-					if self.__trailing_stoploss_max_price < price:
-						self.__trailing_stoploss_max_price = price
-					elif price < self.__stoploss_max_price * relative_percent:
-						__sell_off()
-						return
-
-				if self.canceled():
+			# idles outside of the trading sessions (crypto orders never idle)
+			self._trader.calendar.sleep(poll_rate_seconds)
+			self.update()
+			if self.filled():
+				# pollers of the same symbol share a quote through the trader's quote cache
+				price = self._trader.quote(self.symbol, max_age=poll_rate_seconds / 2).mark
+				if self._stoploss_max_price < price:
+					self._stoploss_max_price = price
+				elif price < self._stoploss_max_price * relative_percent:
+					__sell_off()
 					return
 
+			if self.canceled():
+				return
+
 class CryptoOrder(Order):
 	"""
 	Example json:
@@ -145,17 +151,6 @@ class CryptoOrder(Order):
 	}
 	"""
 
-	def update(self):
-		# TODO- can we find a way to query a single crypto-order?
-		order_id = self._dict['id']
-		orders = self._trader.orders()
-		crypto_order = next(order for order in orders if order['id'] == order_id)
-		update_dict = crypto_order._dict
-		if self.time:
-			update_dict['time'] = self.time
-
-		self._dict = update_dict
-
 	def status(self, update=True):
 		if update:
 			self.update()
@@ -163,4 +158,147 @@ class CryptoOrder(Order):
 
 	@property
 	def quantity(self) -> float:
-		return float(self._dict['quantity'])
\ No newline at end of file
+		return float(self._dict['quantity'])
+
+class OrderCollection:
+	"""
+	The orders of one or more pages, kept as the raw json.
+
+	`Order` objects are only created for the items accessed, the id, symbol and state indexes
+	are built on first use, and `column`/`to_frame` give columnar (NumPy/pandas) views for
+	vectorized filtering and aggregation:
+
+		orders = trader.orders(all_pages=True)
+		orders.by_id(order_id)
+		orders.by_symbol('AAPL').open()
+		filled = orders.filter(orders.column('cumulative_quantity') > 0)
+		notional = (filled.column('cumulative_quantity') * filled.column('average_price')).sum()
+	"""
+
+	def __init__(self, trader, orders: list, order_type=Order):
+		self.json = orders
+		self._trader = trader
+		self._order_type = order_type
+		self._orders = [None] * len(orders)
+		self._columns = {}
+		self._ids = None
+		self._symbols = None
+		self._by_symbol = None
+		self._by_state = None
+
+	def __len__(self):
+		return len(self.json)
+
+	def __iter__(self):
+		for i in range(len(self.json)):
+			yield self._order(i)
+
+	def __getitem__(self, item):
+		if isinstance(item, slice):
+			return self._subset(range(len(self.json))[item])
+		return self._order(range(len(self.json))[item])
+
+	def __repr__(self):
+		return f'<OrderCollection of {len(self)} orders>'
+
+	def _order(self, i):
+		order = self._orders[i]
+		if order is None:
+			order = self._orders[i] = self._order_type(self._trader, self.json[i], False)
+		return order
+
+	def _subset(self, positions):
+		subset = OrderCollection(self._trader, [self.json[i] for i in positions], self._order_type)
+		subset._orders = [self._orders[i] for i in positions]
+		return subset
+
+	###########################################################################
+	#                               INDEXES
+	###########################################################################
+
+	def by_id(self, order_id):
+		"""The Order with `order_id`, raises KeyError if it is not in the collection"""
+		if self._ids is None:
+			self._ids = {order['id']: i for i, order in enumerate(self.json)}
+		return self._order(self._ids[order_id])
+
+	def symbols(self) -> list:
+		"""The symbol of every order, the instruments/currency pairs are resolved in bulk (and cached)"""
+		if self._symbols is None:
+			if issubclass(self._order_type, CryptoOrder):
+				pairs = self._trader.pairs
+				symbols = []
+				for order in self.json:
+					try:
+						symbols.append(pairs.by_id(order['currency_pair_id']).symbol)
+					except KeyError:
+						symbols.append(None)
+			elif all('symbol' in order for order in self.json):
+				symbols = [order['symbol'] for order in self.json]
+			else:
+				ids = [order['instrument'].rstrip('/').rsplit('/', 1)[-1] for order in self.json]
+				instruments = self._trader._instruments_by_id(ids)
+				symbols = [instruments[id]['symbol'] if id in instruments else None for id in ids]
+			self._symbols = symbols
+		return self._symbols
+
+	def by_symbol(self, symbol):
+		"""The orders of a symbol ('AAPL', or 'BTC' for crypto)"""
+		if self._by_symbol is None:
+			self._by_symbol = {}
+			for i, order_symbol in enumerate(self.symbols()):
+				self._by_symbol.setdefault(order_symbol, []).append(i)
+		return self._subset(self._by_symbol.get(symbol.upper(), []))
+
+	def _state_index(self):
+		if self._by_state is None:
+			self._by_state = {}
+			for i, order in enumerate(self.json):
+				self._by_state.setdefault(order['state'], []).append(i)
+		return self._by_state
+
+	def by_state(self, *states):
+		"""The orders in any of `states`"""
+		index = self._state_index()
+		return self._subset(sorted(i for state in states for i in index.get(state, [])))
+
+	def open(self):
+		"""The orders that can still be filled or canceled"""
+		return self.by_state(*(state for state in self._state_index() if state not in closed_states))
+
+	###########################################################################
+	#                               COLUMNS
+	###########################################################################
+
+	def column(self, key):
+		"""
+		A NumPy array of a field of every order: floats (NaN if missing) for the numeric fields,
+		datetime64[ns] (UTC) for the `*_at` fields, objects otherwise.
+		"""
+		if key not in self._columns:
+			import numpy as np
+			values = [order.get(key) for order in self.json]
+			if key.endswith('_at'):
+				column = iso_to_ns_array(values).view('datetime64[ns]')
+			elif key in ('price', 'stop_price', 'quantity', 'cumulative_quantity', 'average_price', 'fees',
+						 'rounded_executed_notional'):
+				column = np.array(values, dtype=float)
+			else:
+				column = np.array(values, dtype=object)
+			self._columns[key] = column
+		return self._columns[key]
+
+	def filter(self, mask):
+		"""The orders where the boolean `mask` (ie: from comparisons of columns) is True"""
+		import numpy as np
+		return self._subset(np.flatnonzero(mask).tolist())
+
+	def to_frame(self):
+		"""A DataFrame of the orders, indexed by id"""
+		import pandas as pd
+		keys = ['side', 'type', 'state', 'price', 'quantity', 'cumulative_quantity', 'average_price',
+				'created_at', 'updated_at']
+		columns = {key: ns_to_index(self.column(key).view('int64')) if key.endswith('_at') else self.column(key)
+				   for key in keys}
+		df = pd.DataFrame({'symbol': self.symbols(), **columns}, index=pd.Index(self.column('id'), name='id'))
+		return df
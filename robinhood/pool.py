@@ -0,0 +1,215 @@
+"""
+A process pool of Traders sharing one authenticated session and one request-rate budget.
+
+The parent process owns the login and refreshes the auth token (`Trader.refresh_auth`), workers
+never log in: they start from a copy of the parent's Trader and pick up every new token from
+shared memory before their next request. All workers draw from a single token-bucket rate budget.
+
+    trader = Trader.load_session('session')
+    with TraderPool(trader, processes=8, requests_per_second=20) as pool:
+        frames = pool.map('historical_quotes', symbols, interval='day', span='year')
+        scores = pool.apply(screen, symbols)  # screen(trader, symbol), a module-level function
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from .transport import Transport
+import multiprocessing
+import pickle
+import threading
+import time
+
+# the Trader read methods `submit`/`map` run in the workers, anything else (orders, auth, files) stays in the parent
+read_methods = {
+	'account', 'dividends', 'fundamentals', 'fundamentals_many', 'historical_quotes', 'instrument', 'instruments_many',
+	'option_chain', 'order', 'orderbook', 'orders', 'portfolio', 'portfolio_snapshot', 'positions', 'quote', 'quotes',
+}
+
+_max_token_size = 4096
+
+
+class _SharedAuth:
+	"""The current auth token in shared memory, with a version counter bumped on every change"""
+
+	def __init__(self, context):
+		self.lock = context.Lock()
+		self.token = context.Array('c', _max_token_size, lock=False)
+		self.version = context.Value('q', 0, lock=False)
+
+	def publish(self, token):
+		token = token.encode()
+		if len(token) >= _max_token_size:
+			raise Exception(f"Auth token too large to share: {len(token)} bytes")
+		with self.lock:
+			self.token.value = token
+			self.version.value += 1
+
+	def read(self):
+		"""Returns: (version, token)"""
+		with self.lock:
+			return self.version.value, self.token.value.decode()
+
+
+class _RateBudget:
+	"""A token bucket in shared memory, refilled at `rate` requests per second up to `burst`"""
+
+	def __init__(self, context, rate, burst=None):
+		self.rate = float(rate)
+		self.burst = float(burst or max(rate, 1))
+		self.lock = context.Lock()
+		self.tokens = context.Value('d', self.burst, lock=False)
+		# time.monotonic is system wide (CLOCK_MONOTONIC), comparable between processes
+		self.updated = context.Value('d', time.monotonic(), lock=False)
+
+	def acquire(self):
+		"""Blocks until a request may be made"""
+		while True:
+			with self.lock:
+				now = time.monotonic()
+				tokens = min(self.burst, self.tokens.value + (now - self.updated.value) * self.rate)
+				self.updated.value = now
+				if tokens >= 1:
+					self.tokens.value = tokens - 1
+					return
+				self.tokens.value = tokens
+			time.sleep((1 - tokens) / self.rate)
+
+
+class _WorkerTransport(Transport):
+	"""Wraps a worker's transport: syncs the shared auth token and draws from the rate budget per request"""
+
+	def __init__(self, transport, auth, budget):
+		self.transport = transport
+		self.auth = auth
+		self.budget = budget
+		self.version = None
+
+	@property
+	def headers(self):
+		return self.transport.headers
+
+	@headers.setter
+	def headers(self, headers):
+		self.transport.headers = headers
+
+	def _before_request(self):
+		# unlocked peek, the token is only re-read after the parent published a new one
+		if self.auth.version.value != self.version:
+			self.version, token = self.auth.read()
+			if token:
+				self.transport.headers['Authorization'] = 'Bearer ' + token
+		if self.budget:
+			self.budget.acquire()
+
+	def get(self, url, timeout=None, **kwargs):
+		self._before_request()
+		return self.transport.get(url, timeout=timeout, **kwargs)
+
+	def post(self, url, data=None, timeout=None, **kwargs):
+		self._before_request()
+		return self.transport.post(url, data=data, timeout=timeout, **kwargs)
+
+	def close(self):
+		self.transport.close()
+
+
+# the Trader of a worker process, set by `_init_worker`
+_trader = None
+
+
+def _init_worker(trader_state, auth, budget):
+	global _trader
+	# unpickling gives the worker its own connections (none are shared with the parent)
+	_trader = pickle.loads(trader_state)
+	_trader.transport = _WorkerTransport(_trader.transport, auth, budget)
+
+
+def _call_method(name, args, kwargs):
+	return getattr(_trader, name)(*args, **kwargs)
+
+
+def _call_function(func, args, kwargs):
+	return func(_trader, *args, **kwargs)
+
+
+class TraderPool:
+	"""
+	Args:
+		trader: a logged in Trader, owned by this (the parent) process
+		processes: worker processes, defaults to the cpu count
+		requests_per_second: the request rate of all workers together, None for no limit
+		burst: requests that may be made at once after an idle period, defaults to `requests_per_second`
+		refresh_interval: seconds between token refreshes by the parent, None to only refresh on `refresh()`
+		mp_context: a `multiprocessing` context (ie: multiprocessing.get_context('spawn'))
+	"""
+
+	def __init__(self, trader, processes=None, requests_per_second=20, burst=None, refresh_interval=6 * 3600,
+				 mp_context=None):
+		if not trader.auth_token:
+			raise Exception("TraderPool requires a logged in Trader")
+		self.trader = trader
+		context = mp_context or multiprocessing.get_context()
+		self._auth = _SharedAuth(context)
+		self._auth.publish(trader.auth_token)
+		self._budget = _RateBudget(context, requests_per_second, burst) if requests_per_second else None
+		self._executor = ProcessPoolExecutor(
+			max_workers=processes, mp_context=context, initializer=_init_worker,
+			initargs=(pickle.dumps(trader), self._auth, self._budget))
+
+		self._closed = threading.Event()
+		self._refresher = None
+		if refresh_interval:
+			self._refresher = threading.Thread(target=self._refresh_loop, args=(refresh_interval,), daemon=True)
+			self._refresher.start()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	###########################################################################
+	#                               AUTH
+	###########################################################################
+
+	def refresh(self):
+		"""Refreshes the auth token in the parent and hands it to the workers (before their next request)"""
+		if not self.trader.refresh_auth():
+			raise Exception("Unable to refresh the auth token")
+		self._auth.publish(self.trader.auth_token)
+
+	def _refresh_loop(self, interval):
+		while not self._closed.wait(interval):
+			try:
+				self.refresh()
+			except Exception as e:
+				print('token refresh failed:', e)
+
+	###########################################################################
+	#                               MAPPING
+	###########################################################################
+
+	def submit(self, method, *args, **kwargs):
+		"""Calls a Trader read method in a worker, returns a Future"""
+		if method not in read_methods:
+			raise Exception(f"Not a Trader read method: {method}")
+		return self._executor.submit(_call_method, method, args, kwargs)
+
+	def map(self, method, items, *args, **kwargs):
+		"""
+		Calls `trader.<method>(item, *args, **kwargs)` for every item across the workers,
+		results are returned in input order.
+		"""
+		futures = [self.submit(method, item, *args, **kwargs) for item in items]
+		return [future.result() for future in futures]
+
+	def apply(self, func, items, *args, **kwargs):
+		"""
+		Calls `func(trader, item, *args, **kwargs)` for every item across the workers, with the worker's Trader.
+		`func` must be picklable (a module-level function), results are returned in input order.
+		"""
+		futures = [self._executor.submit(_call_function, func, (item,) + args, kwargs) for item in items]
+		return [future.result() for future in futures]
+
+	def close(self):
+		self._closed.set()
+		self._executor.shutdown()
@@ -0,0 +1,95 @@
+from . import endpoints
+from .detail.common import _map_concurrent, timestamp_now
+import numpy as np
+import pandas as pd
+
+
+def _instrument_id(instrument_url):
+	return instrument_url.rstrip('/').rsplit('/', 1)[-1]
+
+
+def _equity_rows(trader, max_workers):
+	positions = [p for p in trader._paginate(endpoints.positions(nonzero=True)) if float(p['quantity'])]
+	ids = [_instrument_id(p['instrument']) for p in positions]
+	instruments = trader._instruments_by_id(ids, max_workers)
+	positions = [p for p, id in zip(positions, ids) if id in instruments]
+	symbols = [instruments[_instrument_id(p['instrument'])]['symbol'] for p in positions]
+	quotes = trader.quotes(symbols, max_workers)
+
+	return [(symbol, 'equity', p['quantity'], p['average_buy_price'], quote.mark if quote else None)
+			for symbol, p, quote in zip(symbols, positions, quotes)]
+
+
+def _crypto_rows(trader):
+	holdings = [h for h in trader.crypto.holdings() if float(h['quantity'])]
+	symbols = [h['currency']['code'] for h in holdings]
+	quotes = trader.crypto.quotes(symbols)
+
+	rows = []
+	for symbol, holding, quote in zip(symbols, holdings, quotes):
+		cost = sum(float(basis['direct_cost_basis']) for basis in holding['cost_bases'])
+		quantity = sum(float(basis['direct_quantity']) for basis in holding['cost_bases'])
+		average_cost = cost / quantity if quantity else None
+		rows.append((symbol, 'crypto', holding['quantity'], average_cost, quote.mark if quote else None))
+	return rows
+
+
+def snapshot(trader, include_crypto=True, max_workers=8) -> pd.DataFrame:
+	"""
+	Builds a snapshot of every position of the account.
+
+	Positions are fetched through all pages, instruments are resolved in bulk (and cached),
+	quotes are fetched with batched multi-symbol requests. Crypto holdings are merged in when
+	`include_crypto` is set, the crypto and equity requests run concurrently.
+
+	Returns a DataFrame with the columns:
+		symbol, asset_class, quantity, average_cost, price, cost_basis,
+		market_value, unrealized_pl, unrealized_pl_pct, weight
+
+	The portfolio totals and exposures are stored in `DataFrame.attrs`.
+	"""
+	tasks = [lambda: _equity_rows(trader, max_workers)]
+	if include_crypto:
+		tasks.append(lambda: _crypto_rows(trader))
+	rows = [row for rows in _map_concurrent(lambda task: task(), tasks) for row in rows]
+
+	symbols = [row[0] for row in rows]
+	asset_classes = [row[1] for row in rows]
+	quantity, average_cost, price = (np.array([row[i] for row in rows], dtype=float).reshape(-1)
+									 for i in (2, 3, 4))
+
+	cost_basis = quantity * average_cost
+	market_value = quantity * price
+	unrealized_pl = market_value - cost_basis
+	unrealized_pl_pct = np.divide(unrealized_pl, cost_basis,
+								  out=np.full_like(unrealized_pl, np.nan),
+								  where=cost_basis != 0)
+
+	long_exposure = np.nansum(np.clip(market_value, 0, None))
+	short_exposure = np.nansum(np.clip(-market_value, 0, None))
+	gross_exposure = long_exposure + short_exposure
+	weight = market_value / gross_exposure if gross_exposure else np.zeros_like(market_value)
+
+	df = pd.DataFrame({
+		'symbol': symbols,
+		'asset_class': asset_classes,
+		'quantity': quantity,
+		'average_cost': average_cost,
+		'price': price,
+		'cost_basis': cost_basis,
+		'market_value': market_value,
+		'unrealized_pl': unrealized_pl,
+		'unrealized_pl_pct': unrealized_pl_pct,
+		'weight': weight,
+	})
+	df.attrs.update({
+		'time': timestamp_now(),
+		'market_value': float(np.nansum(market_value)),
+		'cost_basis': float(np.nansum(cost_basis)),
+		'unrealized_pl': float(np.nansum(unrealized_pl)),
+		'long_exposure': float(long_exposure),
+		'short_exposure': float(short_exposure),
+		'gross_exposure': float(gross_exposure),
+		'net_exposure': float(long_exposure - short_exposure),
+	})
+	return df
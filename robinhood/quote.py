@@ -1,14 +1,14 @@
 from .detail.const_dict import ConstDict
-from .detail.common import timestamp_now, _to_float
-from datetime import datetime
-import pandas as pd
+from .detail.common import time_ns_now, ns_to_timestamp, iso_to_ns, _to_float
 
 
 class QuoteBase(ConstDict):
 
-	def __init__(self, quote, time=None):
-		quote['time'] = time if time else timestamp_now()
+	def __init__(self, quote, time_ns=None):
+		"""`time_ns`: epoch nanoseconds of the quote, defaults to now (when the quote was received)"""
 		ConstDict.__init__(self, quote)
+		self.time_ns = time_ns if time_ns is not None else time_ns_now()
+		self._time = None
 
 	def _get(self, key):
 		return self._dict[key]
@@ -21,8 +21,11 @@ class QuoteBase(ConstDict):
 		return self._dict['symbol']
 
 	@property
-	def time(self) -> pd.Timestamp:
-		return self._dict['time']
+	def time(self) -> 'pd.Timestamp':
+		"""the (local) time the quote was received, as a pd.Timestamp (created on first access)"""
+		if self._time is None:
+			self._time = ns_to_timestamp(self.time_ns)
+		return self._time
 
 
 class Quote(QuoteBase):
@@ -141,7 +144,14 @@ class HistoricalQuote(QuoteBase):
 	Note: historical quotes are the same for crypto/regular quotes
 	"""
 	def __init__(self, quote: dict):
-		QuoteBase.__init__(self, quote, pd.Timestamp(quote['begins_at']))
+		QuoteBase.__init__(self, quote, iso_to_ns(quote['begins_at']))
+
+	@property
+	def time(self) -> 'pd.Timestamp':
+		"""`begins_at` as a (UTC) pd.Timestamp"""
+		if self._time is None:
+			self._time = ns_to_timestamp(self.time_ns, tz='UTC')
+		return self._time
 
 	@property
 	def low(self):
@@ -0,0 +1,356 @@
+"""
+A quote board in shared memory: one publisher process polls, any number of reader processes read.
+
+The `QuotePublisher` polls batched quotes (one request per asset class and `Trader.batch_size`
+symbols) and writes the latest bid, ask, mark, sizes and `updated_at` of every symbol into a
+`multiprocessing.shared_memory` block. Readers attach by name with `QuoteBoard` and read without
+locks or requests: every row carries a sequence number, odd while the row is written (a seqlock),
+and a checksum of its values, so a reader retries the rare rows it caught mid-write. Request volume
+does not depend on the number of readers.
+
+    # publisher process
+    publisher = QuotePublisher(trader, ['AAPL', 'MSFT'], crypto_symbols=['BTC'], interval=1.0).start()
+
+    # reader processes
+    board = QuoteBoard()  # the default name, or QuotePublisher.name
+    board.quote('AAPL').mark        # a Quote (CryptoQuote with crypto=True) of the board's row
+    board.snapshot()                # every row at once, as numpy arrays
+
+The writes are plain stores to the shared memory and Python has no memory barriers: on weakly
+ordered CPUs (ie: ARM) a reader may see the stores of a row in another order than they were made,
+the sequence number alone would then accept torn rows. A reader only accepts a row whose values
+match its checksum, whatever the ordering. A row that stays mid-write (its publisher died while
+writing it) raises after the board's `timeout` rather than spinning forever.
+"""
+
+from multiprocessing import shared_memory
+from .detail.common import iso_to_ns, time_ns_now
+from .quote import Quote, CryptoQuote
+import numpy as np
+import os
+import struct
+import threading
+import time
+
+default_name = 'robinhood_quotes'
+
+_magic = 0x52485133  # 'RHQ3'
+_header_size = 5          # int64: magic, capacity, publishes, last publish (epoch ns), resource tracker
+_symbol_size = 16         # bytes per symbol
+_published = set()  # the names of the boards created by this process
+
+_value_columns = ('bid', 'ask', 'mark', 'bid_size', 'ask_size')
+_time_columns = ('updated_at', 'received')  # epoch ns
+
+# odd multipliers of the checksum, one per 64-bit word of a row (the values, then the times)
+_weights = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93,
+					 0xFF51AFD7ED558CCD, 0xC4CEB9FE1A85EC53, 0x94D049BB133111EB], dtype=np.uint64)
+_weights_list = [int(weight) for weight in _weights]
+_mask = (1 << 64) - 1
+
+
+def _tracker_id():
+	"""
+	The pipe inode of this process's resource tracker (python < 3.13), 0 if none. Processes started
+	with multiprocessing inherit the pipe, and so share the tracker of their parent.
+	"""
+	from multiprocessing import resource_tracker
+	fd = getattr(resource_tracker._resource_tracker, '_fd', None)
+	if fd is None:
+		return 0
+	try:
+		return os.fstat(fd).st_ino
+	except OSError:
+		return 0
+
+
+def _checksums(values, times):
+	"""The checksums of rows of values (float64) and times (int64), wrapping uint64 arithmetic"""
+	words = np.concatenate([np.ascontiguousarray(values).view(np.uint64),
+							np.ascontiguousarray(times).view(np.uint64)], axis=1)
+	return (words * _weights).sum(axis=1, dtype=np.uint64)
+
+
+def _checksum(words):
+	"""The checksum of one row, given its 64-bit words as ints"""
+	return sum(weight * word for weight, word in zip(_weights_list, words)) & _mask
+
+
+_row_words = struct.Struct(f'={len(_value_columns) + len(_time_columns)}Q')
+_row = struct.Struct(f'={len(_value_columns)}d{len(_time_columns)}q')
+
+
+class _Layout:
+	"""numpy views of the board in a shared memory buffer"""
+
+	def __init__(self, buffer, capacity):
+		offset = 0
+
+		def view(dtype, shape):
+			nonlocal offset
+			array = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+			offset += array.nbytes
+			return array
+
+		self.header = view(np.int64, (_header_size,))
+		self.crypto = view(np.int64, (capacity,))
+		self.symbols = view(f'S{_symbol_size}', (capacity,))
+		self.seq = view(np.uint64, (capacity,))
+		self.check = view(np.uint64, (capacity,))
+		self.values = view(np.float64, (capacity, len(_value_columns)))
+		self.times = view(np.int64, (capacity, len(_time_columns)))
+
+	@staticmethod
+	def size(capacity):
+		return 8 * _header_size + capacity * (8 + _symbol_size + 8 + 8 + 8 * len(_value_columns) + 8 * len(_time_columns))
+
+
+def _float(value):
+	return float(value) if value not in (None, '') else np.nan
+
+
+class QuotePublisher:
+	"""
+	Creates the board and keeps it up to date.
+
+	Args:
+		trader: the Trader that polls
+		symbols: the stock symbols of the board
+		crypto_symbols: the crypto symbols of the board
+		name: the shared memory name the readers attach to
+		interval: seconds between the polls (paced by `trader.calendar` if there are no crypto symbols)
+	"""
+
+	def __init__(self, trader, symbols=(), crypto_symbols=(), name=default_name, interval=1.0):
+		self.trader = trader
+		self.symbols = [symbol.upper() for symbol in symbols]
+		self.crypto_symbols = [symbol.upper() for symbol in crypto_symbols]
+		self.interval = interval
+		self.errors = 0
+		capacity = len(self.symbols) + len(self.crypto_symbols)
+		if not capacity:
+			raise Exception("A quote board needs at least one symbol")
+		for symbol in self.symbols + self.crypto_symbols:
+			if len(symbol.encode()) > _symbol_size:
+				raise Exception(f"Symbol too long for the quote board: {symbol}")
+
+		self._shm = shared_memory.SharedMemory(name=name, create=True, size=_Layout.size(capacity))
+		self.name = self._shm.name
+		_published.add(self.name)
+		self._layout = layout = _Layout(self._shm.buf, capacity)
+		layout.symbols[:] = [symbol.encode() for symbol in self.symbols + self.crypto_symbols]
+		layout.crypto[:] = [0] * len(self.symbols) + [1] * len(self.crypto_symbols)
+		layout.seq[:] = 0
+		layout.values[:] = np.nan
+		layout.times[:] = 0
+		layout.check[:] = _checksums(layout.values, layout.times)
+		layout.header[1:] = (capacity, 0, 0, _tracker_id())
+		layout.header[0] = _magic  # last, readers check it
+
+		self._stopped = threading.Event()
+		self._thread = None
+
+	def publish(self):
+		"""Polls the quotes once and writes them"""
+		rows = []
+		for crypto, symbols in ((False, self.symbols), (True, self.crypto_symbols)):
+			if symbols:
+				quotes = (self.trader.crypto if crypto else self.trader).quotes(symbols)
+				offset = len(self.symbols) if crypto else 0
+				rows.extend((offset + i, quote) for i, quote in enumerate(quotes) if quote)
+		if not rows:
+			return 0
+
+		index = np.array([i for i, _ in rows], dtype=np.int64)
+		values = np.array([(quote.bid, quote.ask, quote.mark, _float(quote._dict.get('bid_size')),
+							_float(quote._dict.get('ask_size'))) for _, quote in rows], dtype=np.float64)
+		times = np.array([(iso_to_ns(quote._dict.get('updated_at')) or 0, quote.time_ns) for _, quote in rows],
+						 dtype=np.int64)
+
+		layout = self._layout
+		layout.seq[index] += 1  # odd: being written
+		layout.values[index] = values
+		layout.times[index] = times
+		layout.check[index] = _checksums(values, times)
+		layout.seq[index] += 1  # even: consistent
+		layout.header[2] += 1
+		layout.header[3] = time_ns_now()
+		return len(rows)
+
+	def start(self):
+		if self._thread and self._thread.is_alive():
+			return self
+		self._stopped.clear()
+		self._thread = threading.Thread(target=self._run, daemon=True)
+		self._thread.start()
+		return self
+
+	def _run(self):
+		calendar = self.trader.crypto.calendar if self.crypto_symbols else self.trader.calendar
+		while not self._stopped.is_set():
+			started = time.monotonic()
+			try:
+				self.publish()
+			except Exception as e:
+				self.errors += 1
+				print('quote board publish failed:', e)
+			calendar.sleep(max(self.interval - (time.monotonic() - started), 0), self._stopped)
+
+	def stop(self):
+		self._stopped.set()
+		if self._thread:
+			self._thread.join()
+
+	def close(self):
+		"""Stops publishing and removes the board"""
+		self.stop()
+		self._layout = None
+		self._shm.close()
+		self._shm.unlink()
+		_published.discard(self.name)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+
+class QuoteBoard:
+	"""
+	A reader of a board, no Trader needed.
+
+	Args:
+		name: the shared memory name of the publisher
+		timeout: seconds a row may stay mid-write before a read raises (its publisher died while writing it)
+	"""
+
+	def __init__(self, name=default_name, timeout=1.0):
+		self.timeout = timeout
+		try:
+			self._shm = shared_memory.SharedMemory(name=name, track=False)
+			untrack = False
+		except TypeError:  # before python 3.13, untrack it or the reader's exit removes the board
+			self._shm = shared_memory.SharedMemory(name=name)
+			untrack = name not in _published
+		header = np.ndarray((_header_size,), dtype=np.int64, buffer=self._shm.buf)
+		if header[0] != _magic:
+			raise Exception(f"Not a quote board: {name}")
+		# but not from the publisher's tracker (inherited by its multiprocessing children): that would
+		# drop the publisher's own registration, and its unlink would fail in the tracker
+		if untrack and (not header[4] or header[4] != _tracker_id()):
+			from multiprocessing import resource_tracker
+			resource_tracker.unregister(self._shm._name, 'shared_memory')
+		capacity = int(header[1])
+		self._layout = layout = _Layout(self._shm.buf, capacity)
+		self.name = name
+		self.symbols = [symbol.decode() for symbol in layout.symbols]
+		self._rows = {(bool(crypto), symbol): i for i, (crypto, symbol) in enumerate(zip(layout.crypto, self.symbols))}
+
+	def close(self):
+		self._layout = None
+		self._shm.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	@property
+	def publishes(self) -> int:
+		return int(self._layout.header[2])
+
+	@property
+	def published_at_ns(self) -> int:
+		return int(self._layout.header[3])
+
+	def _read(self, index):
+		"""Consistent copies of the values and times of the rows `index` (retrying the rows being written)"""
+		layout = self._layout
+		values = np.empty((len(index), len(_value_columns)))
+		times = np.empty((len(index), len(_time_columns)), dtype=np.int64)
+		pending = np.arange(len(index))
+		spins = 0
+		deadline = None
+		while len(pending):
+			rows = index[pending]
+			before = layout.seq[rows]
+			values[pending] = layout.values[rows]
+			times[pending] = layout.times[rows]
+			check = layout.check[rows]
+			after = layout.seq[rows]
+			pending = pending[(before != after) | (before & 1 == 1)
+							  | (_checksums(values[pending], times[pending]) != check)]
+			spins += 1
+			if spins % 100 == 0 and len(pending):
+				now = time.monotonic()
+				deadline = deadline or now + self.timeout
+				if now > deadline:
+					self._stuck(index[pending[0]])
+				time.sleep(0)
+		return values, times
+
+	def _stuck(self, i):
+		raise Exception(f"The quote board row of {self.symbols[i]} stayed mid-write for {self.timeout}s, "
+						f"its publisher may have died while writing it")
+
+	def _index(self, symbols, crypto):
+		return np.array([self._rows[(crypto, symbol.upper())] for symbol in symbols], dtype=np.int64)
+
+	def quote(self, symbol, crypto=False):
+		"""The Quote (CryptoQuote) of a symbol, None if not published yet, KeyError if not on the board"""
+		i = self._rows[(crypto, symbol.upper())]
+		layout = self._layout
+		deadline = None
+		while True:
+			before = int(layout.seq[i])
+			if not before & 1:
+				row = layout.values[i].tobytes() + layout.times[i].tobytes()
+				check = int(layout.check[i])
+				if int(layout.seq[i]) == before and _checksum(_row_words.unpack(row)) == check:
+					break
+			now = time.monotonic()
+			deadline = deadline or now + self.timeout
+			if now > deadline:
+				self._stuck(i)
+			time.sleep(0)
+		row = _row.unpack(row)
+		values, times = row[:len(_value_columns)], row[len(_value_columns):]
+		return _quote(symbol.upper(), values, times, crypto) if times[1] else None
+
+	def quotes(self, symbols, crypto=False):
+		"""Quotes (CryptoQuotes) in the order of `symbols`, None for those not published yet"""
+		values, times = self._read(self._index(symbols, crypto))
+		return [_quote(symbol.upper(), row, row_times, crypto) if row_times[1] else None
+				for symbol, row, row_times in zip(symbols, values.tolist(), times.tolist())]
+
+	def snapshot(self):
+		"""
+		Every row at once: {'symbol': list, 'crypto': bool array, 'bid', 'ask', 'mark', 'bid_size',
+		'ask_size' (float arrays, NaN if not published), 'updated_at', 'received' (epoch ns arrays)}
+		"""
+		layout = self._layout
+		values, times = self._read(np.arange(len(self.symbols)))
+		snapshot = {'symbol': list(self.symbols), 'crypto': layout.crypto.astype(bool)}
+		snapshot.update({column: values[:, i] for i, column in enumerate(_value_columns)})
+		snapshot.update({column: times[:, i] for i, column in enumerate(_time_columns)})
+		return snapshot
+
+
+def _iso(ns):
+	return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(ns / 1e9)) if ns else None
+
+
+def _quote(symbol, values, times, crypto):
+	bid, ask, mark, bid_size, ask_size = values
+	if crypto:
+		quote = CryptoQuote({'symbol': symbol, 'bid_price': bid, 'ask_price': ask, 'mark_price': mark,
+							 'updated_at': _iso(times[0])})
+	else:
+		quote = Quote({'symbol': symbol, 'bid_price': bid, 'ask_price': ask, 'last_trade_price': mark,
+					   'bid_size': None if bid_size != bid_size else int(bid_size),
+					   'ask_size': None if ask_size != ask_size else int(ask_size),
+					   'updated_at': _iso(times[0])})
+	quote.time_ns = times[1]  # when the publisher received it
+	return quote
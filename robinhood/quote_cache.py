@@ -0,0 +1,114 @@
+"""
+A shared quote cache with single-flight requests.
+
+Callers asking for the same symbol at the same time share a single in-flight request. With a `max_age`
+a quote received at most that many seconds ago is returned without any request. The least recently
+used symbols are evicted beyond `max_size`.
+"""
+
+from collections import OrderedDict
+import threading
+import time
+
+
+class _Flight:
+	__slots__ = ('done', 'value', 'error')
+
+	def __init__(self):
+		self.done = threading.Event()
+		self.value = None
+		self.error = None
+
+
+class QuoteCache:
+	"""
+	Args:
+		fetch: callable(key) -> quote, makes the request
+		max_size: the most quotes kept
+	"""
+
+	def __init__(self, fetch, max_size=1024):
+		self.fetch = fetch
+		self.max_size = max_size
+		self.hits = 0       # returned from the cache
+		self.misses = 0     # requested
+		self.coalesced = 0  # shared the request of another caller
+		self._entries = OrderedDict()  # {key: (monotonic time received, quote)}
+		self._flights = {}
+		self._lock = threading.Lock()
+
+	def __getstate__(self):
+		state = self.__dict__.copy()
+		for key in ('_lock', '_flights', '_entries'):
+			del state[key]
+		return state
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self._entries = OrderedDict()
+		self._flights = {}
+		self._lock = threading.Lock()
+
+	def get(self, key, max_age=None):
+		"""
+		The quote of `key`, from the cache if received at most `max_age` seconds ago,
+		otherwise from a new request or the request in flight for the same key.
+		"""
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry and max_age is not None and time.monotonic() - entry[0] <= max_age:
+				self._entries.move_to_end(key)
+				self.hits += 1
+				return entry[1]
+
+			flight = self._flights.get(key)
+			leader = flight is None
+			if leader:
+				flight = self._flights[key] = _Flight()
+				self.misses += 1
+			else:
+				self.coalesced += 1
+
+		if not leader:
+			flight.done.wait()
+			if flight.error:
+				raise flight.error
+			return flight.value
+
+		try:
+			flight.value = self.fetch(key)
+		except BaseException as e:
+			flight.error = e
+			raise
+		finally:
+			with self._lock:
+				del self._flights[key]
+				if flight.error is None:
+					self._store(key, flight.value)
+			flight.done.set()
+		return flight.value
+
+	def put(self, key, quote):
+		"""Stores a quote received otherwise (ie: from a batched request)"""
+		with self._lock:
+			self._store(key, quote)
+
+	def _store(self, key, quote):
+		self._entries[key] = (time.monotonic(), quote)
+		self._entries.move_to_end(key)
+		while len(self._entries) > self.max_size:
+			self._entries.popitem(last=False)
+
+	def clear(self):
+		with self._lock:
+			self._entries.clear()
+
+	def stats(self) -> dict:
+		requests = self.hits + self.misses + self.coalesced
+		return {
+			'hits': self.hits,
+			'misses': self.misses,
+			'coalesced': self.coalesced,
+			'size': len(self._entries),
+			'saved_pct': (self.hits + self.coalesced) / requests * 100 if requests else None,
+		}
@@ -0,0 +1,109 @@
+"""
+Batched instrument and fundamentals retrieval for many symbols (ie: a universe screen).
+
+Symbols are sent in chunks of `Trader.batch_size` to the multi-symbol endpoints and the chunks are
+fetched concurrently. The results are returned as typed columnar DataFrames indexed by symbol, the
+symbols that could not be resolved are listed in `DataFrame.attrs['unresolved']`.
+"""
+
+from . import endpoints
+from .detail.common import _map_concurrent, _chunks
+import numpy as np
+import pandas as pd
+import re
+
+_uuid = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.IGNORECASE)
+
+fundamentals_float_columns = ('open', 'high', 'low', 'volume', 'average_volume', 'high_52_weeks', 'low_52_weeks',
+							  'market_cap', 'pe_ratio', 'pb_ratio', 'dividend_yield', 'float', 'shares_outstanding')
+instrument_float_columns = ('min_tick_size', 'day_trade_ratio', 'maintenance_ratio', 'margin_initial_ratio')
+instrument_str_columns = ('name', 'simple_name', 'type', 'state', 'tradability', 'country', 'url')
+
+
+def _instrument_id(instrument_url):
+	return instrument_url.rstrip('/').rsplit('/', 1)[-1]
+
+
+def _float_column(rows, key):
+	return np.array([row.get(key) if row else None for row in rows], dtype=float)
+
+
+def _unique(values):
+	return list(dict.fromkeys(values))
+
+
+def fundamentals_many(trader, symbols, max_workers=8) -> pd.DataFrame:
+	"""
+	Returns: DataFrame indexed by symbol with the columns
+		instrument_id, open, high, low, volume, average_volume, high_52_weeks, low_52_weeks,
+		market_cap, pe_ratio, pb_ratio, dividend_yield, float, shares_outstanding (floats, NaN if missing)
+		The symbols without fundamentals are listed in `DataFrame.attrs['unresolved']`.
+
+	Rows are matched to the symbols by their `symbol`, those without one by their `instrument` url
+	(the instrument ids not cached yet are resolved with batched quote requests), never by their
+	position in the response.
+	"""
+	symbols = _unique(symbol.upper() for symbol in symbols)
+
+	def fetch(chunk):
+		return trader._req_get(endpoints.fundamentals(symbols=chunk))['results']
+
+	pages = _map_concurrent(fetch, _chunks(symbols, trader.batch_size), max_workers)
+	results = {row['symbol'].upper(): row for page in pages for row in page if row and row.get('symbol')}
+	by_instrument = {_instrument_id(row['instrument']): row for page in pages for row in page
+					 if row and not row.get('symbol') and row.get('instrument')}
+	if by_instrument:
+		missing = [symbol for symbol in symbols if symbol not in results]
+		for symbol, instrument_id in _resolve_ids(trader, missing, max_workers).items():
+			if instrument_id in by_instrument:
+				results[symbol] = by_instrument[instrument_id]
+	rows = [results.get(symbol) for symbol in symbols]
+	resolved = [symbol for symbol, row in zip(symbols, rows) if row]
+	rows = [row for row in rows if row]
+
+	df = pd.DataFrame({'instrument_id': [_instrument_id(row['instrument']) for row in rows]},
+					  index=pd.Index(resolved, name='symbol'))
+	for column in fundamentals_float_columns:
+		df[column] = _float_column(rows, column)
+	df.attrs['unresolved'] = [symbol for symbol in symbols if not results.get(symbol)]
+	return df
+
+
+def _resolve_ids(trader, symbols, max_workers):
+	"""{symbol: instrument id} of the symbols, through the (cached) ids or batched quote requests"""
+	ids = {symbol: trader._instrument_ids[symbol] for symbol in symbols if symbol in trader._instrument_ids}
+	missing = [symbol for symbol in symbols if symbol not in ids]
+	if missing:
+		for quote in trader.quotes(missing, max_workers):
+			if quote and quote['symbol'] in missing:
+				ids[quote['symbol']] = trader._instrument_ids[quote['symbol']] = _instrument_id(quote['instrument'])
+	return ids
+
+
+def instruments_many(trader, symbols_or_ids, max_workers=8) -> pd.DataFrame:
+	"""
+	Args:
+		symbols_or_ids: stock symbols and/or instrument ids
+
+	Returns: DataFrame indexed by symbol with the columns
+		id, name, simple_name, type, state, tradability, country, url (strings),
+		tradeable (bool), min_tick_size, day_trade_ratio, maintenance_ratio, margin_initial_ratio (floats)
+		The symbols and ids that could not be resolved are listed in `DataFrame.attrs['unresolved']`.
+	"""
+	requested = _unique(value if _uuid.match(value) else value.upper() for value in symbols_or_ids)
+	symbol_ids = _resolve_ids(trader, [value for value in requested if not _uuid.match(value)], max_workers)
+	ids = _unique(value if _uuid.match(value) else symbol_ids.get(value) for value in requested)
+	instruments = trader._instruments_by_id([id for id in ids if id], max_workers)
+
+	rows = [instruments[id] for id in ids if id in instruments]
+	df = pd.DataFrame({'id': [row['id'] for row in rows]},
+					  index=pd.Index([row['symbol'] for row in rows], name='symbol'))
+	for column in instrument_str_columns:
+		df[column] = [row.get(column) for row in rows]
+	df['tradeable'] = np.array([bool(row.get('tradeable')) for row in rows], dtype=bool)
+	for column in instrument_float_columns:
+		df[column] = _float_column(rows, column)
+
+	df.attrs['unresolved'] = [value for value in requested
+							  if (value if _uuid.match(value) else symbol_ids.get(value)) not in instruments]
+	return df
@@ -0,0 +1,271 @@
+"""
+Local pre-trade risk checks for stock orders.
+
+The account, positions and open orders are loaded once, after which buying power, per-instrument
+positions and the reservations of open orders are maintained incrementally: from the orders placed
+(`on_submit`) and from every refresh of an order (`on_update`, fed by `Trader.order`/`Trader.orders`).
+Orders that would violate a limit raise `RiskRejected` before any request is made. An order that passes
+is reserved by the check itself, so concurrent orders cannot all pass the same limit. The state is
+reloaded by a background thread every `resync_interval` seconds, never in the order path.
+
+    trader.risk = RiskEngine(trader, max_position_value=10000, max_order_value=2500)
+    trader.buy('AAPL', 10, price=150.0)  # raises RiskRejected, no round trip
+"""
+
+from . import endpoints
+from .order import closed_states
+from six.moves.urllib.parse import unquote
+import threading
+import time
+
+
+class RiskRejected(Exception):
+	"""An order rejected locally by the `RiskEngine`"""
+
+
+class _Reservation:
+	__slots__ = ('instrument', 'side', 'quantity', 'price', 'filled')
+
+	def __init__(self, instrument, side, quantity, price, filled=0.0):
+		self.instrument = instrument
+		self.side = side
+		self.quantity = quantity
+		self.price = price
+		self.filled = filled
+
+	@property
+	def remaining(self):
+		return max(self.quantity - self.filled, 0.0)
+
+
+def _float(value, default=0.0):
+	return float(value) if value not in (None, '') else default
+
+
+class RiskEngine:
+	"""
+	Args:
+		trader: the Trader whose orders are checked, set it as `trader.risk` to enable the checks
+		max_order_value: limit on quantity * price of a single order
+		max_position_value: limit on the value of a position (held + open buys + the order)
+		max_position_quantity: limit on the shares of a position (held + open buys + the order)
+		max_open_orders: limit on the number of open orders
+		allow_short: allow selling more shares than are held (and not reserved by open sells)
+		buying_power_buffer: buying power kept aside, never spent by orders
+		resync_interval: seconds between reloads of the state from the server, by a background thread
+			started with the first check, None to only reload on `sync()`
+
+	The account's `buying_power` is taken as net of the open orders (as robinhood reports it).
+	"""
+
+	def __init__(self, trader, max_order_value=None, max_position_value=None, max_position_quantity=None,
+				 max_open_orders=None, allow_short=False, buying_power_buffer=0.0, resync_interval=300):
+		self.trader = trader
+		self.max_order_value = max_order_value
+		self.max_position_value = max_position_value
+		self.max_position_quantity = max_position_quantity
+		self.max_open_orders = max_open_orders
+		self.allow_short = allow_short
+		self.buying_power_buffer = buying_power_buffer
+		self.resync_interval = resync_interval
+
+		self._lock = threading.RLock()
+		self.buying_power = 0.0     # excluding the cash reserved by open buys
+		self.reserved_cash = 0.0    # remaining quantity * price of the open buys
+		self.positions = {}         # {instrument url: shares held}
+		self.pending_buys = {}      # {instrument url: remaining shares of the open buys}
+		self.pending_sells = {}     # {instrument url: remaining shares of the open sells}
+		self._open = {}             # {order id, or ('check', n) until the order is placed: _Reservation}
+		self._checks = 0
+		self._submitted = None      # {order id: _Reservation} placed while a sync is loading, else None
+		self.synced_at = None
+		self._resync = None
+		self._closed = threading.Event()
+
+	def __getstate__(self):
+		state = self.__dict__.copy()
+		del state['_lock'], state['_resync'], state['_closed']
+		return state
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self._lock = threading.RLock()
+		self._resync = None  # restarted by the next check
+		self._closed = threading.Event()
+
+	def close(self):
+		"""Stops the background resync"""
+		self._closed.set()
+
+	###########################################################################
+	#                               STATE
+	###########################################################################
+
+	def sync(self):
+		"""(Re)loads buying power, positions and open orders from the server"""
+		trader = self.trader
+		with self._lock:
+			self._submitted = {}
+		account = trader.account()
+		positions = list(trader._paginate(endpoints.positions(nonzero=True)))
+		open_orders = trader._open_orders(endpoints.orders())
+
+		with self._lock:
+			trader._account_url = account['url']
+			self.positions = {unquote(p['instrument']): _float(p['quantity']) for p in positions}
+			checked = {key: reservation for key, reservation in self._open.items() if isinstance(key, tuple)}
+			self._open = {}
+			self.reserved_cash = 0.0
+			self.pending_buys = {}
+			self.pending_sells = {}
+			for order in open_orders:
+				self._reserve(order['id'], unquote(order['instrument']), order['side'], _float(order['quantity']),
+							  _float(order.get('price')) or _float(order.get('stop_price')),
+							  _float(order.get('cumulative_quantity')))
+			self.buying_power = _float(account['buying_power']) + self.reserved_cash
+			# the orders checked but not placed yet are not in the account's numbers
+			for key, reservation in checked.items():
+				self._open[key] = reservation
+				self._adjust(reservation, reservation.remaining)
+			# nor, maybe, the orders placed while it loaded
+			for order_id, reservation in self._submitted.items():
+				if order_id not in self._open and reservation.remaining:
+					self._open[order_id] = reservation
+					self._adjust(reservation, reservation.remaining)
+			self._submitted = None
+			self.synced_at = time.monotonic()
+
+	def _start_resync(self):
+		with self._lock:
+			if self._resync is None and self.resync_interval and not self._closed.is_set():
+				self._resync = threading.Thread(target=self._resync_loop, name='risk-resync', daemon=True)
+				self._resync.start()
+
+	def _resync_loop(self):
+		while not self._closed.wait(self.resync_interval):
+			try:
+				self.sync()
+			except Exception as e:
+				print('risk resync failed:', e)
+
+	def _reserve(self, order_id, instrument, side, quantity, price, filled=0.0):
+		reservation = _Reservation(instrument, side, quantity, price, filled)
+		self._open[order_id] = reservation
+		self._adjust(reservation, reservation.remaining)
+
+	def _adjust(self, reservation, quantity):
+		"""Adds `quantity` (negative to release) to the reservation totals of an order"""
+		instrument = reservation.instrument
+		if reservation.side == 'buy':
+			self.reserved_cash += quantity * reservation.price
+			self.pending_buys[instrument] = self.pending_buys.get(instrument, 0.0) + quantity
+		else:
+			self.pending_sells[instrument] = self.pending_sells.get(instrument, 0.0) + quantity
+
+	@property
+	def available_buying_power(self):
+		return self.buying_power - self.reserved_cash - self.buying_power_buffer
+
+	def exposure(self, instrument):
+		"""Shares of an instrument held plus those of its open buys"""
+		instrument = unquote(instrument)
+		return self.positions.get(instrument, 0.0) + self.pending_buys.get(instrument, 0.0)
+
+	###########################################################################
+	#                               CHECKS
+	###########################################################################
+
+	def check(self, instrument, side, quantity, price):
+		"""
+		Raises RiskRejected if the order would violate a limit, no requests are made
+		(except for the first sync). An order that passes is reserved right away.
+
+		Args:
+			instrument: the instrument url of the order
+			price: the limit price, the mark for market orders
+
+		Returns: the key of the reservation, for `on_submit` once placed or `release` if not
+		"""
+		if self.synced_at is None:
+			self.sync()
+		if self._resync is None:
+			self._start_resync()
+
+		instrument = unquote(instrument)
+		quantity = float(quantity)
+		price = float(price or 0.0)
+		value = quantity * price
+
+		with self._lock:
+			if self.max_open_orders is not None and len(self._open) >= self.max_open_orders:
+				raise RiskRejected(f"{len(self._open)} open orders, the limit is {self.max_open_orders}")
+			if self.max_order_value is not None and value > self.max_order_value:
+				raise RiskRejected(f"Order value {value:.2f} exceeds the limit of {self.max_order_value:.2f}")
+
+			if side == 'buy':
+				available = self.available_buying_power
+				if value > available:
+					raise RiskRejected(f"Order value {value:.2f} exceeds the buying power of {available:.2f}")
+				shares = self.exposure(instrument) + quantity
+				if self.max_position_quantity is not None and shares > self.max_position_quantity:
+					raise RiskRejected(f"Position of {shares:g} shares exceeds the limit of {self.max_position_quantity:g}")
+				if self.max_position_value is not None and shares * price > self.max_position_value:
+					raise RiskRejected(f"Position value {shares * price:.2f} exceeds the limit of "
+									   f"{self.max_position_value:.2f}")
+			elif not self.allow_short:
+				sellable = self.positions.get(instrument, 0.0) - self.pending_sells.get(instrument, 0.0)
+				if quantity > sellable:
+					raise RiskRejected(f"Selling {quantity:g} shares, only {sellable:g} are held and not already being sold")
+
+			self._checks += 1
+			key = ('check', self._checks)
+			self._reserve(key, instrument, side, quantity, price)
+			return key
+
+	def release(self, key):
+		"""Releases the reservation of a checked order that was not placed"""
+		with self._lock:
+			reservation = self._open.pop(key, None)
+			if reservation is not None:
+				self._adjust(reservation, -reservation.remaining)
+
+	###########################################################################
+	#                               ORDER EVENTS
+	###########################################################################
+
+	def on_submit(self, order, key=None):
+		"""Reserves buying power (buys) or shares (sells) for a placed order, in place of its check's (`key`)"""
+		with self._lock:
+			if key is not None:
+				self.release(key)
+			if order['id'] not in self._open:
+				self._reserve(order['id'], unquote(order['instrument']), order['side'], _float(order['quantity']),
+							  _float(order.get('price')) or _float(order.get('stop_price')))
+				if self._submitted is not None:
+					self._submitted[order['id']] = self._open[order['id']]
+			self.on_update(order)
+
+	def on_update(self, order):
+		"""Applies the fills of a refreshed order, releases its reservation once it is closed"""
+		with self._lock:
+			reservation = self._open.get(order['id'])
+			if reservation is None:
+				return
+
+			filled = _float(order.get('cumulative_quantity'))
+			if filled > reservation.filled:
+				delta = min(filled, reservation.quantity) - reservation.filled
+				fill_price = _float(order.get('average_price')) or reservation.price
+				self._adjust(reservation, -delta)
+				reservation.filled += delta
+				instrument = reservation.instrument
+				if reservation.side == 'buy':
+					self.positions[instrument] = self.positions.get(instrument, 0.0) + delta
+					self.buying_power -= delta * fill_price
+				else:
+					self.positions[instrument] = self.positions.get(instrument, 0.0) - delta
+					self.buying_power += delta * fill_price
+
+			if order['state'] in closed_states:
+				self._adjust(reservation, -reservation.remaining)
+				del self._open[order['id']]
@@ -0,0 +1,473 @@
+"""
+An event-driven runtime for many strategies in one process.
+
+A single loop thread polls for every registered strategy at once. It makes one batched quote request
+per asset class for the union of the symbols, and one order-list request per asset class for the
+orders being tracked. It builds bars from the quotes and runs the timers, then dispatches typed
+events to the handlers of the strategies:
+
+    on_quote(QuoteEvent)   a subscribed symbol's quote changed
+    on_bar(BarEvent)       a `bar_seconds` bar of a subscribed symbol closed (built from the quotes)
+    on_order(OrderEvent)   a tracked order changed state
+    on_fill(FillEvent)     a tracked order was (partially) filled
+    on_timer(TimerEvent)   a timer of `every` fired
+
+    class Breakout(Strategy):
+        symbols = ['AAPL', 'MSFT']
+        bar_seconds = 60
+
+        def on_bar(self, bar):
+            if bar.close > bar.open * 1.01:
+                self.buy(bar.symbol, 1, price=bar.close)
+
+        def on_fill(self, fill):
+            print('filled', fill.quantity, fill.order.symbol)
+
+    runtime = Runtime(trader, quote_interval=1.0)
+    runtime.add(Breakout())
+    runtime.run()  # or start()/stop()
+    runtime.timings()  # calls and time spent per strategy and handler
+
+While only stock symbols are subscribed, the quotes are polled at the pace of `trader.calendar`
+(idle while the market is closed). The handlers all run on the loop thread, `on_start` included.
+"""
+
+from .market_calendar import CLOSED
+from .order import CryptoOrder, closed_states
+import heapq
+import itertools
+import threading
+import time
+
+
+def _float(value):
+	return float(value) if value not in (None, '') else 0.0
+
+
+###########################################################################
+#                               EVENTS
+###########################################################################
+
+class QuoteEvent:
+	__slots__ = ('symbol', 'crypto', 'quote', 'time_ns')
+
+	def __init__(self, symbol, crypto, quote, time_ns):
+		self.symbol = symbol
+		self.crypto = crypto
+		self.quote = quote
+		self.time_ns = time_ns
+
+	def __repr__(self):
+		return f'QuoteEvent({self.symbol}, mark={self.quote.mark})'
+
+
+class BarEvent:
+	__slots__ = ('symbol', 'crypto', 'seconds', 'start', 'open', 'high', 'low', 'close', 'quotes')
+
+	def __init__(self, symbol, crypto, seconds, start, price):
+		self.symbol = symbol
+		self.crypto = crypto
+		self.seconds = seconds
+		self.start = start  # epoch seconds
+		self.open = self.high = self.low = self.close = price
+		self.quotes = 1
+
+	def add(self, price):
+		self.high = max(self.high, price)
+		self.low = min(self.low, price)
+		self.close = price
+		self.quotes += 1
+
+	def __repr__(self):
+		return f'BarEvent({self.symbol}, {self.seconds}s, o={self.open} h={self.high} l={self.low} c={self.close})'
+
+
+class OrderEvent:
+	__slots__ = ('order', 'previous_state', 'state')
+
+	def __init__(self, order, previous_state, state):
+		self.order = order
+		self.previous_state = previous_state
+		self.state = state
+
+	def __repr__(self):
+		return f'OrderEvent({self.order["id"]}, {self.previous_state} -> {self.state})'
+
+
+class FillEvent:
+	__slots__ = ('order', 'quantity', 'price', 'filled')
+
+	def __init__(self, order, quantity, price, filled):
+		self.order = order
+		self.quantity = quantity  # filled since the previous event
+		self.price = price        # the average price of the order
+		self.filled = filled      # filled in total
+
+	def __repr__(self):
+		return f'FillEvent({self.order["id"]}, {self.quantity:g} @ {self.price})'
+
+
+class TimerEvent:
+	__slots__ = ('name', 'interval', 'time_ns')
+
+	def __init__(self, name, interval, time_ns):
+		self.name = name
+		self.interval = interval
+		self.time_ns = time_ns
+
+
+###########################################################################
+#                               STRATEGIES
+###########################################################################
+
+class Strategy:
+	"""
+	Base class of the strategies, override the handlers needed.
+
+	Attributes:
+		symbols: the stock symbols subscribed to (on_quote, on_bar)
+		crypto_symbols: the crypto symbols subscribed to
+		bar_seconds: the duration of the bars, None for no on_bar
+		name: defaults to the class name (numbered if added more than once)
+	"""
+
+	symbols = ()
+	crypto_symbols = ()
+	bar_seconds = None
+	name = None
+	runtime = None
+
+	def on_start(self):
+		pass
+
+	def on_quote(self, event: QuoteEvent):
+		pass
+
+	def on_bar(self, event: BarEvent):
+		pass
+
+	def on_order(self, event: OrderEvent):
+		pass
+
+	def on_fill(self, event: FillEvent):
+		pass
+
+	def on_timer(self, event: TimerEvent):
+		pass
+
+	def buy(self, symbol, quantity=None, crypto=False, **kwargs):
+		"""Places an order tracked for this strategy (on_order/on_fill), see `Trader.buy`"""
+		return self.runtime.place(self, 'buy', symbol, quantity, crypto, **kwargs)
+
+	def sell(self, symbol, quantity=None, crypto=False, **kwargs):
+		return self.runtime.place(self, 'sell', symbol, quantity, crypto, **kwargs)
+
+	def every(self, seconds, name=None):
+		"""Calls on_timer every `seconds`"""
+		return self.runtime.every(self, seconds, name)
+
+
+class _Timer:
+	__slots__ = ('strategy', 'interval', 'name', 'canceled')
+
+	def __init__(self, strategy, interval, name):
+		self.strategy = strategy
+		self.interval = interval
+		self.name = name
+		self.canceled = False
+
+	def cancel(self):
+		self.canceled = True
+
+
+class _Tracked:
+	__slots__ = ('order', 'strategy', 'crypto', 'state', 'filled')
+
+	def __init__(self, order, strategy, crypto):
+		self.order = order
+		self.strategy = strategy
+		self.crypto = crypto
+		self.state = order['state']
+		self.filled = _float(order._dict.get('cumulative_quantity'))
+
+
+###########################################################################
+#                               RUNTIME
+###########################################################################
+
+class Runtime:
+	"""
+	Args:
+		trader: the Trader shared by every strategy
+		quote_interval: seconds between the quote polls (during the regular session)
+		order_interval: seconds between the refreshes of the tracked open orders
+	"""
+
+	def __init__(self, trader, quote_interval=1.0, order_interval=2.0):
+		self.trader = trader
+		self.quote_interval = quote_interval
+		self.order_interval = order_interval
+		self.strategies = []
+		self.polls = {'quotes': 0, 'orders': 0}
+		self._quotes = {}      # {(crypto, symbol): (bid, ask, mark)} of the last quote dispatched
+		self._bars = {}        # {(crypto, symbol, seconds): BarEvent} being formed
+		self._orders = {}      # {order id: _Tracked}
+		self._timers = []      # heap of (due, sequence, _Timer)
+		self._sequence = itertools.count()
+		self._timings = {}     # {(strategy name, handler): [calls, total ns, max ns, errors]}
+		self._lock = threading.RLock()
+		self._wake = threading.Event()
+		self._subscribed = False  # a strategy was added, the quote poll is rescheduled
+		self._starting = []       # strategies added whose on_start the loop thread has yet to run
+		self._stopped = threading.Event()
+		self._thread = None
+
+	###########################################################################
+	#                               REGISTRATION
+	###########################################################################
+
+	def add(self, strategy: Strategy) -> Strategy:
+		with self._lock:
+			if strategy.name is None:
+				base = type(strategy).__name__
+				names = {s.name for s in self.strategies}
+				strategy.name = base if base not in names else \
+					next(f'{base}-{i}' for i in itertools.count(2) if f'{base}-{i}' not in names)
+			strategy.runtime = self
+			self.strategies.append(strategy)
+			self._starting.append(strategy)
+			self._subscribed = True
+		self._wake.set()
+		return strategy
+
+	def remove(self, strategy: Strategy):
+		with self._lock:
+			self.strategies.remove(strategy)
+			if strategy in self._starting:
+				self._starting.remove(strategy)
+			self._orders = {id: tracked for id, tracked in self._orders.items() if tracked.strategy is not strategy}
+			for _, _, timer in self._timers:
+				if timer.strategy is strategy:
+					timer.cancel()
+
+	def every(self, strategy, seconds, name=None) -> _Timer:
+		timer = _Timer(strategy, seconds, name)
+		with self._lock:
+			heapq.heappush(self._timers, (time.monotonic() + seconds, next(self._sequence), timer))
+		self._wake.set()
+		return timer
+
+	def place(self, strategy, side, symbol, quantity=None, crypto=False, **kwargs):
+		source = self.trader.crypto if crypto else self.trader
+		order = getattr(source, side)(symbol, quantity=quantity, **kwargs)
+		self.track(order, strategy)
+		return order
+
+	def track(self, order, strategy):
+		"""Follows an order placed elsewhere, on_order/on_fill of `strategy`"""
+		with self._lock:
+			self._orders[order['id']] = _Tracked(order, strategy, isinstance(order, CryptoOrder))
+		self._wake.set()
+
+	###########################################################################
+	#                               RUNNING
+	###########################################################################
+
+	def start(self):
+		if self._thread and self._thread.is_alive():
+			return self
+		self._stopped.clear()
+		self._thread = threading.Thread(target=self.run, daemon=True)
+		self._thread.start()
+		return self
+
+	def stop(self):
+		self._stopped.set()
+		self._wake.set()
+		if self._thread and self._thread is not threading.current_thread():
+			self._thread.join()
+
+	def run(self):
+		"""The event loop, until `stop()`"""
+		self._thread = self._thread or threading.current_thread()
+		with self._lock:
+			self._starting = list(self.strategies)
+		quotes_due = orders_due = time.monotonic()
+
+		while not self._stopped.is_set():
+			if self._starting:
+				with self._lock:
+					starting, self._starting = self._starting, []
+				for strategy in starting:
+					self._dispatch(strategy, 'on_start', None)
+			now = time.monotonic()
+			if self._subscribed:  # new symbols (maybe crypto, quoted around the clock) poll right away
+				self._subscribed = False
+				quotes_due = now
+			if now >= quotes_due:
+				self._poll_quotes()
+				quotes_due = now + self._quote_delay()
+			if now >= orders_due:
+				if self._orders:
+					self._poll_orders()
+				orders_due = now + self.order_interval
+			self._fire_timers(now)
+
+			due = min(quotes_due, orders_due, self._timers[0][0] if self._timers else float('inf'))
+			self._wake.wait(max(due - time.monotonic(), 0))
+			self._wake.clear()
+
+	def _quote_delay(self):
+		"""The quote interval, paced by the market calendar while only stocks are subscribed,
+			cut short at the next bar boundary (unless the market is closed: no bar forms then)"""
+		if any(strategy.crypto_symbols for strategy in self.strategies):
+			delay = self.quote_interval
+		else:
+			calendar = self.trader.calendar
+			delay = calendar.delay(self.quote_interval)
+			try:
+				if calendar.session() == CLOSED:
+					return delay
+			except Exception:
+				pass  # the hours could not be loaded, polled as if open
+		now = time.time()
+		for seconds in {strategy.bar_seconds for strategy in self.strategies if strategy.bar_seconds}:
+			delay = min(delay, seconds - now % seconds + 0.001)
+		return delay
+
+	###########################################################################
+	#                               POLLING
+	###########################################################################
+
+	def _subscriptions(self):
+		"""{(crypto, symbol): [strategies]}"""
+		subscriptions = {}
+		for strategy in self.strategies:
+			for symbol in strategy.symbols:
+				subscriptions.setdefault((False, symbol.upper()), []).append(strategy)
+			for symbol in strategy.crypto_symbols:
+				subscriptions.setdefault((True, symbol.upper()), []).append(strategy)
+		return subscriptions
+
+	def _poll_quotes(self):
+		subscriptions = self._subscriptions()
+		for crypto in (False, True):
+			symbols = sorted(symbol for is_crypto, symbol in subscriptions if is_crypto == crypto)
+			if not symbols:
+				continue
+			source = self.trader.crypto if crypto else self.trader
+			try:
+				quotes = source.quotes(symbols)
+			except Exception as e:
+				print('quote poll failed:', e)
+				continue
+			self.polls['quotes'] += 1
+			for symbol, quote in zip(symbols, quotes):
+				if quote:
+					self._on_quote(crypto, symbol, quote, subscriptions[(crypto, symbol)])
+
+	def _on_quote(self, crypto, symbol, quote, strategies):
+		now = time.time()
+		price = quote.mark
+		for seconds in {strategy.bar_seconds for strategy in strategies if strategy.bar_seconds}:
+			key = (crypto, symbol, seconds)
+			start = now - now % seconds
+			bar = self._bars.get(key)
+			if bar is None or bar.start != start:
+				self._bars[key] = BarEvent(symbol, crypto, seconds, start, price)
+				if bar is not None:
+					for strategy in strategies:
+						if strategy.bar_seconds == seconds:
+							self._dispatch(strategy, 'on_bar', bar)
+			else:
+				bar.add(price)
+
+		prices = (quote.bid, quote.ask, price)
+		if self._quotes.get((crypto, symbol)) != prices:
+			self._quotes[(crypto, symbol)] = prices
+			event = QuoteEvent(symbol, crypto, quote, quote.time_ns)
+			for strategy in strategies:
+				self._dispatch(strategy, 'on_quote', event)
+
+	def _poll_orders(self):
+		"""One order-list request per asset class for the open tracked orders"""
+		with self._lock:
+			tracked = list(self._orders.values())
+		for crypto in (False, True):
+			orders = [t for t in tracked if t.crypto == crypto]
+			if not orders:
+				continue
+			source = self.trader.crypto if crypto else self.trader
+			try:
+				page = source.orders()
+			except Exception as e:
+				print('order poll failed:', e)
+				continue
+			self.polls['orders'] += 1
+			for t in orders:
+				try:
+					try:
+						json = page.by_id(t.order['id'])._dict
+					except KeyError:  # not on the first page anymore
+						json = source.order(t.order['id'])._dict
+				except Exception as e:
+					print('order refresh failed:', e)
+					continue
+				self._on_order(t, json)
+
+	def _on_order(self, tracked, json):
+		order = tracked.order
+		order._dict = json
+		filled = _float(json.get('cumulative_quantity'))
+		if filled > tracked.filled:
+			event = FillEvent(order, filled - tracked.filled, _float(json.get('average_price')) or None, filled)
+			tracked.filled = filled
+			self._dispatch(tracked.strategy, 'on_fill', event)
+		if json['state'] != tracked.state:
+			event = OrderEvent(order, tracked.state, json['state'])
+			tracked.state = json['state']
+			self._dispatch(tracked.strategy, 'on_order', event)
+		if json['state'] in closed_states:
+			with self._lock:
+				self._orders.pop(json['id'], None)
+
+	def _fire_timers(self, now):
+		while self._timers and self._timers[0][0] <= now:
+			with self._lock:
+				due, _, timer = heapq.heappop(self._timers)
+				if timer.canceled:
+					continue
+				# the next due time keeps its phase, missed firings are skipped
+				next_due = due + timer.interval * max(1, int((now - due) // timer.interval) + 1)
+				heapq.heappush(self._timers, (next_due, next(self._sequence), timer))
+			self._dispatch(timer.strategy, 'on_timer', TimerEvent(timer.name, timer.interval, time.time_ns()))
+
+	###########################################################################
+	#                               DISPATCH
+	###########################################################################
+
+	def _dispatch(self, strategy, handler, event):
+		method = getattr(strategy, handler)
+		if getattr(type(strategy), handler) is getattr(Strategy, handler):
+			return  # not overridden
+		timing = self._timings.get((strategy.name, handler))
+		if timing is None:
+			timing = self._timings[(strategy.name, handler)] = [0, 0, 0, 0]
+		started = time.perf_counter_ns()
+		try:
+			method() if event is None else method(event)
+		except Exception as e:
+			timing[3] += 1
+			print(f'{strategy.name}.{handler} failed:', e)
+		elapsed = time.perf_counter_ns() - started
+		timing[0] += 1
+		timing[1] += elapsed
+		timing[2] = max(timing[2], elapsed)
+
+	def timings(self):
+		"""DataFrame indexed by strategy and handler: calls, errors, total_ms, mean_us, max_us"""
+		import pandas as pd
+		rows = [(name, handler, calls, errors, total / 1e6, total / calls / 1e3 if calls else None, longest / 1e3)
+				for (name, handler), (calls, total, longest, errors) in self._timings.items()]
+		return pd.DataFrame(rows, columns=['strategy', 'handler', 'calls', 'errors', 'total_ms', 'mean_us', 'max_us'])\
+			.set_index(['strategy', 'handler']).sort_index()
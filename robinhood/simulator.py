@@ -0,0 +1,961 @@
+"""
+Local stand-in for the Robinhood api, for offline load-testing and benchmarking.
+
+    python -m robinhood.simulator --port 8000 --latency 0.005 --error-rate 0.01 --throttle-rate 0.01
+
+    trader = Trader(api_url='http://127.0.0.1:8000')
+    trader.login('user', 'password')
+
+The crypto (nummus) routes are served under `/nummus`, which is the default `crypto_api_url`
+of a Trader created with an `api_url`. All data is generated deterministically from the `seed`
+and the symbol, orders move through 'unconfirmed' -> 'confirmed' -> 'filled' as they age.
+"""
+
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+import zlib
+
+_namespace = uuid.UUID('8c6f1cf4-2f43-4bd0-9b59-1bc1b0d1b9d5')
+
+default_symbols = ['AAPL', 'MSFT', 'AMZN', 'GOOG', 'TSLA', 'SPY', 'QQQ', 'F', 'GE', 'NVDA']
+
+# asset code -> pair id, the same ids as `crypto_endpoints.crypto_pairs`
+default_crypto_pairs = {
+	'BTC': '3d961844-d360-45fc-989b-f6fca761d511',
+	'ETH': '76637d50-c702-4ed1-bcb5-5b0732a81f48',
+	'LTC': '383280b1-ff53-43fc-9c84-f01afd0989cd',
+	'DOGE': '1ef78e1b-049b-4f12-90e5-555dcf2fe204',
+}
+
+_interval_seconds = {
+	'15second': 15, '5minute': 300, '10minute': 600, 'hour': 3600, 'day': 86400, 'week': 7 * 86400
+}
+
+_span_seconds = {
+	'hour': 3600, 'day': 86400, 'week': 7 * 86400, 'month': 31 * 86400, '3month': 92 * 86400,
+	'year': 365 * 86400, '5year': 5 * 365 * 86400, 'all': 10 * 365 * 86400
+}
+
+
+def _iso(seconds):
+	return datetime.fromtimestamp(seconds, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _iso_us(seconds):
+	"""the microsecond precision timestamps of the orders"""
+	return datetime.fromtimestamp(seconds, timezone.utc).isoformat()
+
+
+def _parse_iso(value):
+	return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+def _listed(symbol):
+	"""Any symbol of 1-5 letters (and a class suffix) is listed, others are unknown"""
+	return re.match(r'^[A-Z]{1,5}(\.[A-Z])?$', symbol) is not None
+
+
+def _price(value):
+	return '{0:.6f}'.format(value)
+
+
+class _Response(Exception):
+	"""raised by route handlers to answer with a non 200 status"""
+
+	def __init__(self, status, body=None, headers=None):
+		self.status = status
+		self.body = body if body is not None else {'detail': 'Not found.'}
+		self.headers = headers or {}
+
+
+class Simulator:
+	"""
+	The request handling of the simulated api, independent of any http server.
+
+	`handle(method, url, body)` returns (status, json, headers), `serve` exposes it over http.
+
+	Args:
+		seed: seed of the generated data and of the injected errors
+		latency: seconds added to every response
+		error_rate: fraction of requests answered with a 500
+		throttle_rate: fraction of requests answered with a 429 (and a Retry-After header)
+		fill_delay: seconds after which marketable orders are filled
+		page_size: results per page of paginated endpoints
+	"""
+
+	def __init__(self,
+				 seed=0,
+				 latency=0.0,
+				 error_rate=0.0,
+				 throttle_rate=0.0,
+				 fill_delay=0.5,
+				 page_size=100,
+				 symbols=default_symbols,
+				 crypto_pairs=default_crypto_pairs):
+		self.seed = seed
+		self.latency = latency
+		self.error_rate = error_rate
+		self.throttle_rate = throttle_rate
+		self.fill_delay = fill_delay
+		self.page_size = page_size
+		self.crypto_pairs = dict(crypto_pairs)
+		self.requests = 0
+
+		self._random = random.Random(seed)
+		self._lock = threading.Lock()
+		self._instruments = {}  # id -> symbol
+		self._orders = []        # newest first, like robinhood
+		self._orders_by_id = {}
+		self._crypto_orders = []
+		self._crypto_orders_by_id = {}
+		self._positions = {}     # symbol -> [quantity, average price]
+		self._holdings = {}      # asset code -> [quantity, cost]
+		self._tokens = set()
+		self._chains = {}        # chain id -> symbol
+		self._options = {}       # option id -> (symbol, expiration date, strike, type)
+
+		for symbol in symbols:
+			self._instrument_id(symbol)
+		self._positions[symbols[0]] = [10.0, self._mark(symbols[0], 0) * 0.9]
+
+		self._routes = [
+			('POST', re.compile(r'/oauth2/token/?$'), self._login),
+			('POST', re.compile(r'/oauth2/revoke_token/?$'), self._logout),
+			('GET', re.compile(r'/accounts/?$'), self._accounts),
+			('GET', re.compile(r'/portfolios/?$'), self._portfolios),
+			('GET', re.compile(r'/positions/?$'), self._positions_page),
+			('GET', re.compile(r'/dividends/?$'), self._dividends),
+			('GET', re.compile(r'/markets/?$'), self._markets),
+			('GET', re.compile(r'/markets/([^/]+)/hours/([^/]+)/?$'), self._market_hours),
+			('GET', re.compile(r'/instruments/?$'), self._instruments_page),
+			('GET', re.compile(r'/instruments/([^/]+)/?$'), self._instrument),
+			('GET', re.compile(r'/quotes/?$'), self._quotes),
+			('GET', re.compile(r'/fundamentals/?$'), self._fundamentals_page),
+			('GET', re.compile(r'/fundamentals/([^/]+)/?$'), self._fundamentals),
+			('GET', re.compile(r'/marketdata/historicals/([^/]+)/?$'), self._historicals),
+			('GET', re.compile(r'/marketdata/pricebook/snapshots/([^/]+)/?$'), self._orderbook),
+			('GET', re.compile(r'/marketdata/forex/quotes/?$'), self._crypto_quotes),
+			('GET', re.compile(r'/marketdata/forex/quotes/([^/]+)/?$'), self._crypto_quote),
+			('GET', re.compile(r'/marketdata/forex/historicals/([^/]+)/?$'), self._crypto_historicals),
+			('GET', re.compile(r'/options/chains/?$'), self._option_chains),
+			('GET', re.compile(r'/options/instruments/?$'), self._option_instruments),
+			('GET', re.compile(r'/marketdata/options/?$'), self._option_market_data),
+			('GET', re.compile(r'/orders/?$'), self._orders_page),
+			('POST', re.compile(r'/orders/?$'), self._place_order),
+			('GET', re.compile(r'/orders/([^/]+)/?$'), self._order),
+			('POST', re.compile(r'/orders/([^/]+)/cancel/?$'), self._cancel_order),
+			('GET', re.compile(r'/nummus/accounts/?$'), self._crypto_accounts),
+			('GET', re.compile(r'/nummus/portfolios/?$'), self._crypto_portfolios),
+			('GET', re.compile(r'/nummus/holdings/?$'), self._crypto_holdings),
+			('GET', re.compile(r'/nummus/currency_pairs/?$'), self._currency_pairs),
+			('GET', re.compile(r'/nummus/orders/?$'), self._crypto_orders_page),
+			('POST', re.compile(r'/nummus/orders/?$'), self._place_crypto_order),
+			('GET', re.compile(r'/nummus/orders/([^/]+)/?$'), self._crypto_order),
+			('POST', re.compile(r'/nummus/orders/([^/]+)/cancel/?$'), self._cancel_crypto_order),
+		]
+
+	###########################################################################
+	#                               DISPATCH
+	###########################################################################
+
+	def handle(self, method, url, body=None, headers=None):
+		"""
+		Args:
+			method: 'GET' or 'POST'
+			url: the full request url (the scheme and host are used for the urls in the responses)
+			body: the request body (bytes, str or an already decoded dict)
+			headers: request headers, the Authorization header is checked for the api routes
+
+		Returns: (status, json, response headers)
+		"""
+		if self.latency:
+			time.sleep(self.latency)
+
+		with self._lock:
+			self.requests += 1
+			roll = self._random.random()
+
+		if roll < self.throttle_rate:
+			return 429, {'detail': 'Request was throttled. Expected available in 1 second.'}, {'Retry-After': '1'}
+		if roll < self.throttle_rate + self.error_rate:
+			return 500, {'detail': 'Simulated server error.'}, {}
+
+		parts = urlsplit(url)
+		base = f'{parts.scheme}://{parts.netloc}'
+		query = dict(parse_qsl(parts.query))
+		path = parts.path.replace('//', '/')
+
+		if isinstance(body, (bytes, str)):
+			body = self._decode_body(body)
+
+		for route_method, pattern, route in self._routes:
+			match = pattern.match(path)
+			if match and route_method == method:
+				if not path.startswith('/oauth2/') and not self._authorized(headers):
+					return 401, {'detail': 'Authentication credentials were not provided.'}, {}
+				try:
+					return 200, route(base, query, body or {}, *match.groups()), {}
+				except _Response as response:
+					return response.status, response.body, response.headers
+		return 404, {'detail': 'Not found.'}, {}
+
+	@staticmethod
+	def _decode_body(body):
+		if isinstance(body, bytes):
+			body = body.decode()
+		if not body:
+			return {}
+		if body.lstrip().startswith('{'):
+			return json.loads(body)
+		return dict(parse_qsl(body))
+
+	def _authorized(self, headers):
+		if headers is None:
+			return True  # in-process callers
+		authorization = headers.get('Authorization') or ''
+		return authorization.startswith('Bearer ') and authorization[len('Bearer '):] in self._tokens
+
+	def _page(self, base, path, query, results):
+		"""paginates `results` with a `cursor` (offset) query parameter"""
+		cursor = int(query.get('cursor') or 0)
+		page = results[cursor:cursor + self.page_size]
+		next_cursor = cursor + self.page_size
+		next_url = f'{base}{path}?cursor={next_cursor}' if next_cursor < len(results) else None
+		previous_url = f'{base}{path}?cursor={max(cursor - self.page_size, 0)}' if cursor else None
+		return {'next': next_url, 'previous': previous_url, 'results': page}
+
+	###########################################################################
+	#                               MARKET DATA
+	###########################################################################
+
+	def _new_id(self):
+		with self._lock:
+			return str(uuid.UUID(int=self._random.getrandbits(128)))
+
+	def _hash(self, *values):
+		return zlib.crc32(repr((self.seed,) + values).encode())
+
+	def _base_price(self, symbol):
+		return 10 + self._hash(symbol) % 490
+
+	def _mark(self, symbol, seconds):
+		"""a deterministic, smooth price path"""
+		phase = self._hash(symbol, 'phase') % 628 / 100
+		return self._base_price(symbol) * (1 + 0.02 * math.sin(seconds / 600 + phase)
+										   + 0.005 * math.sin(seconds / 37 + 2 * phase))
+
+	def _instrument_id(self, symbol):
+		instrument_id = str(uuid.uuid5(_namespace, symbol))
+		self._instruments[instrument_id] = symbol
+		return instrument_id
+
+	def _instrument_json(self, base, symbol):
+		instrument_id = self._instrument_id(symbol)
+		return {
+			'id': instrument_id,
+			'url': f'{base}/instruments/{instrument_id}/',
+			'quote': f'{base}/quotes/{symbol}/',
+			'fundamentals': f'{base}/fundamentals/{symbol}/',
+			'market': f'{base}/markets/XNAS/',
+			'symbol': symbol,
+			'simple_name': symbol.title(),
+			'name': f'{symbol} Simulated Inc.',
+			'type': 'stock',
+			'state': 'active',
+			'tradeable': True,
+			'tradability': 'tradable',
+			'country': 'US',
+			'min_tick_size': None,
+			'day_trade_ratio': '0.2500',
+			'maintenance_ratio': '0.2500',
+			'margin_initial_ratio': '0.5000',
+		}
+
+	def _quote_json(self, base, symbol, now=None):
+		now = now or time.time()
+		mark = self._mark(symbol, now)
+		spread = max(mark * 0.0002, 0.01)
+		previous_close = self._mark(symbol, now - 86400)
+		return {
+			'ask_price': _price(mark + spread / 2),
+			'ask_size': 100 + self._hash(symbol, 'ask', int(now)) % 900,
+			'bid_price': _price(mark - spread / 2),
+			'bid_size': 100 + self._hash(symbol, 'bid', int(now)) % 900,
+			'last_trade_price': _price(mark),
+			'last_extended_hours_trade_price': _price(mark),
+			'previous_close': _price(previous_close),
+			'adjusted_previous_close': _price(previous_close),
+			'previous_close_date': _iso(now - 86400)[:10],
+			'symbol': symbol,
+			'trading_halted': False,
+			'has_traded': True,
+			'last_trade_price_source': 'consolidated',
+			'updated_at': _iso(now),
+			'instrument': f'{base}/instruments/{self._instrument_id(symbol)}/',
+		}
+
+	def _bars(self, key, query):
+		interval = query.get('interval') or 'day'
+		step = _interval_seconds.get(interval)
+		span = query.get('span') or 'year'
+		if step is None or span not in _span_seconds:
+			raise _Response(400, {'detail': 'Invalid interval or span.'})
+
+		if query.get('start'):
+			start = _parse_iso(query['start'])
+			end = query.get('end') or query.get('stop')
+			stop = _parse_iso(end) if end else time.time()
+		else:
+			stop = time.time()
+			start = stop - _span_seconds[span]
+
+		start = math.ceil(start / step) * step
+		rows = []
+		for begins_at in range(int(start), int(stop), step):
+			open_price = self._mark(key, begins_at)
+			close_price = self._mark(key, begins_at + step)
+			wiggle = self._base_price(key) * 0.001
+			rows.append({
+				'begins_at': _iso(begins_at),
+				'open_price': _price(open_price),
+				'close_price': _price(close_price),
+				'high_price': _price(max(open_price, close_price) + wiggle),
+				'low_price': _price(min(open_price, close_price) - wiggle),
+				'volume': self._hash(key, begins_at) % 100000,
+				'session': 'reg',
+				'interpolated': False,
+			})
+		return interval, span, rows
+
+	def _quotes(self, base, query, body):
+		symbols = [s for s in (query.get('symbols') or '').upper().split(',') if s]
+		return {'results': [self._quote_json(base, symbol) if _listed(symbol) else None for symbol in symbols]}
+
+	def _fundamentals_page(self, base, query, body):
+		symbols = [s for s in (query.get('symbols') or '').upper().split(',') if s]
+		return {'results': [self._fundamentals_json(base, symbol) if _listed(symbol) else None for symbol in symbols]}
+
+	def _fundamentals(self, base, query, body, symbol):
+		symbol = symbol.upper()
+		if not _listed(symbol):
+			raise _Response(404)
+		return self._fundamentals_json(base, symbol)
+
+	def _fundamentals_json(self, base, symbol):
+		price = self._base_price(symbol)
+		return {
+			'symbol': symbol,
+			'instrument': f'{base}/instruments/{self._instrument_id(symbol)}/',
+			'open': _price(price),
+			'high': _price(price * 1.01),
+			'low': _price(price * 0.99),
+			'volume': str(self._hash(symbol, 'volume') % 10 ** 7),
+			'average_volume': str(self._hash(symbol, 'avg') % 10 ** 7),
+			'high_52_weeks': _price(price * 1.3),
+			'low_52_weeks': _price(price * 0.7),
+			'market_cap': str(price * (self._hash(symbol, 'shares') % 10 ** 9)),
+			'pe_ratio': '{0:.2f}'.format(5 + self._hash(symbol, 'pe') % 50),
+			'pb_ratio': '{0:.2f}'.format(1 + self._hash(symbol, 'pb') % 1000 / 100),
+			'dividend_yield': '{0:.2f}'.format(self._hash(symbol, 'dy') % 400 / 100),
+			'float': str(self._hash(symbol, 'float') % 10 ** 9),
+			'shares_outstanding': str(self._hash(symbol, 'shares') % 10 ** 9),
+			'description': f'{symbol} is a simulated company.',
+		}
+
+	def _historicals(self, base, query, body, symbol):
+		symbol = symbol.upper()
+		interval, span, rows = self._bars(symbol, query)
+		return {
+			'quote': f'{base}/quotes/{symbol}/',
+			'symbol': symbol,
+			'interval': interval,
+			'span': span,
+			'bounds': query.get('bounds') or 'regular',
+			'instrument': f'{base}/instruments/{self._instrument_id(symbol)}/',
+			'historicals': rows,
+		}
+
+	def _orderbook(self, base, query, body, instrument_id):
+		if instrument_id not in self._instruments:
+			raise _Response(404)
+		quote = self._quote_json(base, self._instruments[instrument_id])
+		bid, ask = float(quote['bid_price']), float(quote['ask_price'])
+
+		def side(price, direction):
+			return [{
+				'side': 'bid' if direction < 0 else 'ask',
+				'price': {'amount': '{0:.2f}'.format(price + direction * 0.01 * i), 'currency_code': 'USD'},
+				'quantity': 100 + self._hash(instrument_id, direction, i) % 900,
+			} for i in range(25)]
+
+		return {'asks': side(ask, 1), 'bids': side(bid, -1), 'instrument_id': instrument_id, 'updated_at': _iso(time.time())}
+
+	def _markets(self, base, query, body):
+		return {'next': None, 'previous': None, 'results': [{
+			'mic': 'XNAS',
+			'acronym': 'NASDAQ',
+			'url': f'{base}/markets/XNAS/',
+			'todays_hours': f'{base}/markets/XNAS/hours/{_iso(time.time())[:10]}/',
+			'timezone': 'US/Eastern',
+			'name': 'NASDAQ - All Markets',
+		}]}
+
+	def _market_hours(self, base, query, body, mic, date):
+		"""New York hours on weekdays (no holidays): 9:30-16:00, extended 9:00-18:00"""
+		from zoneinfo import ZoneInfo
+		day = datetime.strptime(date, '%Y-%m-%d')
+		is_open = day.weekday() < 5
+
+		def at(hour, minute=0):
+			local = day.replace(hour=hour, minute=minute, tzinfo=ZoneInfo('America/New_York'))
+			return _iso(local.timestamp()) if is_open else None
+
+		def hours_url(days):
+			other = day + timedelta(days=days)
+			while other.weekday() >= 5:
+				other += timedelta(days=1 if days > 0 else -1)
+			return f'{base}/markets/{mic}/hours/{other:%Y-%m-%d}/'
+
+		return {
+			'date': date,
+			'is_open': is_open,
+			'opens_at': at(9, 30),
+			'closes_at': at(16),
+			'extended_opens_at': at(9),
+			'extended_closes_at': at(18),
+			'previous_open_hours': hours_url(-1),
+			'next_open_hours': hours_url(1),
+		}
+
+	def _instruments_page(self, base, query, body):
+		if query.get('ids'):
+			return {'next': None, 'previous': None, 'results': [
+				self._instrument_json(base, self._instruments[id]) if id in self._instruments else None
+				for id in query['ids'].split(',')]}
+		if query.get('symbol'):
+			symbol = query['symbol'].upper()
+			return {'next': None, 'previous': None,
+					'results': [self._instrument_json(base, symbol)] if _listed(symbol) else []}
+		return self._page(base, '/instruments/', query,
+						  [self._instrument_json(base, symbol) for symbol in sorted(set(self._instruments.values()))])
+
+	def _instrument(self, base, query, body, instrument_id):
+		if instrument_id not in self._instruments:
+			raise _Response(404)
+		return self._instrument_json(base, self._instruments[instrument_id])
+
+	###########################################################################
+	#                               OPTIONS
+	###########################################################################
+
+	def _expiration_dates(self, count=4):
+		today = datetime.fromtimestamp(time.time(), timezone.utc).date()
+		friday = today + timedelta(days=(4 - today.weekday()) % 7 or 7)
+		return [(friday + timedelta(weeks=i)).isoformat() for i in range(count)]
+
+	def _option_chains(self, base, query, body):
+		results = []
+		for instrument_id in (query.get('equity_instrument_ids') or '').split(','):
+			if instrument_id not in self._instruments:
+				continue
+			symbol = self._instruments[instrument_id]
+			chain_id = str(uuid.uuid5(_namespace, 'chain' + symbol))
+			self._chains[chain_id] = symbol
+			results.append({
+				'id': chain_id,
+				'symbol': symbol,
+				'can_open_position': True,
+				'cash_component': None,
+				'expiration_dates': self._expiration_dates(),
+				'trade_value_multiplier': '100.0000',
+				'underlying_instruments': [{'id': instrument_id, 'instrument': f'{base}/instruments/{instrument_id}/'}],
+			})
+		return {'next': None, 'previous': None, 'results': results}
+
+	def _option_instruments(self, base, query, body):
+		symbol = self._chains.get(query.get('chain_id'))
+		if symbol is None:
+			raise _Response(400, {'detail': 'Invalid chain_id.'})
+		dates = [d for d in (query.get('expiration_dates') or '').split(',') if d]
+		types = [query['type']] if query.get('type') else ['call', 'put']
+		center = round(self._base_price(symbol))
+		step = max(round(center * 0.025), 1)
+
+		results = []
+		for date in dates:
+			for option_type in types:
+				for i in range(-10, 11):
+					strike = '{0:.4f}'.format(center + i * step)
+					option_id = str(uuid.uuid5(_namespace, f'{symbol}{date}{strike}{option_type}'))
+					self._options[option_id] = (symbol, date, float(strike), option_type)
+					results.append({
+						'id': option_id,
+						'url': f'{base}/options/instruments/{option_id}/',
+						'chain_id': query['chain_id'],
+						'chain_symbol': symbol,
+						'expiration_date': date,
+						'strike_price': strike,
+						'type': option_type,
+						'state': 'active',
+						'tradability': 'tradable',
+					})
+		return self._page(base, '/options/instruments/', query, results)
+
+	def _option_market_data(self, base, query, body):
+		results = []
+		now = time.time()
+		for url in (query.get('instruments') or '').split(','):
+			option_id = url.rstrip('/').rsplit('/', 1)[-1]
+			if option_id not in self._options:
+				results.append(None)
+				continue
+			symbol, date, strike, option_type = self._options[option_id]
+			spot = self._mark(symbol, now)
+			years = max((_parse_iso(date + 'T20:00:00Z') - now) / (365 * 86400), 1e-4)
+			volatility = 0.2 + self._hash(option_id) % 30 / 100
+			intrinsic = max(spot - strike, 0) if option_type == 'call' else max(strike - spot, 0)
+			mark = intrinsic + 0.4 * spot * volatility * math.sqrt(years) * math.exp(-abs(spot - strike) / spot * 5)
+			results.append({
+				'instrument': f'{base}/options/instruments/{option_id}/',
+				'instrument_id': option_id,
+				'adjusted_mark_price': '{0:.2f}'.format(mark),
+				'mark_price': '{0:.4f}'.format(mark),
+				'ask_price': '{0:.2f}'.format(mark * 1.02 + 0.01),
+				'bid_price': '{0:.2f}'.format(max(mark * 0.98 - 0.01, 0)),
+				'implied_volatility': '{0:.6f}'.format(volatility),
+				'open_interest': self._hash(option_id, 'oi') % 10000,
+				'volume': self._hash(option_id, 'volume', int(now // 60)) % 5000,
+			})
+		return {'results': results}
+
+	###########################################################################
+	#                               ACCOUNT
+	###########################################################################
+
+	def _login(self, base, query, body):
+		if not body.get('username') and body.get('grant_type') != 'refresh_token':
+			raise _Response(400, {'detail': 'Unable to log in with provided credentials.'})
+		token = self._new_id().replace('-', '')
+		self._tokens.add(token)
+		return {
+			'access_token': token,
+			'refresh_token': self._new_id().replace('-', ''),
+			'expires_in': 86400,
+			'token_type': 'Bearer',
+			'scope': 'internal',
+			'mfa_code': None,
+			'backup_code': None,
+		}
+
+	def _logout(self, base, query, body):
+		return {}
+
+	def _account_number(self):
+		return '5SIM' + str(self.seed % 10000).zfill(4)
+
+	def _accounts(self, base, query, body):
+		account_number = self._account_number()
+		return {'next': None, 'previous': None, 'results': [{
+			'url': f'{base}/accounts/{account_number}/',
+			'account_number': account_number,
+			'type': 'margin',
+			'buying_power': '100000.0000',
+			'cash': '100000.0000',
+			'cash_held_for_orders': '0.0000',
+			'uncleared_deposits': '0.0000',
+			'portfolio': f'{base}/accounts/{account_number}/portfolio/',
+			'positions': f'{base}/positions/',
+		}]}
+
+	def _portfolios(self, base, query, body):
+		market_value = sum(q * self._mark(s, time.time()) for s, (q, _) in self._positions.items())
+		return {'next': None, 'previous': None, 'results': [{
+			'url': f'{base}/portfolios/{self._account_number()}/',
+			'account': f'{base}/accounts/{self._account_number()}/',
+			'equity': '{0:.4f}'.format(100000 + market_value),
+			'market_value': '{0:.4f}'.format(market_value),
+			'withdrawable_amount': '100000.0000',
+		}]}
+
+	def _positions_page(self, base, query, body):
+		with self._lock:
+			self._refresh_orders()
+			positions = self._position_list(base, query)
+		return self._page(base, '/positions/', query, positions)
+
+	def _position_list(self, base, query):
+		return [{
+			'url': f'{base}/positions/{self._account_number()}/{self._instrument_id(symbol)}/',
+			'account': f'{base}/accounts/{self._account_number()}/',
+			'instrument': f'{base}/instruments/{self._instrument_id(symbol)}/',
+			'quantity': '{0:.5f}'.format(quantity),
+			'average_buy_price': '{0:.4f}'.format(average),
+			'intraday_quantity': '0.0000',
+			'intraday_average_buy_price': '0.0000',
+			'shares_held_for_buys': '0.0000',
+			'shares_held_for_sells': '0.0000',
+			'pending_average_buy_price': '{0:.4f}'.format(average),
+			'created_at': _iso(0),
+			'updated_at': _iso(time.time()),
+		} for symbol, (quantity, average) in sorted(self._positions.items())
+			if quantity or query.get('nonzero') != 'true']
+
+	def _dividends(self, base, query, body):
+		return self._page(base, '/dividends/', query, [])
+
+	###########################################################################
+	#                               ORDERS
+	###########################################################################
+
+	def _order_state(self, order, quote_price):
+		"""advances an order with its age, marketable orders fill after `fill_delay`"""
+		if order['state'] not in ('unconfirmed', 'confirmed'):
+			return
+		now = time.time()
+		age = now - order['_created']
+		if age >= self.fill_delay / 2:
+			order['state'] = 'confirmed'
+
+		price = float(order['price']) if order.get('price') else None
+		marketable = order['type'] == 'market' or price is None \
+			or (order['side'] == 'buy' and price >= quote_price) \
+			or (order['side'] == 'sell' and price <= quote_price)
+		if age >= self.fill_delay and marketable and order.get('trigger', 'immediate') == 'immediate':
+			fill_price = quote_price if order['type'] == 'market' else price
+			order['state'] = 'filled'
+			order['average_price'] = _price(fill_price)
+			order['cumulative_quantity'] = order['quantity']
+			# filled once marketable and `fill_delay` old, not at the time it is looked at
+			filled_at = max(order['_created'] + self.fill_delay, order.get('_checked', 0.0))
+			order['last_transaction_at'] = order['updated_at'] = _iso_us(filled_at)
+			order['executions'] = [{
+				'id': str(uuid.uuid5(_namespace, order['id'])),
+				'price': _price(fill_price),
+				'quantity': order['quantity'],
+				'timestamp': order['updated_at'],
+				'settlement_date': order['updated_at'][:10],
+			}]
+			return fill_price
+		order['_checked'] = now
+		return None
+
+	def _refresh_orders(self):
+		now = time.time()
+		for order in self._orders:
+			fill_price = self._order_state(order, self._mark(order['symbol'], now))
+			if fill_price is not None:
+				quantity = float(order['quantity']) * (1 if order['side'] == 'buy' else -1)
+				held, average = self._positions.get(order['symbol'], [0.0, 0.0])
+				total = held + quantity
+				if quantity > 0 and total:
+					average = (held * average + quantity * fill_price) / total
+				self._positions[order['symbol']] = [total, average if total else 0.0]
+
+		for order in self._crypto_orders:
+			symbol = order['_symbol']
+			fill_price = self._order_state(order, self._mark(symbol + 'USD', now))
+			if fill_price is not None:
+				quantity = float(order['quantity']) * (1 if order['side'] == 'buy' else -1)
+				held, cost = self._holdings.get(symbol, [0.0, 0.0])
+				self._holdings[symbol] = [held + quantity, cost + quantity * fill_price]
+
+	@staticmethod
+	def _public(order):
+		return {k: v for k, v in order.items() if not k.startswith('_')}
+
+	def _place_order(self, base, query, body):
+		for key in ('instrument', 'symbol', 'quantity', 'side', 'type'):
+			if key not in body:
+				raise _Response(400, {key: ['This field is required.']})
+
+		order_id = self._new_id()
+		now = time.time()
+		order = {
+			'id': order_id,
+			'ref_id': body.get('ref_id'),
+			'url': f'{base}/orders/{order_id}/',
+			'account': body.get('account'),
+			'instrument': body['instrument'],
+			'symbol': body['symbol'].upper(),
+			'cancel': f'{base}/orders/{order_id}/cancel/',
+			'position': f'{base}/positions/{self._account_number()}/{self._instrument_id(body["symbol"].upper())}/',
+			'state': 'unconfirmed',
+			'side': body['side'],
+			'type': body['type'],
+			'trigger': body.get('trigger', 'immediate'),
+			'time_in_force': body.get('time_in_force', 'gfd'),
+			'extended_hours': body.get('extended_hours') in (True, 'true'),
+			'quantity': '{0:.5f}'.format(float(body['quantity'])),
+			'cumulative_quantity': '0.00000',
+			'price': body.get('price'),
+			'stop_price': body.get('stop_price'),
+			'average_price': None,
+			'fees': '0.00',
+			'reject_reason': None,
+			'executions': [],
+			'created_at': _iso_us(now),
+			'updated_at': _iso_us(now),
+			'last_transaction_at': _iso_us(now),
+			'_created': now,
+		}
+		with self._lock:
+			self._orders.insert(0, order)
+			self._orders_by_id[order_id] = order
+		return self._public(order)
+
+	def _get_order(self, orders, order_id):
+		with self._lock:
+			self._refresh_orders()
+			if order_id not in orders:
+				raise _Response(404)
+			return orders[order_id]
+
+	def _order(self, base, query, body, order_id):
+		return self._public(self._get_order(self._orders_by_id, order_id))
+
+	def _orders_page(self, base, query, body):
+		with self._lock:
+			self._refresh_orders()
+			orders = [self._public(order) for order in self._orders]
+		return self._page(base, '/orders/', query, orders)
+
+	def _cancel(self, order):
+		with self._lock:
+			if order['state'] in ('unconfirmed', 'confirmed'):
+				order['state'] = 'cancelled'
+				order['cancel'] = order['cancel_url'] = None
+				order['updated_at'] = _iso_us(time.time())
+		return {}
+
+	def _cancel_order(self, base, query, body, order_id):
+		return self._cancel(self._get_order(self._orders_by_id, order_id))
+
+	###########################################################################
+	#                               CRYPTO
+	###########################################################################
+
+	def _crypto_account_id(self):
+		return str(uuid.uuid5(_namespace, 'crypto' + self._account_number()))
+
+	def _crypto_accounts(self, base, query, body):
+		return {'next': None, 'previous': None, 'results': [{
+			'id': self._crypto_account_id(),
+			'status': 'active',
+			'buying_power': '100000.0000',
+			'buying_power_currency': 'USD',
+		}]}
+
+	def _crypto_portfolios(self, base, query, body):
+		return {'next': None, 'previous': None, 'results': [{
+			'account_id': self._crypto_account_id(),
+			'equity': '100000.0000',
+			'market_value': '0.0000',
+		}]}
+
+	def _crypto_holdings(self, base, query, body):
+		with self._lock:
+			self._refresh_orders()
+			holdings = [{
+				'account_id': self._crypto_account_id(),
+				'currency': {'code': code, 'id': str(uuid.uuid5(_namespace, code)), 'increment': '0.000000010000000000'},
+				'quantity': '{0:.18f}'.format(quantity),
+				'quantity_available': '{0:.18f}'.format(quantity),
+				'cost_bases': [{
+					'currency_id': str(uuid.uuid5(_namespace, 'USD')),
+					'direct_cost_basis': '{0:.18f}'.format(cost),
+					'direct_quantity': '{0:.18f}'.format(quantity),
+				}],
+			} for code, (quantity, cost) in sorted(self._holdings.items())]
+		return self._page(base, '/nummus/holdings/', query, holdings)
+
+	def _pair_json(self, code, pair_id):
+		return {
+			'id': pair_id,
+			'symbol': f'{code}-USD',
+			'name': f'{code} to US Dollar',
+			'asset_currency': {'code': code, 'id': str(uuid.uuid5(_namespace, code)), 'name': code, 'type': 'cryptocurrency',
+							   'increment': '0.000000010000000000'},
+			'quote_currency': {'code': 'USD', 'id': str(uuid.uuid5(_namespace, 'USD')), 'name': 'US Dollar', 'type': 'fiat',
+							   'increment': '0.010000000000000000'},
+			'min_order_size': '0.000001000000000000',
+			'max_order_size': '1000000.000000000000000000',
+			'min_order_price_increment': '0.010000000000000000',
+			'min_order_quantity_increment': '0.000000010000000000',
+			'tradability': 'tradable',
+			'display_only': False,
+		}
+
+	def _currency_pairs(self, base, query, body):
+		return {'next': None, 'previous': None,
+				'results': [self._pair_json(code, pair_id) for code, pair_id in self.crypto_pairs.items()]}
+
+	def _pair_code(self, pair_id):
+		for code, id in self.crypto_pairs.items():
+			if id == pair_id:
+				return code
+		raise _Response(404)
+
+	def _crypto_quote_json(self, pair_id):
+		code = self._pair_code(pair_id)
+		now = time.time()
+		mark = self._mark(code + 'USD', now)
+		return {
+			'ask_price': _price(mark * 1.001),
+			'bid_price': _price(mark * 0.999),
+			'mark_price': _price(mark),
+			'high_price': _price(mark * 1.03),
+			'low_price': _price(mark * 0.97),
+			'open_price': _price(self._mark(code + 'USD', now - 86400)),
+			'symbol': code + 'USD',
+			'id': pair_id,
+			'volume': '0.000000',
+		}
+
+	def _crypto_quote(self, base, query, body, pair_id):
+		return self._crypto_quote_json(pair_id)
+
+	def _crypto_quotes(self, base, query, body):
+		ids = [id for id in (query.get('ids') or '').split(',') if id]
+		return {'results': [self._crypto_quote_json(id) for id in ids]}
+
+	def _crypto_historicals(self, base, query, body, pair_id):
+		code = self._pair_code(pair_id)
+		interval, span, rows = self._bars(code + 'USD', query)
+		return {
+			'bounds': query.get('bounds') or '24_7',
+			'interval': interval,
+			'span': span,
+			'symbol': code + 'USD',
+			'id': pair_id,
+			'data_points': rows,
+		}
+
+	def _place_crypto_order(self, base, query, body):
+		for key in ('currency_pair_id', 'quantity', 'side', 'type', 'account_id'):
+			if key not in body:
+				raise _Response(400, {key: ['This field is required.']})
+
+		order_id = self._new_id()
+		now = time.time()
+		order = {
+			'id': order_id,
+			'ref_id': body.get('ref_id'),
+			'account_id': body['account_id'],
+			'currency_pair_id': body['currency_pair_id'],
+			'cancel_url': f'{base}/nummus/orders/{order_id}/cancel/',
+			'state': 'unconfirmed',
+			'side': body['side'],
+			'type': body['type'],
+			'time_in_force': body.get('time_in_force', 'gtc'),
+			'quantity': '{0:.18f}'.format(float(body['quantity'])),
+			'cumulative_quantity': '0.000000000000000000',
+			'price': body.get('price'),
+			'average_price': None,
+			'rounded_executed_notional': '0.00',
+			'executions': [],
+			'created_at': _iso_us(now),
+			'updated_at': _iso_us(now),
+			'last_transaction_at': None,
+			'_created': now,
+			'_symbol': self._pair_code(body['currency_pair_id']),
+		}
+		with self._lock:
+			self._crypto_orders.insert(0, order)
+			self._crypto_orders_by_id[order_id] = order
+		return self._public(order)
+
+	def _crypto_orders_page(self, base, query, body):
+		with self._lock:
+			self._refresh_orders()
+			orders = [self._public(order) for order in self._crypto_orders]
+		return self._page(base, '/nummus/orders/', query, orders)
+
+	def _crypto_order(self, base, query, body, order_id):
+		return self._public(self._get_order(self._crypto_orders_by_id, order_id))
+
+	def _cancel_crypto_order(self, base, query, body, order_id):
+		return self._cancel(self._get_order(self._crypto_orders_by_id, order_id))
+
+
+class _Handler(BaseHTTPRequestHandler):
+	protocol_version = 'HTTP/1.1'  # keep-alive
+	disable_nagle_algorithm = True
+	wbufsize = -1  # headers and body go out in one write
+	simulator = None
+
+	def _respond(self, method):
+		length = int(self.headers.get('Content-Length') or 0)
+		body = self.rfile.read(length) if length else b''
+		host = self.headers.get('Host') or '%s:%s' % self.server.server_address[:2]
+		status, payload, headers = self.simulator.handle(method, f'http://{host}{self.path}', body, self.headers)
+
+		data = json.dumps(payload, separators=(',', ':')).encode()
+		self.send_response(status)
+		self.send_header('Content-Type', 'application/json')
+		self.send_header('Content-Length', str(len(data)))
+		for key, value in headers.items():
+			self.send_header(key, value)
+		self.end_headers()
+		self.wfile.write(data)
+
+	def do_GET(self):
+		self._respond('GET')
+
+	def do_POST(self):
+		self._respond('POST')
+
+	def log_message(self, format, *args):
+		pass
+
+
+class _Server(ThreadingHTTPServer):
+	daemon_threads = True
+	request_queue_size = 1024
+
+
+def serve(simulator=None, host='127.0.0.1', port=8000, background=False):
+	"""
+	Serves a Simulator over http, returns the server when `background` is set
+	(stop it with `server.shutdown()`), otherwise blocks forever.
+	"""
+	handler = type('Handler', (_Handler,), {'simulator': simulator or Simulator()})
+	server = _Server((host, port), handler)
+	if not background:
+		server.serve_forever()
+		return server
+
+	threading.Thread(target=server.serve_forever, daemon=True).start()
+	return server
+
+
+def main(argv=None):
+	import argparse
+	parser = argparse.ArgumentParser(description="Local stand-in Robinhood api server")
+	parser.add_argument('--host', default='127.0.0.1')
+	parser.add_argument('--port', type=int, default=8000)
+	parser.add_argument('--seed', type=int, default=0)
+	parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+	parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of 500 responses')
+	parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of 429 responses')
+	parser.add_argument('--fill-delay', type=float, default=0.5, help='seconds until marketable orders fill')
+	args = parser.parse_args(argv)
+
+	simulator = Simulator(seed=args.seed,
+						  latency=args.latency,
+						  error_rate=args.error_rate,
+						  throttle_rate=args.throttle_rate,
+						  fill_delay=args.fill_delay)
+	print(f'serving the simulated api on http://{args.host}:{args.port}')
+	serve(simulator, args.host, args.port)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,165 @@
+"""
+Order lifecycle latency tracing.
+
+Every order placed carries an `OrderTrace` (`order.trace`) with monotonic nanosecond timestamps
+(`time.perf_counter_ns`) of its client-side phases:
+
+    start -> instrument/quote/account/risk (the lookups of place_order) -> sent -> ack -> filled
+
+The server's `created_at` and fill time are converted against a wall-clock anchor taken with the
+trace, which splits the latency of an order into client, network and venue parts:
+
+    client_ms       start -> sent, the lookups and the encoding before the POST
+    ack_ms          sent -> ack, the round trip of the POST
+    venue_ack_ms    sent -> server created_at (one way + server, includes the clock offset to the server)
+    venue_fill_ms   server created_at -> server fill time, time spent at the venue
+    fill_seen_ms    server fill time -> filled first seen by `Order.update` (polling + network)
+    fill_ms         ack -> filled first seen
+
+Traces are collected by the Trader's `LatencyRecorder` (`trader.latency`) on the ack and on the fill.
+"""
+
+from .detail.common import iso_to_ns
+from collections import deque
+import threading
+import time
+
+
+class OrderTrace:
+	"""The phase timestamps (time.perf_counter_ns) of a single order"""
+
+	__slots__ = ('symbol', 'type', 'side', 'phases', 'order_id', 'created_at_ns', 'filled_at_ns',
+				 '_anchor_wall', '_anchor_mono')
+
+	def __init__(self, symbol=None, type=None, side=None):
+		self.symbol = symbol
+		self.type = type
+		self.side = side
+		self.phases = {}
+		self.order_id = None
+		self.created_at_ns = None  # server side, epoch ns
+		self.filled_at_ns = None   # server side, epoch ns
+		self._anchor_wall = time.time_ns()
+		self._anchor_mono = time.perf_counter_ns()
+		self.phases['start'] = self._anchor_mono
+
+	def mark(self, phase):
+		"""Records the current time of `phase` (the first time only)"""
+		if phase not in self.phases:
+			self.phases[phase] = time.perf_counter_ns()
+
+	def wall_ns(self, phase):
+		"""The epoch nanoseconds of a phase, comparable to the server timestamps"""
+		mono = self.phases.get(phase)
+		return None if mono is None else self._anchor_wall + (mono - self._anchor_mono)
+
+	def on_ack(self, order: dict):
+		self.mark('ack')
+		self.order_id = order.get('id')
+		self.created_at_ns = iso_to_ns(order.get('created_at'))
+		if order.get('state') == 'filled':
+			self.on_filled(order)
+
+	def on_filled(self, order: dict):
+		if 'filled' in self.phases:
+			return
+		self.mark('filled')
+		executions = order.get('executions') or []
+		self.filled_at_ns = iso_to_ns(executions[-1].get('timestamp') if executions else None) \
+			or iso_to_ns(order.get('last_transaction_at') or order.get('updated_at'))
+
+	def _between(self, first, last):
+		if first is None or last is None:
+			return None
+		return (last - first) / 1e6
+
+	def latencies(self) -> dict:
+		"""the phase latencies in milliseconds (None for the phases not reached)"""
+		phases = self.phases
+		return {
+			'client_ms': self._between(phases.get('start'), phases.get('sent')),
+			'ack_ms': self._between(phases.get('sent'), phases.get('ack')),
+			'venue_ack_ms': self._between(self.wall_ns('sent'), self.created_at_ns),
+			'venue_fill_ms': self._between(self.created_at_ns, self.filled_at_ns),
+			'fill_seen_ms': self._between(self.filled_at_ns, self.wall_ns('filled')),
+			'fill_ms': self._between(phases.get('ack'), phases.get('filled')),
+		}
+
+	def to_dict(self) -> dict:
+		start = self.phases['start']
+		row = {'order_id': self.order_id, 'symbol': self.symbol, 'type': self.type, 'side': self.side}
+		# the time of each phase since the start
+		row.update({f'{phase}_at_ms': (t - start) / 1e6 for phase, t in self.phases.items() if phase != 'start'})
+		row.update(self.latencies())
+		return row
+
+
+class LatencyRecorder:
+	"""
+	Collects order traces and aggregates their latencies.
+
+	Args:
+		max_traces: the most recent traces kept
+	"""
+
+	metrics = ('client_ms', 'ack_ms', 'venue_ack_ms', 'venue_fill_ms', 'fill_seen_ms', 'fill_ms')
+
+	def __init__(self, max_traces=10000):
+		self.traces = deque(maxlen=max_traces)
+		self._recorded = set()
+		self._lock = threading.Lock()
+
+	def __getstate__(self):
+		state = self.__dict__.copy()
+		del state['_lock']
+		return state
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self._lock = threading.Lock()
+		self._recorded = {id(trace) for trace in self.traces}  # the ids of the unpickled traces
+
+	def record(self, trace: OrderTrace):
+		"""Adds a trace (once, later phases of the same trace are picked up automatically)"""
+		with self._lock:
+			if id(trace) in self._recorded:
+				return
+			if len(self.traces) == self.traces.maxlen:
+				self._recorded.discard(id(self.traces[0]))
+			self.traces.append(trace)
+			self._recorded.add(id(trace))
+
+	def __len__(self):
+		return len(self.traces)
+
+	def to_frame(self):
+		"""DataFrame with one row per trace: the phase times since the start and the latencies (ms)"""
+		import pandas as pd
+		with self._lock:
+			rows = [trace.to_dict() for trace in self.traces]
+		return pd.DataFrame(rows)
+
+	def percentiles(self, by='symbol', percentiles=(50, 90, 99)):
+		"""
+		Args:
+			by: 'symbol', 'type', 'side' or a list of those
+		Returns: DataFrame indexed by the `by` keys and the percentile, one column per latency metric
+		"""
+		import pandas as pd
+		df = self.to_frame()
+		if df.empty:
+			return pd.DataFrame(columns=self.metrics)
+		metrics = [metric for metric in self.metrics if metric in df]
+		quantiles = [p / 100 for p in percentiles]
+		result = df.groupby(by)[metrics].quantile(quantiles)
+		result.index = result.index.set_names('percentile', level=-1)
+		return result.rename(index=dict(zip(quantiles, percentiles)), level='percentile')
+
+	def export(self, path, by='symbol'):
+		"""Writes the traces (.csv or .jsonl), or their percentiles by `by` for a .json path"""
+		if path.endswith('.json'):
+			self.percentiles(by).reset_index().to_json(path, orient='records', indent=2)
+		elif path.endswith('.jsonl'):
+			self.to_frame().to_json(path, orient='records', lines=True)
+		else:
+			self.to_frame().to_csv(path, index=False)
@@ -1,36 +1,73 @@
-from .order import Order
+from .order import Order, OrderCollection, closed_states, canceled_states
 from .quote import Quote, HistoricalQuote
 
-from six.moves.urllib.request import getproxies
 from six.moves import input
 
 import getpass
 import requests
 import uuid
 import pickle
+import os
+import tempfile
 
 from . import endpoints
+from . import crypto_endpoints
 from six.moves.urllib.parse import unquote
-from json import dumps
+from .detail import codec
 from .crypto_trader import CryptoTrader
+from .transport import RequestsTransport
+from .tracing import OrderTrace, LatencyRecorder
+from .quote_cache import QuoteCache
+
+from .detail.common import _datelike_to_datetime, _map_concurrent, _chunks, \
+    time_ns_now, iso_to_ns, iso_to_ns_array, ns_to_index
+from datetime import datetime, timedelta, timezone
+
+
+def _utc(date):
+    """naive UTC datetime of a naive (assumed UTC) or timezone aware datetime"""
+    return date.astimezone(timezone.utc).replace(tzinfo=None) if date.tzinfo else date
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _utc_iso(date):
+    return _utc(date).strftime('%Y-%m-%dT%H:%M:%SZ') if date else None
 
-from .detail.common import _datelike_to_datetime
 
 class Trader:
 
     client_id = "c82SH0WZOsabOXGP2sxqcj34FxkvfnWRZBKlBjFS"
     request_timeout = 15
+    batch_size = 50  # ids/symbols per multi-id request
     ###########################################################################
     #                       Logging in and initializing
     ###########################################################################
 
-    def __init__(self, username=None, password=None):
+    def __init__(self, username=None, password=None, api_url=None, crypto_api_url=None, transport=None):
+        """
+        Args:
+            api_url: replaces "https://api.robinhood.com", ie: a local `robinhood.simulator`
+            crypto_api_url: replaces "https://nummus.robinhood.com", defaults to `api_url` + '/nummus'
+            transport: a `robinhood.transport` Transport, defaults to a RequestsTransport (requests.Session)
+        """
+        self.api_url = api_url
+        self.crypto_api_url = crypto_api_url or (api_url + '/nummus' if api_url else None)
         self._crypto_trader = CryptoTrader(self)
         self.auth_token = None
-        self.session = requests.session()
-        self.session.proxies = getproxies()
+        self.transport = transport or RequestsTransport()
         self.refresh_token = None
-        self.session.headers = {
+        self._instrument_cache = {}
+        self._instrument_ids = {}
+        self._account_url = None
+        self.risk = None  # a `robinhood.risk.RiskEngine`, checks every order before it is placed
+        self.latency = LatencyRecorder()  # the lifecycle traces of the orders placed
+        self._warmer = None
+        self.quote_cache = QuoteCache(self._fetch_quote)  # shared by `quote`, see `quote_stats`
+        self._calendar = None
+        self.transport.headers = {
             "Accept": "*/*",
             "Accept-Encoding": "gzip, deflate",
             "Accept-Language": "en;q=1, fr;q=0.9, de;q=0.8, ja;q=0.7, nl;q=0.6, it;q=0.5",
@@ -80,11 +117,11 @@ class Trader:
         else:
             payload['challenge_type'] = 'sms'
 
-        res = self.session.post(endpoints.login(), data=payload, timeout=self.request_timeout, verify=True)
+        res = self.transport.post(self._url(endpoints.login()), data=payload, timeout=self.request_timeout, verify=True)
         if not res:
             print(res.text)
             res.raise_for_status()
-        data = res.json()
+        data = codec.loads(res.content)
 
         if 'mfa_required' in data.keys():
             mfa_code = input("MFA: ")
@@ -93,7 +130,35 @@ class Trader:
         if 'access_token' in data.keys() and 'refresh_token' in data.keys():
             self.auth_token = data['access_token']
             self.refresh_token = data['refresh_token']
-            self.session.headers['Authorization'] = 'Bearer ' + self.auth_token
+            self.transport.headers['Authorization'] = 'Bearer ' + self.auth_token
+            return res
+
+        return False
+
+    def refresh_auth(self):
+        """Exchanges the refresh token for a new access token (no password or MFA required)
+
+        Returns:
+            (bool): received a valid auth token
+
+        """
+        payload = {
+            'grant_type': 'refresh_token',
+            'refresh_token': self.refresh_token,
+            'expires_in': 603995,
+            'scope': 'internal',
+            'client_id': self.client_id,
+        }
+        res = self.transport.post(self._url(endpoints.login()), data=payload, timeout=self.request_timeout, verify=True)
+        if not res:
+            print(res.text)
+            res.raise_for_status()
+        data = codec.loads(res.content)
+
+        if 'access_token' in data.keys() and 'refresh_token' in data.keys():
+            self.auth_token = data['access_token']
+            self.refresh_token = data['refresh_token']
+            self.transport.headers['Authorization'] = 'Bearer ' + self.auth_token
             return res
 
         return False
@@ -109,36 +174,106 @@ class Trader:
             'client_id': self.client_id,
             'token': self.refresh_token
         }
-        res = self.session.post(endpoints.logout(), data=payload, timeout=self.request_timeout)
-        self.session.headers['Authorization'] = None
+        res = self.transport.post(self._url(endpoints.logout()), data=payload, timeout=self.request_timeout)
+        self.transport.headers['Authorization'] = None
         self.auth_token = None
         res.raise_for_status()
         return res
 
-    def _req_get(self, *args, timeout=15, asjson=True, **kwargs):
-        res = self.session.get(*args, timeout=timeout, **kwargs)
+    @property
+    def session(self):
+        """The transport, kept under its former name (it used to be a `requests.Session`)"""
+        return self.transport
+
+    @session.setter
+    def session(self, transport):
+        self.transport = transport
+
+    def _url(self, url):
+        """Redirects the robinhood urls to `api_url`/`crypto_api_url` when those are set"""
+        if self.api_url and url.startswith(endpoints.api_url):
+            return self.api_url + url[len(endpoints.api_url):]
+        if self.crypto_api_url and url.startswith(crypto_endpoints.crypto_base_url):
+            return self.crypto_api_url + '/' + url[len(crypto_endpoints.crypto_base_url):].lstrip('/')
+        return url
+
+    def _req_get(self, url, *args, timeout=15, asjson=True, keys=None, **kwargs):
+        """`keys`: only decode these top-level keys of the json response"""
+        try:
+            res = self.transport.get(self._url(url), *args, timeout=timeout, **kwargs)
+        except Exception:
+            if self._warmer: self._warmer.rewarm()
+            raise
 
         if not res:
             print(res.text)
             res.raise_for_status()
-        return res.json() if asjson else res
+        return codec.loads(res.content, keys) if asjson else res
 
-    def _req_post(self, *args, timeout=15, asjson=True, **kwargs):
+    def _req_post(self, url, *args, timeout=15, asjson=True, **kwargs):
         """Should be used for api calls only (not login)"""
-        self.session.headers['Content-Type'] = 'application/json'
-        self.session.headers['Accept'] = '*/*'
-        self.session.headers['Sec-Fetch-Site'] = 'same-site'
-        self.session.headers['Sec-Fetch-Mode'] = 'cors'
-        self.session.headers['Accept-Encoding'] = 'gzip, deflate, br'
-        self.session.headers['Accept-Language'] = 'en-US,en;q=0.9'
-        res = self.session.post(*args, timeout=timeout, **kwargs)
+        self.transport.headers['Content-Type'] = 'application/json'
+        self.transport.headers['Accept'] = '*/*'
+        self.transport.headers['Sec-Fetch-Site'] = 'same-site'
+        self.transport.headers['Sec-Fetch-Mode'] = 'cors'
+        self.transport.headers['Accept-Encoding'] = 'gzip, deflate, br'
+        self.transport.headers['Accept-Language'] = 'en-US,en;q=0.9'
+        try:
+            res = self.transport.post(self._url(url), *args, timeout=timeout, **kwargs)
+        except Exception:
+            if self._warmer: self._warmer.rewarm()
+            raise
         if not res:
             print(res.text)
             if 'data' in kwargs:
                 print('payload:', kwargs['data'])
 
             res.raise_for_status()
-        return res.json() if asjson else res
+        return codec.loads(res.content) if asjson else res
+
+    def _pages(self, url):
+        """Yields each page of a paginated endpoint, following the `next` urls"""
+        while url:
+            page = self._req_get(url)
+            yield page
+            url = page.get('next')
+
+    def _paginate(self, url):
+        """Yields every result of a paginated endpoint"""
+        for page in self._pages(url):
+            yield from page['results']
+
+    def _open_orders(self, url):
+        """The open orders of an order list, every page is read (a gtc order may be older than any page)"""
+        return [order for order in self._paginate(url) if order['state'] not in closed_states]
+
+    ###########################################################################
+    #                               CONNECTIONS
+    ###########################################################################
+
+    def warm_connections(self, interval=20, connections=2, urls=None):
+        """Opens and keeps alive `connections` connections to each api host (stocks and crypto),
+            so that orders never wait on a connection handshake, see `robinhood.keepalive.ConnectionWarmer`.
+            Call again to change the settings, `interval=None` stops the keep-alive."""
+        from .keepalive import ConnectionWarmer
+        if self._warmer:
+            self._warmer.stop()
+            self._warmer = None
+        if interval:
+            self._warmer = ConnectionWarmer(self, interval, connections, urls).start()
+        return self._warmer
+
+    def connection_stats(self):
+        """{host: {'connections': opened, 'requests': made, 'idle': kept alive}} of the transport"""
+        return self.transport.stats()
+
+    @property
+    def calendar(self):
+        """The (lazily created) `MarketCalendar` of the stock market, paces the polling loops"""
+        if self._calendar is None:
+            from .market_calendar import MarketCalendar
+            self._calendar = MarketCalendar(self)
+        return self._calendar
 
     ###########################################################################
     #                               GET CRYPTO FUNCTIONS
@@ -153,9 +288,24 @@ class Trader:
 
     def save_session(self, session_name):
         """Save your python session to avoid logging in again,
-            reload with `Trader.load_session(session_name)`"""
-        with open(session_name, 'wb') as file:
-            pickle.dump(self, file)
+            reload with `Trader.load_session(session_name)`.
+            The file is replaced atomically, a concurrent `load_session` never reads a partial session"""
+        directory = os.path.dirname(os.path.abspath(session_name))
+        fd, temp_name = tempfile.mkstemp(prefix='.session-', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                pickle.dump(self, file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_name, session_name)
+        except BaseException:
+            os.remove(temp_name)
+            raise
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_warmer'] = None  # a thread, call `warm_connections` again after loading
+        return state
 
     @staticmethod
     def load_session(session_name):
@@ -171,27 +321,106 @@ class Trader:
         """Fetch fundamentals info"""
         return self._req_get(endpoints.fundamentals(symbol.upper()))
 
+    def fundamentals_many(self, symbols, max_workers=8):
+        """Fetch the fundamentals of many symbols in batched requests,
+            returns a DataFrame indexed by symbol, see `robinhood.reference.fundamentals_many`"""
+        from .reference import fundamentals_many
+        return fundamentals_many(self, symbols, max_workers)
+
     def instrument(self, symbol):
-        """Fetch instrument info"""
+        """Fetch instrument info, raises for unknown symbols"""
         url = str(endpoints.instruments()) + "?symbol=" + str(symbol)
-        results = self._req_get(url)['results'][0]
-        return results if results else Exception(f"Invalid symbol: {symbol}")
-
-    def quote(self, symbol):
-        """Fetch stock quote"""
+        results = self._req_get(url)['results']
+        if not results or not results[0]:
+            raise Exception(f"Invalid symbol: {symbol}")
+        return results[0]
+
+    def instruments_many(self, symbols_or_ids, max_workers=8):
+        """Fetch (and cache) the instruments of many symbols and/or instrument ids in batched requests,
+            returns a DataFrame indexed by symbol, see `robinhood.reference.instruments_many`"""
+        from .reference import instruments_many
+        return instruments_many(self, symbols_or_ids, max_workers)
+
+    def _instrument_id(self, symbol):
+        """Returns the (cached) instrument id of a symbol"""
         symbol = symbol.upper()
+        if symbol not in self._instrument_ids:
+            instrument = self.instrument(symbol)
+            self._instrument_cache[instrument['id']] = instrument
+            self._instrument_ids[symbol] = instrument['id']
+        return self._instrument_ids[symbol]
+
+    def quote(self, symbol, max_age=None):
+        """Fetch stock quote
+
+        Args:
+            max_age: seconds, returns the cached quote if it was received at most `max_age` seconds ago.
+                Concurrent calls for the same symbol share a single request either way.
+        """
+        return self.quote_cache.get(symbol.upper(), max_age)
+
+    def _fetch_quote(self, symbol):
         url = str(endpoints.quotes()) + f"?symbols={symbol}"
-        return Quote(self._req_get(url)['results'][0])
+        quote = self._req_get(url)['results'][0]
+        if not quote:
+            raise Exception(f"Invalid symbol: {symbol}")
+        return Quote(quote)
+
+    def quote_stats(self):
+        """The hits, misses and coalesced requests of the quote cache"""
+        return self.quote_cache.stats()
+
+    def quotes(self, symbols, max_workers=8):
+        """Fetch stock quotes for many symbols using batched multi-symbol requests,
+            returns a list of Quote in the order of `symbols` (None for unknown symbols)"""
+        def fetch(chunk):
+            return self._req_get(endpoints.quotes(chunk))['results']
+
+        chunks = _chunks([symbol.upper() for symbol in symbols], self.batch_size)
+        pages = _map_concurrent(fetch, chunks, max_workers)
+        quotes = [Quote(quote) if quote else None for page in pages for quote in page]
+        for quote in quotes:
+            if quote:
+                self.quote_cache.put(quote.symbol, quote)
+        return quotes
+
+    def _instruments_by_id(self, ids, max_workers=8):
+        """Fetch (and cache) the instruments of many instrument ids, returns {id: instrument}"""
+        def fetch(chunk):
+            return self._req_get(endpoints.instruments(ids=chunk))['results']
+
+        missing = {id for id in ids if id not in self._instrument_cache}
+        for page in _map_concurrent(fetch, _chunks(missing, self.batch_size), max_workers):
+            for instrument in page:
+                if instrument:
+                    self._instrument_cache[instrument['id']] = instrument
+
+        return {id: self._instrument_cache[id] for id in ids if id in self._instrument_cache}
+
+    def option_chain(self, symbol, expirations=None, type=None, rate=0.0, dividend_yield=0.0, max_workers=8):
+        """
+        Fetch an options chain with market data and (vectorized) Black-Scholes greeks.
+
+        Args:
+            symbol: the underlying stock symbol
+            expirations: expiration date(s) 'YYYY-MM-DD', defaults to every expiration of the chain
+            type: 'call' or 'put', defaults to both
+            rate: the risk-free rate (continuously compounded, annual)
+            dividend_yield: the underlying's continuous dividend yield
+
+        Returns: DataFrame, one row per option, see `robinhood.options.option_chain`
+        """
+        from .options import option_chain
+        return option_chain(self, symbol, expirations, type, rate, dividend_yield, max_workers)
 
     def orderbook(self, symbol):
         """Returns the orderbook json, only valid for gold users, not supported for crypto"""
         symbol = symbol.upper()
-        instrument_id = self.instrument(symbol)['id']
+        instrument_id = self._instrument_id(symbol)
         return self._req_get(endpoints.orderbook(instrument_id))
 
     def watch_orderbook(self, symbol, tick_duration=1, book_view_size=15):
         from ...common import _get_console_color, _set_console_color
-        import time
 
         def view_book_string(bookhalf, color):
             s = _get_console_color(color)
@@ -212,11 +441,29 @@ class Trader:
             book_str += view_book_string(truncate(book['bids']), 'red')
             print(book_str)
             _set_console_color('white')
-            time.sleep(tick_duration)
+            self.calendar.sleep(tick_duration)
 
     __valid_spans = ['hour', 'day', 'week', 'month', '3month', 'year', '5year', 'all']
     __valid_intervals = ['15second', '5minute', '10minute', 'hour', 'day', 'week']
 
+    # the longest start/stop range the server returns in full per interval (the span limits of each interval)
+    _history_windows = {
+        '15second': timedelta(days=1),
+        '5minute': timedelta(weeks=1),
+        '10minute': timedelta(weeks=1),
+        'hour': timedelta(days=90),
+        'day': timedelta(days=5 * 365),
+        'week': None,
+    }
+    _interval_steps = {
+        '15second': timedelta(seconds=15),
+        '5minute': timedelta(minutes=5),
+        '10minute': timedelta(minutes=10),
+        'hour': timedelta(hours=1),
+        'day': timedelta(days=1),
+        'week': timedelta(weeks=1),
+    }
+
     def historical_quotes(self,
                           symbol,
                           interval=None,
@@ -224,12 +471,22 @@ class Trader:
                           start=None,
                           stop=None,
                           bounds=None,
+                          max_workers=4,
                           _json_key='historicals',
                           _endpoint=endpoints):
-        """Fetch historical data for stock"""
+        """Fetch historical data for stock
 
-        if start: start = _datelike_to_datetime(start).strftime('%Y-%m-%dT%H:%M:%SZ')
-        if stop:  stop = _datelike_to_datetime(stop).strftime('%Y-%m-%dT%H:%M:%SZ')
+        A `start`/`stop` range longer than the server returns for `interval` is split into windows,
+        fetched concurrently (`max_workers` requests at a time) and stitched together, de-duplicated
+        on `begins_at`. Missing bars are listed in `DataFrame.attrs['gaps']` as (last bar, next bar)
+        pairs (within a day or longer than 4 days, at any time for `bounds='24_7'`), windows without any bars in
+        `DataFrame.attrs['empty_windows']`.
+        """
+
+        start = _datelike_to_datetime(start)
+        stop = _datelike_to_datetime(stop)
+        start = start and _utc(start)
+        stop = stop and _utc(stop)
         if stop: assert start
         if start:
             if not span: span = 'all'
@@ -243,22 +500,67 @@ class Trader:
             msg = "Invalid argument `span` must be one of " + str(self.__valid_spans)
             raise Exception(msg)
 
-        url = _endpoint.historical_quotes(
-            symbol=symbol,
-            bounds=bounds,
-            interval=interval,
-            span=span,
-            start=start,
-            stop=stop)
-        json = self._req_get(url)
-        if not json: return json
+        def fetch(window):
+            window_start, window_stop = window
+            url = _endpoint.historical_quotes(
+                symbol=symbol,
+                bounds=bounds,
+                interval=interval,
+                span=span,
+                start=_utc_iso(window_start),
+                stop=_utc_iso(window_stop))
+            json = self._req_get(url, keys=(_json_key,))
+            return json[_json_key] if json else []
+
+        windows = self._history_split(interval, start, stop)
+        if len(windows) == 1:
+            bars = fetch(windows[0])
+            if not bars: return None
+            return self._history_frame(bars)
+
+        pages = _map_concurrent(fetch, windows, max_workers)
+        bars = [bar for page in pages for bar in page]
+        if not bars: return None
+
+        df = self._history_frame(bars)
+        df = df[~df.begins_at.duplicated()].sort_index()
 
         import pandas as pd
-        df = pd.DataFrame(json[_json_key])
+        times = df.index
+        step = pd.Timedelta(self._interval_steps[interval])
+        spacing = times[1:] - times[:-1]
+        missing = spacing > step
+        if bounds != '24_7':
+            # the market is closed overnight, on weekends and holidays
+            missing &= (times[1:].normalize() == times[:-1].normalize()) | (spacing > pd.Timedelta(days=4))
+        df.attrs['gaps'] = list(zip(times[:-1][missing], times[1:][missing]))
+        df.attrs['empty_windows'] = [window for window, page in zip(windows, pages) if not page]
+        return df
+
+    def _history_split(self, interval, start, stop):
+        """The (start, stop) windows of a range, a single window if the server returns the range in full"""
+        window = self._history_windows[interval]
+        if not start or not window:
+            return [(start, stop)]
+
+        end = stop or _utcnow()
+        if end - start <= window:
+            return [(start, stop)]
+
+        windows = []
+        while start < end:
+            windows.append((start, min(start + window, end)))
+            start += window
+        return windows
+
+    @staticmethod
+    def _history_frame(bars):
+        import pandas as pd
+        df = pd.DataFrame(bars)
 
         keymap = {k:k.replace('_price', '') for k in df.keys()}
         df.rename(columns=keymap, inplace=True)
-        df.index = [pd.Timestamp(time) for time in df.begins_at.values]
+        df.index = ns_to_index(iso_to_ns_array(df.begins_at.values))
 
         float_columns = ['open', 'close', 'high', 'low']
         for fc in float_columns:
@@ -277,21 +579,40 @@ class Trader:
         """Returns the first portfolio result, current rb only supports 1 portfolio"""
         return self._req_get(endpoints.portfolios())['results'][0]
 
-    def orders(self):
-        orders = self._req_get(endpoints.orders())['results']
-        return [Order(self, order, False) for order in orders]
+    def orders(self, all_pages=False):
+        """Returns an `OrderCollection` of the most recent orders (the first page), or of every order"""
+        orders = list(self._paginate(endpoints.orders())) if all_pages \
+            else self._req_get(endpoints.orders())['results']
+        if self.risk:
+            for order in orders:
+                self.risk.on_update(order)
+        return OrderCollection(self, orders, Order)
 
     def order(self, order:[dict, str]):
         order_id = order['id'] if isinstance(order, dict) else order
-        json = self._req_get(endpoints.orders() + order_id)
+        json = self._req_get(endpoints.orders(order_id))
+        if self.risk:
+            self.risk.on_update(json)
         return Order(self, json, False)
 
     def dividends(self):
-        return self._req_get(endpoints.orders())
+        return self._req_get(endpoints.dividends())
 
     def positions(self):
         return self._req_get(endpoints.positions())
 
+    def portfolio_snapshot(self, include_crypto=True, max_workers=8):
+        """Returns a DataFrame of every (nonzero) position with its market value,
+            unrealized P&L and portfolio weight, see `robinhood.portfolio.snapshot`"""
+        from .portfolio import snapshot
+        return snapshot(self, include_crypto=include_crypto, max_workers=max_workers)
+
+    def export(self, kind, path, format=None, checkpoint=None):
+        """Streams the full history of `kind` ('orders', 'crypto_orders', 'dividends', 'positions')
+            to a csv, jsonl or parquet file, see `robinhood.export.export`"""
+        from .export import export
+        return export(self, kind, path, format=format, checkpoint=checkpoint)
+
     ###########################################################################
     #                               PLACE ORDER
     ###########################################################################
@@ -426,6 +747,7 @@ class Trader:
         if not time_in_force: time_in_force = 'gfd'
         assert (side in ['buy', 'sell'])
         assert (time_in_force in ['gfd', 'gtc'])
+        trace = OrderTrace(symbol.upper(), 'limit' if price else 'market', side)
 
         stop_args = [trailing_stop_amount, trailing_stop_percent, stop_price]
         if sum([bool(sa) for sa in stop_args]) > 1:
@@ -442,12 +764,18 @@ class Trader:
         order = 'limit' if price else 'market'
         symbol = symbol.upper()
         instrument = self.instrument(symbol)
+        trace.mark('instrument')
 
         if not (is_trailing_stop and side == 'sell') and not price:
-            price = self._fprice(self.quote(instrument['symbol']).last_trade_price)
+            price = self._fprice(self.quote(instrument['symbol']).mark)
+            trace.mark('quote')
+
+        if not self._account_url:
+            self._account_url = self.account()["url"]
+            trace.mark('account')
 
         payload = {
-            "account": self.account()["url"],
+            "account": self._account_url,
             "instrument": unquote(instrument["url"]),
             "symbol": instrument["symbol"],
             "quantity": quantity,
@@ -461,7 +789,8 @@ class Trader:
         }
 
         if trailing_stop_amount or trailing_stop_percent:
-            quote = self.quote(instrument['symbol']).mark
+            # the quote just fetched for the limit price (if any) rather than a second request
+            quote = self.quote(instrument['symbol'], max_age=1).mark
 
             if trailing_stop_amount:
                 trailing_peg = {
@@ -491,9 +820,25 @@ class Trader:
             payload['trailing_peg'] = trailing_peg
 
         payload = {k: v for k, v in payload.items() if v}
-        payload = dumps(payload)
-        json = self._req_post(endpoints.orders(), data=payload)
-        return Order(self, json)
+        reservation = None
+        if self.risk:
+            reservation = self.risk.check(payload['instrument'], side, quantity,
+                                          payload.get('price') or payload.get('stop_price'))
+            trace.mark('risk')
+
+        payload = codec.dumps(payload)
+        trace.mark('sent')
+        try:
+            json = self._req_post(endpoints.orders(), data=payload)
+        except Exception:
+            if reservation is not None:
+                self.risk.release(reservation)
+            raise
+        trace.on_ack(json)
+        self.latency.record(trace)
+        if self.risk:
+            self.risk.on_submit(json, reservation)
+        return Order(self, json, trace=trace)
 
     ###########################################################################
     #                               CANCEL ORDER
@@ -507,3 +852,66 @@ class Trader:
         else:
             raise Exception("Neither, 'cancel' nor 'cancel_url' were found")
         return self._req_post(cancel_url, asjson=False)
+
+    def cancel_all(self, symbol=None, side=None, older_than=None, max_workers=16):
+        """Cancel every open order matching the filters.
+
+        Args:
+            symbol: only cancel orders for this stock symbol
+            side: 'buy' or 'sell'
+            older_than: a timedelta (order age) or a datelike cutoff (UTC if naive)
+            max_workers: number of cancel requests in flight at once
+
+        Returns: dict with the orders 'canceled', those 'closed' otherwise in the meantime (filled, rejected,
+            failed) and those still 'open' after the cancels
+        """
+        instrument_url = unquote(self.instrument(symbol)['url']) if symbol else None
+
+        def matches(order):
+            return not instrument_url or unquote(order['instrument']) == instrument_url
+
+        return self._cancel_all(endpoints.orders(), Order, self, matches, side, older_than, max_workers)
+
+    def _cancel_all(self, url, order_type, owner, matches, side, older_than, max_workers):
+        if side: assert (side in ['buy', 'sell'])
+
+        cutoff = None  # epoch ns
+        if isinstance(older_than, timedelta):
+            cutoff = time_ns_now() - older_than // timedelta(microseconds=1) * 1000
+        elif older_than:
+            cutoff = iso_to_ns(_utc(_datelike_to_datetime(older_than)).isoformat())
+
+        def selected(order):
+            return order['state'] not in closed_states \
+                and (order.get('cancel') or order.get('cancel_url')) \
+                and (not side or order['side'] == side) \
+                and (cutoff is None or iso_to_ns(order['created_at']) < cutoff) \
+                and matches(order)
+
+        targets = [order for order in self._open_orders(url) if selected(order)]
+
+        def cancel(order):
+            try:
+                return self.cancel(order)
+            except requests.HTTPError as e:  # most likely filled/canceled in the meantime
+                return e
+
+        _map_concurrent(cancel, targets, max_workers)
+
+        # confirm the final states in a single walk over the order pages, until every target is seen
+        pending = {order['id'] for order in targets}
+        refreshed = {}
+        for order in self._paginate(url if pending else None):
+            if order['id'] in pending:
+                pending.remove(order['id'])
+                refreshed[order['id']] = order
+                if not pending:
+                    break
+
+        orders = [order_type(owner, refreshed.get(order['id'], order), False) for order in targets]
+        return {
+            'canceled': [order for order in orders if order._dict['state'] in canceled_states],
+            'closed': [order for order in orders if order._dict['state'] in closed_states
+                       and order._dict['state'] not in canceled_states],
+            'open': [order for order in orders if order._dict['state'] not in closed_states]
+        }
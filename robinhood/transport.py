@@ -0,0 +1,247 @@
+"""
+The http layer of the Trader.
+
+A transport supplies `headers`, `get(url, **kwargs)` and `post(url, data=None, **kwargs)`,
+returning responses that support `bool(res)`, `status_code`, `content`, `text`, `json()` and
+`raise_for_status()` (raising `requests.HTTPError`), like a `requests.Session` does.
+
+ - RequestsTransport: `requests.Session`, http/1.1 (the default)
+ - Http2Transport:    `httpx` with http/2, many concurrent requests multiplexed over one connection per host
+ - InMemoryTransport: answers in-process, by default from a `robinhood.simulator.Simulator` (tests/benchmarks)
+"""
+
+from six.moves.urllib.parse import urlsplit
+from six.moves.urllib.request import getproxies
+from .detail import codec
+import threading
+
+
+class Response:
+	"""A minimal `requests.Response` look-alike for the non-requests transports"""
+
+	def __init__(self, status_code, content, url, headers=None):
+		self.status_code = status_code
+		self.content = content
+		self.url = url
+		self.headers = headers or {}
+		self.ok = status_code < 400
+
+	def __bool__(self):
+		return self.ok
+
+	@property
+	def text(self):
+		return self.content.decode()
+
+	def json(self):
+		return codec.loads(self.content)
+
+	def raise_for_status(self):
+		if not self.ok:
+			import requests
+			raise requests.HTTPError(f'{self.status_code} Error for url: {self.url}', response=self)
+
+
+class Transport:
+
+	headers = None
+
+	def get(self, url, timeout=None, **kwargs):
+		raise NotImplementedError
+
+	def post(self, url, data=None, timeout=None, **kwargs):
+		raise NotImplementedError
+
+	def close(self):
+		pass
+
+	def stats(self) -> dict:
+		"""{host: {'connections': connections opened, 'requests': requests made}} as far as the transport tracks them"""
+		return {}
+
+
+class RequestsTransport(Transport):
+
+	def __init__(self, session=None):
+		import requests
+		self.session = session or requests.session()
+		self.session.proxies = getproxies()
+
+	@property
+	def headers(self):
+		return self.session.headers
+
+	@headers.setter
+	def headers(self, headers):
+		self.session.headers = headers
+
+	def get(self, url, timeout=None, **kwargs):
+		return self.session.get(url, timeout=timeout, **kwargs)
+
+	def post(self, url, data=None, timeout=None, **kwargs):
+		return self.session.post(url, data=data, timeout=timeout, **kwargs)
+
+	def close(self):
+		self.session.close()
+
+	def stats(self):
+		"""
+		The urllib3 pool counters per host: `connections` is the number of connections opened
+		(each one a DNS/TCP/TLS handshake), every other request reused a kept-alive connection.
+		"""
+		stats = {}
+		for adapter in self.session.adapters.values():
+			pools = getattr(getattr(adapter, 'poolmanager', None), 'pools', None)
+			if pools is None:
+				continue
+			for key in pools.keys():
+				pool = pools[key]
+				stats[f'{pool.scheme}://{pool.host}:{pool.port}'] = {
+					'connections': pool.num_connections,
+					'requests': pool.num_requests,
+					# the kept-alive connections waiting in the pool (the empty slots are None)
+					'idle': sum(conn is not None for conn in list(pool.pool.queue)) if pool.pool else 0,
+				}
+		return stats
+
+
+class Http2Transport(Transport):
+	"""
+	Http/2 through `httpx` (pip install httpx[http2]). One thread-safe client multiplexes
+	concurrent requests as streams over a single connection per host.
+
+	Args:
+		max_connections: size of the httpx connection pool; with http/2 one connection per host
+			carries every concurrent request (as many streams as the server allows), the extra
+			connections are only opened to hosts that fall back to http/1.1
+	"""
+
+	def __init__(self, max_connections=100):
+		try:
+			import httpx
+			import h2  # noqa: F401, required by httpx for http2
+		except ImportError:
+			raise Exception("Http2Transport requires `httpx` with http2 support (pip install httpx[http2])")
+
+		self.max_connections = max_connections
+		self.headers = {}
+		self._client = None
+		self._lock = threading.Lock()
+		self._requests = {}  # origin -> requests made
+
+	def __getstate__(self):
+		return {'max_connections': self.max_connections, 'headers': self.headers}
+
+	def __setstate__(self, state):
+		if 'max_streams' in state:  # pickled before the rename
+			state['max_connections'] = state.pop('max_streams')
+		self.__dict__.update(state)
+		self._client = None
+		self._lock = threading.Lock()
+		self._requests = {}
+
+	@property
+	def client(self):
+		if self._client is None:
+			import httpx
+			with self._lock:
+				if self._client is None:
+					self._client = httpx.Client(
+						http2=True,
+						proxy=getproxies().get('https'),
+						limits=httpx.Limits(max_connections=self.max_connections,
+											max_keepalive_connections=self.max_connections))
+		return self._client
+
+	@staticmethod
+	def _origin(url):
+		parts = urlsplit(url)
+		return f'{parts.scheme}://{parts.hostname}:{parts.port or (443 if parts.scheme == "https" else 80)}'
+
+	def _request(self, method, url, data=None, timeout=None, headers=None, **kwargs):
+		headers = {k: v for k, v in {**self.headers, **(headers or {})}.items() if v is not None}
+		origin = self._origin(url)
+		with self._lock:
+			self._requests[origin] = self._requests.get(origin, 0) + 1
+		res = self.client.request(method, url, data=data if isinstance(data, dict) else None,
+								  content=data if isinstance(data, (str, bytes)) else None,
+								  headers=headers, timeout=timeout)
+		return Response(res.status_code, res.content, str(res.url), res.headers)
+
+	def get(self, url, timeout=None, **kwargs):
+		return self._request('GET', url, timeout=timeout, **kwargs)
+
+	def post(self, url, data=None, timeout=None, **kwargs):
+		return self._request('POST', url, data=data, timeout=timeout, **kwargs)
+
+	def close(self):
+		if self._client is not None:
+			self._client.close()
+			self._client = None
+
+	def stats(self):
+		"""
+		Per host: `requests` made and the `connections` currently in the httpx pool (httpcore does not
+		count the connections it has closed), `idle` of which have no stream in flight.
+		"""
+		with self._lock:
+			stats = {origin: {'connections': 0, 'requests': requests, 'idle': 0}
+					 for origin, requests in self._requests.items()}
+		pool = getattr(getattr(self._client, '_transport', None), '_pool', None)
+		for connection in list(getattr(pool, 'connections', None) or []):
+			origin = str(getattr(connection, '_origin', ''))
+			host = stats.setdefault(origin, {'connections': 0, 'requests': 0, 'idle': 0})
+			host['connections'] += 1
+			host['idle'] += bool(connection.is_idle())
+		return stats
+
+
+class InMemoryTransport(Transport):
+	"""
+	Answers requests in-process.
+
+	Args:
+		handler: callable(method, url, body, headers) -> (status, json, headers),
+			defaults to the `handle` of a new `robinhood.simulator.Simulator`
+		responses: {url substring: bytes or json} fixed responses, checked before the handler
+	"""
+
+	def __init__(self, handler=None, responses=None):
+		if handler is None:
+			from .simulator import Simulator
+			handler = Simulator(fill_delay=0).handle
+		self.handler = handler
+		self.responses = responses or {}
+		self.headers = {}
+		self.requests = 0
+		self._lock = threading.Lock()
+
+	def __getstate__(self):
+		state = dict(self.__dict__)
+		del state['_lock']
+		return state
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self._lock = threading.Lock()
+
+	def _request(self, method, url, data=None):
+		with self._lock:
+			self.requests += 1
+		for key, content in self.responses.items():
+			if key in url:
+				if not isinstance(content, bytes):
+					content = codec.dumps(content)
+				return Response(200, content, url)
+
+		status, payload, headers = self.handler(method, url, data, self.headers)
+		return Response(status, codec.dumps(payload), url, headers)
+
+	def get(self, url, timeout=None, **kwargs):
+		return self._request('GET', url)
+
+	def post(self, url, data=None, timeout=None, **kwargs):
+		return self._request('POST', url, data)
+
+	def stats(self):
+		return {'in-memory': {'connections': 0, 'requests': self.requests, 'idle': 0}}
@@ -1,27 +1,73 @@
+"""
+Replays the exchanges recorded in `fixtures/basic.jsonl` (offline, deterministic, well under a second).
+
+    python -m pytest tests/basic_tests.py       (or python -m unittest discover -s tests -p '*tests.py')
+
+The fixture is recorded from a `robinhood.simulator.Simulator`, re-record it after changing the
+requests a test makes:
+
+    python tests/basic_tests.py --record
+
+`fixtures/live.jsonl`, when present, holds the read-only requests of `TestLive` recorded from the live
+api (redacted, no order is placed, the login itself is left out of the fixture). Record it with the
+credentials of an account in the environment (the MFA code is prompted for if the account needs one):
+
+    ROBINHOOD_USERNAME=... ROBINHOOD_PASSWORD=... python tests/basic_tests.py --record-live
+"""
+
+import os
+import sys
+import tempfile
 import unittest
 from unittest import TestCase
 
-from ...robinhood import Trader
-from ...robinhood.robinhood.order import Order, CryptoOrder
-from ...robinhood.robinhood.quote import Quote, CryptoQuote
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from robinhood import Trader
+from robinhood.cassette import Cassette, CassetteMiss
+from robinhood.order import Order, CryptoOrder, OrderCollection
+from robinhood.quote import Quote, CryptoQuote
+
+fixture = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'basic.jsonl')
+live_fixture = os.path.join(os.path.dirname(fixture), 'live.jsonl')
+record = '--record' in sys.argv
+record_live = '--record-live' in sys.argv
 
 
 class TestAll(TestCase):
 
 	# basic tests to ensure the endpoints work
 
-	def __init__(self, *args, **kwargs):
-		self.trader = Trader()
-		self.trader.login()  # will supply console prompt
-		TestCase.__init__(self, *args, **kwargs)
+	@classmethod
+	def setUpClass(cls):
+		if record:
+			from robinhood.simulator import Simulator
+			from robinhood.transport import InMemoryTransport
+			cls.cassette = Cassette(fixture, 'record', InMemoryTransport(Simulator(fill_delay=0).handle))
+		else:
+			cls.cassette = Cassette(fixture)
+		cls.trader = Trader(api_url='http://simulator', transport=cls.cassette)
+		# the currency pairs from the fixture, not from the disk cache of another session
+		cls.trader.crypto.pairs.cache_path = os.path.join(tempfile.mkdtemp(), 'pairs.json')
+		cls.trader.login('user', 'password')
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.cassette.close()
 
 	def test_fundamentals(self):
 		f = self.trader.fundamentals('aapl')
 		assert(isinstance(f, dict))
 
+		df = self.trader.fundamentals_many(['AAPL', 'MSFT', 'BAD1'])
+		assert(list(df.index) == ['AAPL', 'MSFT'])
+		assert(df.attrs['unresolved'] == ['BAD1'])
+		assert(df['market_cap'].dtype == float)
+
 	def test_instrument(self):
 		i = self.trader.instrument('aapl')
 		assert(isinstance(i, dict))
+		self.assertRaises(Exception, self.trader.instrument, 'BAD1')
 
 	def test_quote(self):
 		q = self.trader.quote('aapl')
@@ -31,12 +77,12 @@ class TestAll(TestCase):
 			q.ask,
 			q.bid,
 			q.adjusted_previous_close,
-			q.last_trade_price,
+			q.mark,
 			q.previous_close
 		]
 		assert all([isinstance(value, float) for value in data])
 
-		q = self.trader.quote('btc')
+		q = self.trader.crypto.quote('btc')
 		assert isinstance(q, CryptoQuote)
 		data = [
 			q.ask,
@@ -45,44 +91,104 @@ class TestAll(TestCase):
 		]
 		assert all([isinstance(value, float) for value in data])
 
+		quotes = self.trader.quotes(['AAPL', 'MSFT'])
+		assert [quote.symbol for quote in quotes] == ['AAPL', 'MSFT']
+		# the batch endpoints answer in the order requested, another order is another request
+		self.assertRaises(CassetteMiss, self.trader.quotes, ['MSFT', 'AAPL'])
+
 	def test_orders(self):
 		os = self.trader.orders()
+		assert isinstance(os, OrderCollection)
 		assert all([isinstance(order, Order) for order in os])
 
-		os = self.trader.crypto_orders()
+		os = self.trader.crypto.orders()
 		assert all([isinstance(order, CryptoOrder) for order in os])
 
 	def test_account_data(self):
 		funcs = ['account',
-				'crypto_account',
 				'portfolio',
-				'orders',
-				'crypto_orders',
 				'dividends',
 				'positions']
 
 		for str_func in funcs:
 			function = getattr(self.trader, str_func)
+			assert(function() is not None)
 
-	#  TODO -- add testing for buying or selling
-	#  Maybe only test limit orders to avoid execution?
+		assert(self.trader.crypto.account() is not None)
 
-	def test_historical_data(self):
-		quotes = self.trader.historical_quotes('aapl')
-		assert(len(quotes) > 10)  # length will be in 100s
+	def test_place_and_cancel_order(self):
+		order = self.trader.buy('aapl', 1, price=1.0)
+		assert(isinstance(order, Order))
+		assert(order.is_open())
+		self.trader.cancel(order._dict)
+		assert(order.canceled())
 
-		historical_quote = quotes[0]
-		# test properties
-		high = historical_quote.high
-		low = historical_quote.low
-		close = historical_quote.close
-		open = historical_quote.open
-		time = historical_quote.time
+	def test_historical_data(self):
+		quotes = self.trader.historical_quotes('aapl', 'day', 'month')
+		assert(len(quotes) > 10)  # length will be ~20
 
 		import pandas as pd
-		assert (isinstance(time, pd.Timestamp))
-		assert(low < high)
+		assert(isinstance(quotes.index, pd.DatetimeIndex))
+		assert((quotes['low'] < quotes['high']).all())
+
+
+@unittest.skipUnless(record_live or os.path.exists(live_fixture), "no fixtures/live.jsonl (record it with --record-live)")
+class TestLive(TestCase):
+
+	# the read-only endpoints against the responses of the live api
+
+	@classmethod
+	def setUpClass(cls):
+		if record_live:
+			from robinhood.transport import RequestsTransport
+			cls.trader = Trader(transport=RequestsTransport())
+			if not cls.trader.login(os.environ['ROBINHOOD_USERNAME'], os.environ['ROBINHOOD_PASSWORD']):
+				raise Exception("Login failed")
+			# recorded from here on: the fixture keeps no credentials or login exchange
+			cls.cassette = Cassette(live_fixture, 'record', cls.trader.transport)
+			cls.trader.transport = cls.cassette
+		else:
+			cls.cassette = Cassette(live_fixture)
+			cls.trader = Trader(transport=cls.cassette)
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.cassette.close()
+
+	def test_fundamentals(self):
+		assert(isinstance(self.trader.fundamentals('aapl'), dict))
+		df = self.trader.fundamentals_many(['AAPL', 'MSFT'])
+		assert(list(df.index) == ['AAPL', 'MSFT'])
+
+	def test_instrument(self):
+		i = self.trader.instrument('aapl')
+		assert(i['symbol'] == 'AAPL')
+
+	def test_quote(self):
+		q = self.trader.quote('aapl')
+		assert(isinstance(q, Quote))
+		assert(isinstance(q.mark, float))
+		quotes = self.trader.quotes(['AAPL', 'MSFT'])
+		assert [quote.symbol for quote in quotes] == ['AAPL', 'MSFT']
+
+	def test_orders(self):
+		assert all([isinstance(order, Order) for order in self.trader.orders()])
+
+	def test_account_data(self):
+		for str_func in ['account', 'portfolio', 'dividends', 'positions']:
+			assert(getattr(self.trader, str_func)() is not None)
+
+	def test_historical_data(self):
+		quotes = self.trader.historical_quotes('aapl', 'day', 'month')
+		assert(len(quotes) > 10)
+		assert((quotes['low'] <= quotes['high']).all())
 
 
 if __name__ == '__main__':
+	if record:
+		sys.argv.remove('--record')
+	if record_live:
+		# only the read-only tests reach the live api
+		sys.argv.remove('--record-live')
+		sys.argv.append('TestLive')
 	unittest.main()
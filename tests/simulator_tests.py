@@ -0,0 +1,1286 @@
+"""
+Behavioural tests against a `robinhood.simulator.Simulator` served in memory (offline, no fixture).
+
+    python -m pytest tests/simulator_tests.py
+"""
+
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import TestCase
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import csv
+import json
+import numpy as np
+import pandas as pd
+
+from robinhood import Trader
+from robinhood.crypto_pairs import CurrencyPair, CurrencyPairs
+from robinhood.daemon import Daemon, DaemonClient, DaemonError, _check_owner, _private_directory, _to_json
+from robinhood.detail.common import _parse_iso, iso_to_ns, iso_to_ns_array, ns_to_index, ns_to_timestamp
+from robinhood.execution import ExecutionScheduler
+from robinhood import bench, export
+from robinhood import options
+from robinhood.indicators import IndicatorEngine, _RollingExtreme
+from robinhood.market_calendar import ALWAYS_OPEN, CLOSED, EXTENDED, REGULAR
+from robinhood.order import Order
+from robinhood.pool import TraderPool, _RateBudget
+from robinhood.quote_board import QuotePublisher, QuoteBoard, _checksums
+from robinhood.quote_cache import QuoteCache
+from robinhood.risk import RiskEngine, RiskRejected
+from robinhood.runtime import Runtime, Strategy
+from robinhood.cassette import Cassette
+from robinhood.simulator import Simulator, serve
+from robinhood.transport import Http2Transport, InMemoryTransport, RequestsTransport
+
+
+def _trader(handler=None, **simulator_args):
+	simulator_args.setdefault('fill_delay', 0)
+	trader = Trader(api_url='http://simulator', transport=InMemoryTransport(handler or Simulator(**simulator_args).handle))
+	trader.crypto.pairs.cache_path = os.path.join(tempfile.mkdtemp(), 'pairs.json')
+	trader.login('user', 'password')
+	return trader
+
+
+class TestSimulator(TestCase):
+
+	url = 'http://simulator'
+
+	def place(self, simulator, **body):
+		status, instruments, _ = simulator.handle('GET', f'{self.url}/instruments/?symbol=AAPL')
+		order = dict({'instrument': instruments['results'][0]['url'], 'symbol': 'AAPL', 'quantity': 1,
+					  'side': 'buy', 'type': 'limit', 'price': '1.00'}, **body)
+		status, order, _ = simulator.handle('POST', f'{self.url}/orders/', order)
+		assert(status == 200)
+		return order
+
+	def test_routes(self):
+		simulator = Simulator()
+		assert(simulator.handle('GET', f'{self.url}/accounts/')[0] == 200)
+		assert(simulator.handle('GET', f'{self.url}/accounts')[0] == 200)  # the trailing slash is optional
+		assert(simulator.handle('GET', f'{self.url}//accounts/')[0] == 200)
+		assert(simulator.handle('GET', f'{self.url}/nope/')[0] == 404)
+		assert(simulator.handle('POST', f'{self.url}/accounts/')[0] == 404)  # wrong method
+		assert(simulator.handle('GET', f'{self.url}/orders/nope/')[0] == 404)
+		assert(simulator.handle('POST', f'{self.url}/orders/', {'symbol': 'AAPL'})[0] == 400)
+
+		# api routes need a token once headers are given, login does not
+		assert(simulator.handle('GET', f'{self.url}/accounts/', headers={})[0] == 401)
+		assert(simulator.handle('GET', f'{self.url}/accounts/', headers={'Authorization': 'Bearer nope'})[0] == 401)
+		status, login, _ = simulator.handle('POST', f'{self.url}/oauth2/token/', b'username=user&password=p', {})
+		assert(status == 200)
+		headers = {'Authorization': 'Bearer ' + login['access_token']}
+		assert(simulator.handle('GET', f'{self.url}/accounts/', headers=headers)[0] == 200)
+
+	def test_injected_errors(self):
+		simulator = Simulator(throttle_rate=1.0)
+		status, _, headers = simulator.handle('GET', f'{self.url}/accounts/')
+		assert(status == 429 and headers['Retry-After'] == '1')
+		simulator = Simulator(error_rate=1.0)
+		assert(simulator.handle('GET', f'{self.url}/accounts/')[0] == 500)
+		assert(simulator.requests == 1)
+
+	def test_order_states(self):
+		simulator = Simulator(fill_delay=1.0)
+		order = self.place(simulator, type='market', price=None)
+		assert(order['state'] == 'unconfirmed')
+		limit = self.place(simulator)
+		time.sleep(0.5)
+		assert(simulator.handle('GET', order['url'])[1]['state'] == 'confirmed')
+		time.sleep(0.5)
+		filled = simulator.handle('GET', order['url'])[1]
+		assert(filled['state'] == 'filled')
+		assert(filled['cumulative_quantity'] == filled['quantity'])
+		assert(len(filled['executions']) == 1)
+
+		# a limit buy below the mark stays confirmed until it is canceled, filled orders stay filled
+		assert(simulator.handle('GET', limit['url'])[1]['state'] == 'confirmed')
+		assert(simulator.handle('POST', limit['cancel'])[0] == 200)
+		canceled = simulator.handle('GET', limit['url'])[1]
+		assert(canceled['state'] == 'cancelled' and canceled['cancel'] is None)
+		assert(simulator.handle('POST', order['cancel'])[0] == 200)
+		assert(simulator.handle('GET', order['url'])[1]['state'] == 'filled')
+
+		positions = simulator.handle('GET', f'{self.url}/positions/')[1]['results']
+		assert(float(positions[0]['quantity']) == 11)  # seeded with 10 AAPL
+
+	def test_pagination(self):
+		simulator = Simulator(fill_delay=3600, page_size=2)
+		placed = [self.place(simulator)['id'] for _ in range(5)]
+		ids, url, pages = [], f'{self.url}/orders/', []
+		while url:
+			status, page, _ = simulator.handle('GET', url)
+			pages.append(page)
+			ids.extend(order['id'] for order in page['results'])
+			url = page['next']
+		assert(ids == placed[::-1])  # newest first
+		assert([len(page['results']) for page in pages] == [2, 2, 1])
+		assert(pages[0]['previous'] is None)
+		assert(pages[2]['previous'] == f'{self.url}/orders/?cursor=2')
+		assert(simulator.handle('GET', pages[2]['previous'])[1] == pages[1])
+
+
+class TestTransport(TestCase):
+	"""the contract every transport keeps with the Trader"""
+
+	def contract(self, transport, url):
+		import requests
+		transport.headers = {}
+		login = transport.post(f'{url}/oauth2/token/', data={'username': 'user', 'password': 'password'})
+		assert(login and login.ok and login.status_code == 200)
+		assert(json.loads(login.text) == login.json())
+		token = login.json()['access_token']
+
+		transport.headers = {'Authorization': f'Bearer {token}'}
+		accounts = transport.get(f'{url}/accounts/', timeout=5)
+		assert(accounts and len(accounts.json()['results']) == 1)
+		accounts.raise_for_status()
+
+		missing = transport.get(f'{url}/nope/')
+		assert(not missing and missing.status_code == 404)
+		self.assertRaises(requests.HTTPError, missing.raise_for_status)
+		assert(isinstance(transport.stats(), dict))
+		transport.close()
+
+	def test_in_memory(self):
+		transport = InMemoryTransport(Simulator().handle)
+		self.contract(transport, 'http://simulator')
+		assert(transport.stats() == {'in-memory': {'connections': 0, 'requests': 3, 'idle': 0}})
+
+		transport = InMemoryTransport(responses={'/accounts/': {'results': [{'account_number': '5SIM0000'}]}})
+		assert(transport.get('http://simulator/accounts/?x=1').json()['results'][0]['account_number'] == '5SIM0000')
+
+		def count():
+			for _ in range(1000):
+				transport.get('http://simulator/accounts/')
+		threads = [threading.Thread(target=count) for _ in range(8)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		assert(transport.requests == 8001)
+
+	def test_cassette(self):
+		path = os.path.join(tempfile.mkdtemp(), 'transport.jsonl')
+		with Cassette(path, mode='record', transport=InMemoryTransport(Simulator().handle)) as cassette:
+			self.contract(cassette, 'http://simulator')
+		self.contract(Cassette(path), 'http://simulator')
+
+	def test_http(self):
+		server = serve(Simulator(), port=0, background=True)
+		url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+		try:
+			transport = RequestsTransport()
+			self.contract(transport, url)
+			try:
+				transport = Http2Transport(max_connections=4)
+			except Exception:
+				self.skipTest('httpx with http2 is not installed')
+			self.contract(transport, url)
+			transport.get(f'{url}/accounts/')
+			stats = transport.stats()
+			assert(stats[url]['requests'] == 4)
+			assert(stats[url]['connections'] == 1 and stats[url]['idle'] == 1)
+			assert(pickle.loads(pickle.dumps(transport)).max_connections == 4)
+		finally:
+			server.shutdown()
+
+
+class TestOrders(TestCase):
+
+	def test_numpy_quantity_and_price(self):
+		trader = _trader(fill_delay=3600)
+		order = trader.buy('AAPL', np.int64(2), price=np.float64(10.0))
+		assert(isinstance(order, Order))
+		assert(float(order.quantity) == 2)
+		assert(float(order.price) == 10.0)
+
+	def test_update_crypto_order(self):
+		trader = _trader(fill_delay=3600, page_size=2)
+		order = trader.crypto.buy('BTC', quantity=0.01, price=1.0)
+		for _ in range(3):
+			trader.crypto.buy('BTC', quantity=0.01, price=1.0)
+		order.cancel()
+		assert(order.canceled())  # no longer on the first page of orders
+
+
+
+class TestCancelAll(TestCase):
+
+	def test_open_order_older_than_a_page_of_fills(self):
+		trader = _trader(page_size=5)
+		old = trader.buy('AAPL', 1, price=1.0)  # gtc-like, never marketable
+		for _ in range(12):
+			trader.buy('MSFT', 1)  # market orders, priced at the mark and filled at once
+		assert(trader.order(old._dict)._dict['state'] == 'confirmed')  # order urls end with a slash
+
+		result = trader.cancel_all()
+		assert([order._dict['id'] for order in result['canceled']] == [old._dict['id']])
+		assert(result['closed'] == [] and result['open'] == [])
+		assert(old.canceled())
+
+	def test_filters(self):
+		trader = _trader(fill_delay=3600)
+		aapl_buy = trader.buy('AAPL', 1, price=1.0)
+		aapl_sell = trader.sell('AAPL', 1, price=10000.0)
+		msft_buy = trader.buy('MSFT', 1, price=1.0)
+
+		def ids(result):
+			return sorted(order._dict['id'] for order in result['canceled'])
+
+		assert(ids(trader.cancel_all(older_than=timedelta(hours=1))) == [])
+		assert(ids(trader.cancel_all(older_than=datetime.now(timezone.utc) - timedelta(hours=1))) == [])
+		assert(ids(trader.cancel_all(symbol='AAPL', side='sell')) == [aapl_sell._dict['id']])
+		assert(ids(trader.cancel_all(symbol='AAPL')) == [aapl_buy._dict['id']])
+		assert(ids(trader.cancel_all(older_than=datetime.now(timezone.utc) + timedelta(minutes=1))) ==
+			   [msft_buy._dict['id']])
+
+	def test_filled_in_the_meantime(self):
+		simulator = Simulator(fill_delay=0)
+
+		def fill_instead(method, url, data, headers):
+			if url.endswith('/cancel/'):  # the order fills before the cancel gets there
+				with simulator._lock:
+					for order in simulator._orders:
+						order['price'] = '100000.00'
+				return 400, {'detail': 'Order cannot be cancelled.'}, {}
+			return simulator.handle(method, url, data, headers)
+
+		trader = _trader(fill_instead)
+		order = trader.buy('AAPL', 1, price=1.0)
+		result = trader.cancel_all()
+		assert(result['canceled'] == [] and result['open'] == [])
+		assert([o._dict['id'] for o in result['closed']] == [order._dict['id']])
+		assert(result['closed'][0]._dict['state'] == 'filled')
+
+	def test_crypto(self):
+		trader = _trader(fill_delay=3600)
+		btc = trader.crypto.buy('BTC', quantity=0.01, price=1.0)
+		trader.crypto.buy('ETH', quantity=0.01, price=1.0)
+		result = trader.crypto.cancel_all(symbol='BTC')
+		assert([order._dict['id'] for order in result['canceled']] == [btc._dict['id']])
+
+
+class TestCurrencyPairs(TestCase):
+
+	def test_seed_table(self):
+		simulator = Simulator(fill_delay=0)
+
+		def unavailable(method, url, data, headers):
+			if '/currency_pairs/' in url:
+				return 500, {'detail': 'Server error.'}, {}
+			return simulator.handle(method, url, data, headers)
+
+		trader = _trader(unavailable)
+		pair = trader.crypto.pairs['btc']
+		assert(pair.id == '3d961844-d360-45fc-989b-f6fca761d511')  # the hard-coded table
+		assert(not pair.has_metadata)
+		assert(trader.crypto.pairs['BTC-USD'] is pair and trader.crypto.pairs['BTCUSD'] is pair)
+		assert(trader.crypto.pairs.get('NOPE') is None)
+		self.assertRaises(KeyError, trader.crypto.pairs.__getitem__, 'NOPE')
+
+	def test_disk_cache(self):
+		trader = _trader()
+		path = trader.crypto.pairs.cache_path
+		assert(trader.crypto.pairs['BTC'].has_metadata)
+		with open(path) as file:
+			assert(len(json.load(file)['pairs']) == len(trader.crypto.pairs))
+
+		requests = trader.transport.requests
+		pairs = CurrencyPairs(trader, cache_path=path)
+		assert(pairs['ETH'].has_metadata)
+		assert(trader.transport.requests == requests)  # read from the disk cache
+
+		pairs = CurrencyPairs(trader, ttl=0, cache_path=path)
+		pairs.load()
+		assert(trader.transport.requests == requests + 1)  # expired
+
+		with open(path, 'w') as file:
+			json.dump({'pairs': []}, file)  # no 'time'
+		pairs = CurrencyPairs(trader, cache_path=path)
+		assert(pairs['BTC'].has_metadata)
+		assert(trader.transport.requests == requests + 2)
+
+	def test_rounding(self):
+		pair = CurrencyPair({
+			'id': 'id', 'symbol': 'BTC-USD', 'asset_currency': {'code': 'BTC'}, 'quote_currency': {'code': 'USD'},
+			'min_order_size': '0.000001000000000000', 'max_order_size': '20.0000000000000000',
+			'min_order_price_increment': '0.010000000000000000',
+			'min_order_quantity_increment': '0.000000010000000000'})
+		assert(pair.round_quantity(0.123456789) == '0.12345678')  # rounded down
+		assert(pair.round_quantity('1') == '1.00000000')
+		assert(pair.round_price(6504.905) == '6504.91')
+		assert(pair.round_price('6504.904999') == '6504.90')
+		self.assertRaises(Exception, pair.round_quantity, 0.0000001)
+		self.assertRaises(Exception, pair.round_quantity, 21)
+
+
+class TestPortfolio(TestCase):
+
+	def test_snapshot(self):
+		simulator = Simulator(fill_delay=0, page_size=1)
+		trader = _trader(simulator.handle)
+		trader.buy('MSFT', 2)
+		trader.crypto.buy('BTC', quantity=0.5)
+		with simulator._lock:
+			simulator._holdings['NOPE'] = [1.0, 10.0]  # a delisted coin, without a currency pair
+
+		df = trader.portfolio_snapshot()
+		df = df.set_index('symbol')
+		assert(sorted(df.index) == ['AAPL', 'BTC', 'MSFT', 'NOPE'])  # positions on every page
+		assert(df.loc['MSFT', 'asset_class'] == 'equity' and df.loc['BTC', 'asset_class'] == 'crypto')
+		assert(df.loc['MSFT', 'quantity'] == 2 and df.loc['BTC', 'quantity'] == 0.5)
+		assert(np.isnan(df.loc['NOPE', 'price']))  # unquoted, not an error
+		msft = df.loc['MSFT']
+		assert(abs(msft['market_value'] - msft['quantity'] * msft['price']) < 1e-9)
+		assert(abs(df['weight'].sum() - 1.0) < 1e-9)
+		assert(abs(df.attrs['market_value'] - np.nansum(df['market_value'])) < 1e-6)
+
+		df = trader.portfolio_snapshot(include_crypto=False)
+		assert(set(df['asset_class']) == {'equity'})
+
+
+class TestExport(TestCase):
+
+	@classmethod
+	def setUpClass(cls):
+		cls.simulator = Simulator(fill_delay=0, page_size=3)
+		cls.trader = _trader(cls.simulator.handle)
+		for symbol in ['AAPL', 'MSFT', 'TSLA', 'AAPL', 'MSFT']:
+			cls.trader.buy(symbol, 1)  # filled: one execution row each
+		for _ in range(2):
+			cls.trader.buy('AAPL', 1, price=1.0)  # open: a row without execution
+		cls.directory = tempfile.mkdtemp()
+
+	def test_csv(self):
+		path = os.path.join(self.directory, 'orders.csv')
+		assert(self.trader.export('orders', path) == 7)
+		with open(path, newline='') as file:
+			rows = list(csv.DictReader(file))
+		assert(list(rows[0]) == export.columns('orders'))
+		assert(sorted(row['symbol'] for row in rows) == ['AAPL'] * 4 + ['MSFT'] * 2 + ['TSLA'])
+		assert(sum(1 for row in rows if row['execution_id']) == 5)
+
+	def test_jsonl(self):
+		path = os.path.join(self.directory, 'orders.jsonl')
+		assert(self.trader.export('orders', path) == 7)
+		with open(path) as file:
+			rows = [json.loads(line) for line in file]
+		assert(len(rows) == 7 and set(rows[0]) == set(export.columns('orders')))
+
+		path = os.path.join(self.directory, 'positions.jsonl')
+		assert(self.trader.export('positions', path) == 3)
+
+	@unittest.skipUnless(__import__('importlib').util.find_spec('pyarrow'), 'pyarrow is not installed')
+	def test_parquet(self):
+		import pandas as pd
+		path = os.path.join(self.directory, 'orders.parquet')
+		assert(self.trader.export('orders', path, row_group_size=4) == 7)
+		parts = sorted(name for name in os.listdir(self.directory) if name.endswith('.parquet'))
+		assert(parts == ['orders.00000.parquet', 'orders.00001.parquet'])
+		df = pd.concat(pd.read_parquet(os.path.join(self.directory, part)) for part in parts)
+		assert(len(df) == 7 and list(df.columns) == export.columns('orders'))
+
+	def test_checkpoint_resume(self):
+		requests = []
+
+		def interrupted(method, url, data, headers):
+			if '/orders/' in url and 'cursor=' in url:
+				requests.append(url)
+				if len(requests) == 2:  # the third page
+					raise ConnectionError("Connection reset")
+			return self.simulator.handle(method, url, data, headers)
+
+		trader = _trader(interrupted)
+		path = os.path.join(self.directory, 'resumed.csv')
+		checkpoint = os.path.join(self.directory, 'resumed.checkpoint')
+		self.assertRaises(ConnectionError, export.export, trader, 'orders', path, checkpoint=checkpoint)
+		with open(checkpoint) as file:
+			assert(json.load(file)['rows'] == 6)  # the first two pages were written
+
+		assert(export.export(trader, 'orders', path, checkpoint=checkpoint) == 7)
+		assert(not os.path.exists(checkpoint))
+		with open(path, newline='') as file:
+			rows = list(csv.DictReader(file))
+		reference = os.path.join(self.directory, 'reference.csv')
+		self.trader.export('orders', reference)
+		with open(reference, newline='') as file:
+			assert(rows == list(csv.DictReader(file)))  # no row lost or written twice
+
+	def test_dividends(self):
+		assert(self.trader.dividends()['results'] == [])  # the dividends endpoint, not the orders
+		path = os.path.join(self.directory, 'dividends.csv')
+		assert(self.trader.export('dividends', path) == 0)
+		with open(path, newline='') as file:
+			assert(next(csv.reader(file)) == export.columns('dividends'))
+
+
+class TestBench(TestCase):
+
+	def test_quick(self):
+		directory = tempfile.mkdtemp()
+		old, new = os.path.join(directory, 'old.json'), os.path.join(directory, 'new.json')
+		bench.main(['--quick', '--output', old])
+		with open(old) as file:
+			results = json.load(file)
+		assert(results['quick'])
+		assert(sorted(results['results']) == sorted(bench.benchmarks))
+		assert(results['results']['place_order']['limit']['round_trips_per_order'] >= 1)
+		assert(list(results['results']['historical_quotes']) == ['10'])
+
+		bench.main(['--quick', '--output', new, '--compare', old, 'objects'])
+		with open(new) as file:
+			compared = bench.compare(json.load(file), results)
+		assert(compared and all(key.startswith('objects.') for key in compared))
+
+
+class TestOptions(TestCase):
+
+	def test_black_scholes(self):
+		# Hull, Options Futures and Other Derivatives: S=42, K=40, r=10%, sigma=20%, 6 months
+		greeks = options.black_scholes(42, 40, 0.5, 0.2, [True, False], rate=0.1)
+		assert(np.allclose(greeks['theo'], [4.7594, 0.8086], atol=1e-4))
+
+		greeks = options.black_scholes(100, 100, 1.0, 0.2, [True, False], rate=0.05)
+		assert(np.allclose(greeks['theo'], [10.4506, 5.5735], atol=1e-4))
+		assert(np.allclose(greeks['delta'], [0.6368, -0.3632], atol=1e-4))
+		assert(np.allclose(greeks['gamma'], 0.018762, atol=1e-6))
+		assert(np.allclose(greeks['vega'], 37.524, atol=1e-3))
+		assert(np.allclose(greeks['theta'], [-6.4140, -1.6579], atol=1e-4))
+		assert(np.allclose(greeks['rho'], [53.2325, -41.8905], atol=1e-4))
+
+		# put-call parity with a dividend yield
+		call, put = options.black_scholes(100, 90, 0.25, 0.3, [True, False], rate=0.03, dividend_yield=0.02)['theo']
+		assert(abs(call - put - (100 * np.exp(-0.02 * 0.25) - 90 * np.exp(-0.03 * 0.25))) < 1e-9)
+
+		expired = options.black_scholes(100, [90, 110], [0.0, 1.0], [0.2, np.nan], True)
+		assert(all(np.isnan(value).all() for value in expired.values()))
+
+	def test_option_chain(self):
+		simulator = Simulator(fill_delay=0)
+		market_data_requests = []
+
+		def count(method, url, data, headers):
+			if '/marketdata/options/' in url:
+				market_data_requests.append(url)
+			return simulator.handle(method, url, data, headers)
+
+		trader = _trader(count)
+		batch_size = options.market_data_batch_size
+		options.market_data_batch_size = 10
+		try:
+			chain = trader.option_chain('AAPL')
+			calls = trader.option_chain('AAPL', expirations=chain['expiration_date'].iloc[0].strftime('%Y-%m-%d'),
+										type='call')
+		finally:
+			options.market_data_batch_size = batch_size
+
+		assert(len(market_data_requests) == -(-len(chain) // 10) + -(-len(calls) // 10))
+		assert(chain['id'].is_unique and not chain['mark'].isna().any())
+		assert(set(chain['type']) == {'call', 'put'} and set(calls['type']) == {'call'})
+		assert(calls['expiration_date'].nunique() == 1)
+		assert(chain.equals(chain.sort_values(['expiration_date', 'type', 'strike_price'], ignore_index=True)))
+
+		greeks = options.black_scholes(chain.attrs['underlying_price'], chain['strike_price'], chain['years'],
+									   chain['implied_volatility'], chain['type'] == 'call')
+		for name, values in greeks.items():
+			assert(np.allclose(chain[name], values, equal_nan=True))
+		assert(((chain['delta'] > 0) == (chain['type'] == 'call')).all())
+
+
+class TestIndicators(TestCase):
+
+	@staticmethod
+	def history(rows, seed=0):
+		random = np.random.default_rng(seed)
+		close = 100 + np.cumsum(random.normal(size=rows))
+		high = close + random.uniform(0, 1, rows)
+		low = close - random.uniform(0, 1, rows)
+		index = pd.date_range('2020-01-01 14:30', periods=rows, freq='5min', tz='UTC')  # spans two days
+		return pd.DataFrame({'open': close, 'high': high, 'low': low, 'close': close,
+							 'volume': random.integers(1, 1000, rows).astype(float)}, index=index)
+
+	def test_rolling_extreme(self):
+		random = np.random.default_rng(1)
+		for window in (1, 2, 5, 7):
+			values = random.normal(size=(3, 40))
+			highs, lows = _RollingExtreme(3, window, np.maximum), _RollingExtreme(3, window, np.minimum)
+			for t in range(values.shape[1]):
+				highs.update(np.arange(3), values[:, t])
+				lows.update(np.arange(3), values[:, t])
+				start = max(t + 1 - window, 0)
+				assert(np.array_equal(highs.value, values[:, start:t + 1].max(axis=1)))
+				assert(np.array_equal(lows.value, values[:, start:t + 1].min(axis=1)))
+
+	def test_incremental_matches_batch(self):
+		history = self.history(400)
+		batch = IndicatorEngine(['AAPL'], ema_periods=(9, 21), atr_period=14, range_period=20)
+		batch.init('AAPL', history)
+
+		incremental = IndicatorEngine(['AAPL'], ema_periods=(9, 21), atr_period=14, range_period=20)
+		incremental.init('AAPL', history.iloc[:50])
+		for time, bar in history.iloc[50:].iterrows():
+			incremental.update_bars('AAPL', bar['open'], bar['high'], bar['low'], bar['close'], bar['volume'], time)
+
+		pd.testing.assert_frame_equal(batch.frame(), incremental.frame())
+		last_day = history[history.index.date == history.index[-1].date()]
+		typical = (last_day['high'] + last_day['low'] + last_day['close']) / 3
+		assert(np.isclose(batch.frame()['vwap']['AAPL'], (typical * last_day['volume']).sum() / last_day['volume'].sum()))
+
+	def test_bars_from_quotes(self):
+		history = self.history(30)
+		engine = IndicatorEngine(['AAPL', 'MSFT'], ema_periods=(9,), range_period=5)
+		engine.init('AAPL', history)
+		vwap = engine.frame()['vwap']['AAPL']
+
+		engine.update_quotes(['AAPL', 'MSFT'], [200.0, np.nan])
+		engine.update_quotes(['AAPL', 'MSFT'], [190.0, np.nan])
+		live = engine.frame()
+		assert(live['high_5']['AAPL'] == 200.0 and live['close']['AAPL'] == 190.0)
+		assert(np.isnan(live['close']['MSFT']))
+
+		engine.close_bars(history.index[-1])
+		closed = engine.frame()
+		assert(closed['high_5']['AAPL'] == 200.0 and closed['close']['AAPL'] == 190.0)
+		assert(closed['vwap']['AAPL'] == vwap)  # quotes carry no volume
+
+		engine.update_quotes('AAPL', 210.0, volumes=100.0)
+		engine.close_bars(history.index[-1])
+		assert(engine.frame()['vwap']['AAPL'] != vwap)
+
+
+def _worker_token(trader, item):
+	trader.quote('AAPL')  # syncs the shared token
+	return trader.transport.headers['Authorization'][len('Bearer '):]
+
+
+class TestPool(TestCase):
+
+	def test_pool(self):
+		import multiprocessing
+		server = serve(Simulator(fill_delay=0), port=0, background=True)
+		try:
+			trader = Trader(api_url='http://127.0.0.1:{}'.format(server.server_address[1]))
+			trader.login('user', 'password')
+			with TraderPool(trader, processes=2, requests_per_second=None, refresh_interval=None,
+							mp_context=multiprocessing.get_context('spawn')) as pool:
+				quotes = pool.map('quote', ['AAPL', 'MSFT', 'SPY'])
+				assert([quote.symbol for quote in quotes] == ['AAPL', 'MSFT', 'SPY'])
+				for method in ('buy', 'cancel_all', 'login', 'save_session', 'export', '_req_get', 'nope'):
+					self.assertRaises(Exception, pool.submit, method, 'AAPL', 1)
+
+				token = trader.auth_token
+				assert(set(pool.apply(_worker_token, range(4))) == {token})
+				pool.refresh()  # the workers pick up the new token before their next request
+				assert(trader.auth_token != token)
+				assert(pool.map('quote', ['AAPL'])[0].symbol == 'AAPL')
+				assert(set(pool.apply(_worker_token, range(4))) == {trader.auth_token})
+		finally:
+			server.shutdown()
+
+	def test_rate_budget(self):
+		import multiprocessing
+		budget = _RateBudget(multiprocessing.get_context(), rate=50, burst=5)
+		start = time.monotonic()
+		for _ in range(15):
+			budget.acquire()
+		assert(0.15 < time.monotonic() - start < 1.0)  # 5 at once, then 10 at 50 per second
+
+	def test_save_session(self):
+		directory = tempfile.mkdtemp()
+		path = os.path.join(directory, 'session')
+		trader = Trader()
+		trader.auth_token = 'token'
+		trader.save_session(path)
+		assert(Trader.load_session(path).auth_token == 'token')
+
+		trader.auth_token = 'other'
+		trader.unpicklable = threading.Lock()
+		self.assertRaises(TypeError, trader.save_session, path)
+		assert(Trader.load_session(path).auth_token == 'token')  # the previous session is intact
+		assert(os.listdir(directory) == ['session'])  # no temporary file left behind
+
+
+class TestHistory(TestCase):
+
+	def test_split(self):
+		trader = Trader()
+		start = datetime(2020, 1, 1)  # the trader splits naive utc times
+		assert(trader._history_split('5minute', None, None) == [(None, None)])
+		assert(trader._history_split('5minute', start, start + timedelta(days=7)) == [(start, start + timedelta(days=7))])
+		assert(trader._history_split('week', start, start + timedelta(days=5000)) == [(start, start + timedelta(days=5000))])
+
+		windows = trader._history_split('5minute', start, start + timedelta(days=17))
+		assert(windows == [(start, start + timedelta(days=7)), (start + timedelta(days=7), start + timedelta(days=14)),
+						   (start + timedelta(days=14), start + timedelta(days=17))])
+		# up to now without a stop
+		now = datetime.now(timezone.utc).replace(tzinfo=None)
+		windows = trader._history_split('15second', now - timedelta(days=2, hours=1), None)
+		assert(len(windows) == 3 and windows[-1][1] >= now)
+
+	def test_stitching(self):
+		from urllib.parse import parse_qsl, urlencode, urlsplit
+		simulator = Simulator(fill_delay=0)
+		start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+		stop = start + timedelta(days=200)  # three 90 day windows of hourly bars
+		gap = (datetime(2020, 4, 15, 12, tzinfo=timezone.utc), datetime(2020, 4, 15, 15, tzinfo=timezone.utc))
+
+		def handler(method, url, data, headers):
+			parts = urlsplit(url)
+			if '/marketdata/historicals/' not in parts.path:
+				return simulator.handle(method, url, data, headers)
+			query = dict(parse_qsl(parts.query))
+			window_start = pd.Timestamp(query['start'])
+			if window_start >= start + timedelta(days=180):
+				return 200, {'historicals': []}, {}  # a window without bars
+			# every window also returns the first bar of the next one
+			query['stop'] = (pd.Timestamp(query['stop']) + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M:%SZ')
+			status, json, response_headers = simulator.handle(method, parts._replace(query=urlencode(query)).geturl(),
+															  data, headers)
+			json['historicals'] = [bar for bar in json['historicals']
+								   if not gap[0] < pd.Timestamp(bar['begins_at']) < gap[1]]
+			return status, json, response_headers
+
+		trader = _trader(handler)
+		df = trader.historical_quotes('AAPL', interval='hour', start=start, stop=stop, bounds='24_7')
+		assert(df.index.is_unique and df.index.is_monotonic_increasing)
+		assert(df.index[0] == pd.Timestamp(start) and df.index[-1] == pd.Timestamp(start + timedelta(days=180)))
+		assert(len(df) == 180 * 24 + 1 - 2)
+		assert(df.attrs['gaps'] == [(pd.Timestamp(gap[0]), pd.Timestamp(gap[1]))])
+		assert(df.attrs['empty_windows'] == [(datetime(2020, 6, 29), datetime(2020, 7, 19))])
+
+		# without `bounds='24_7'` only gaps within a day count, overnight is not missing
+		df = trader.historical_quotes('AAPL', interval='hour', start=start, stop=stop)
+		assert(df.attrs['gaps'] == [(pd.Timestamp(gap[0]), pd.Timestamp(gap[1]))])
+
+
+class TestTime(TestCase):
+
+	def test_iso_to_ns(self):
+		second = 1577836800 * 10 ** 9  # 2020-01-01T00:00:00Z
+		assert(iso_to_ns('2020-01-01T00:00:00Z') == second)
+		assert(iso_to_ns('2020-01-01T00:00:00+00:00') == second)
+		assert(iso_to_ns('2020-01-01T00:00:00') == second)  # naive is utc
+		assert(iso_to_ns('2019-12-31T19:00:00-05:00') == second)
+		assert(iso_to_ns('2020-01-01T00:00:00.123456Z') == second + 123456000)
+		assert(iso_to_ns('2020-01-01T00:00:00.123456789Z') == second + 123456000)  # dateutil, microseconds
+		assert(iso_to_ns('') is None and iso_to_ns(None) is None)
+
+		assert(_parse_iso('2020-01-01T00:00:00Z') == datetime(2020, 1, 1, tzinfo=timezone.utc))
+		assert(_parse_iso('2020-01-01').tzinfo is None)
+
+	def test_iso_to_ns_array(self):
+		from unittest import mock
+		uniform = ['2020-01-01T00:00:00Z', '2020-01-01T00:05:00.500000Z']
+		mixed = ['2020-01-01T00:00:00Z', '2020-01-01T00:00:00.25-04:00', '2020-06-01T12:00:00+02:00']
+		for values in (uniform, mixed, []):
+			expected = np.array([iso_to_ns(v) for v in values], dtype='int64')
+			assert(np.array_equal(iso_to_ns_array(values), expected))
+			assert(iso_to_ns_array(values).dtype == np.int64)
+			with mock.patch.object(pd, '__version__', '1.5.3'):  # the per value fallback
+				assert(np.array_equal(iso_to_ns_array(values), expected))
+
+		nat = np.iinfo(np.int64).min
+		assert(iso_to_ns_array(['2020-01-01T00:00:00-04:00', None])[1] == nat)
+		with mock.patch.object(pd, '__version__', '1.5.3'):
+			assert(iso_to_ns_array(['2020-01-01T00:00:00-04:00', None])[1] == nat)
+
+	def test_ns_to_timestamp(self):
+		ns = iso_to_ns('2020-01-01T00:00:00.000001Z')
+		assert(ns_to_timestamp(ns, tz='UTC') == pd.Timestamp('2020-01-01T00:00:00.000001', tz='UTC'))
+		assert(str(ns_to_timestamp(ns, tz='America/New_York')) == '2019-12-31 19:00:00.000001-05:00')
+		local = ns_to_timestamp(ns)
+		assert(local.tzinfo is None)
+		assert(local == pd.Timestamp(datetime.fromtimestamp(ns / 1e9)))  # local, like pd.Timestamp.now()
+
+		index = ns_to_index([ns, ns + 1000])
+		assert(str(index.tz) == 'UTC' and index[1] - index[0] == pd.Timedelta(microseconds=1))
+
+
+class TestReference(TestCase):
+
+	def test_fundamentals_many_by_symbol(self):
+		simulator = Simulator(fill_delay=0)
+
+		def reversed_fundamentals(method, url, data, headers):
+			status, payload, response_headers = simulator.handle(method, url, data, headers)
+			if '/fundamentals/' in url and 'results' in payload:
+				payload['results'] = payload['results'][::-1]
+			return status, payload, response_headers
+
+		trader = _trader(reversed_fundamentals)
+		df = trader.fundamentals_many(['MSFT', 'BAD1', 'AAPL'])
+		assert(sorted(df.index) == ['AAPL', 'MSFT'])
+		assert(df.attrs['unresolved'] == ['BAD1'])
+		assert(df.loc['AAPL', 'market_cap'] == float(trader.fundamentals('AAPL')['market_cap']))
+
+	def test_fundamentals_many_by_instrument(self):
+		simulator = Simulator(fill_delay=0)
+
+		def without_symbols(method, url, data, headers):
+			status, payload, response_headers = simulator.handle(method, url, data, headers)
+			if '/fundamentals/' in url and 'results' in payload:
+				payload['results'] = [{k: v for k, v in row.items() if k != 'symbol'} if row else row
+									  for row in payload['results'][::-1]]
+			return status, payload, response_headers
+
+		trader = _trader(without_symbols)
+		trader._instrument_id('MSFT')  # cached, the others are resolved by a quote request
+		df = trader.fundamentals_many(['MSFT', 'BAD1', 'AAPL', 'TSLA'])
+		assert(sorted(df.index) == ['AAPL', 'MSFT', 'TSLA'])
+		assert(df.attrs['unresolved'] == ['BAD1'])
+		for symbol in df.index:
+			assert(df.loc[symbol, 'instrument_id'] == trader.instrument(symbol)['id'])
+			assert(df.loc[symbol, 'market_cap'] == float(simulator._fundamentals_json('http://simulator', symbol)['market_cap']))
+
+
+class TestExecution(TestCase):
+
+	def test_failed_cancel_is_retried(self):
+		trader = _trader(fill_delay=3600)
+		scheduler = ExecutionScheduler(trader)
+		parent = scheduler.iceberg('AAPL', 'buy', 10, display=2, limit=1.0)
+		scheduler.run_once()
+		assert(len(parent.children) == 1)
+
+		scheduler.cancel(parent)
+		cancel = trader.cancel
+
+		def failing(order):
+			trader.cancel = cancel
+			raise Exception("Connection reset")
+
+		trader.cancel = failing
+		scheduler.run_once()
+		assert(len(parent.errors) == 1 and len(parent.children) == 1)
+		scheduler.run_once()  # canceled
+		scheduler.run_once()  # refreshed
+		assert(not parent.children)
+
+	def test_errors_are_capped(self):
+		trader = _trader(fill_delay=3600)
+		scheduler = ExecutionScheduler(trader)
+		parent = scheduler.iceberg('AAPL', 'buy', 10, display=2, limit=1.0)
+		for i in range(parent.max_errors + 5):
+			parent.error(Exception(f'error {i}'))
+		assert(len(parent.errors) == parent.max_errors and parent.error_count == parent.max_errors + 5)
+		progress = parent.progress()
+		assert(progress['errors'] == parent.max_errors + 5)
+		assert(progress['last_error'] == repr(Exception(f'error {parent.max_errors + 4}')))
+
+
+class _Closed:
+	"""A market calendar outside of the sessions"""
+
+	def delay(self, interval):
+		return 3600.0
+
+	def session(self, now=None):
+		return CLOSED
+
+
+class TestRuntime(TestCase):
+
+	def test_on_start_runs_on_the_loop_thread(self):
+		trader = _trader()
+		runtime = Runtime(trader, quote_interval=0.01)
+
+		class Starting(Strategy):
+			crypto_symbols = ['BTC']
+
+			def __init__(self):
+				self.threads = []
+
+			def on_start(self):
+				self.threads.append(threading.current_thread())
+
+		before = runtime.add(Starting())
+		runtime.start()
+		try:
+			after = runtime.add(Starting())
+			deadline = time.monotonic() + 5
+			while not (before.threads and after.threads) and time.monotonic() < deadline:
+				time.sleep(0.01)
+			assert(before.threads == [runtime._thread] and after.threads == [runtime._thread])
+		finally:
+			runtime.stop()
+
+	def test_bars_do_not_wake_a_closed_market(self):
+		trader = _trader()
+		trader._calendar = _Closed()
+		runtime = Runtime(trader, quote_interval=0.01)
+
+		class Bars(Strategy):
+			symbols = ['AAPL']
+			bar_seconds = 1
+
+		runtime.add(Bars())
+		assert(runtime._quote_delay() == 3600.0)  # not the next bar boundary, a second away at most
+		trader._calendar = ALWAYS_OPEN
+		assert(runtime._quote_delay() <= 0.01)
+
+	def test_strategy_added_while_idle(self):
+		trader = _trader()
+		trader._calendar = _Closed()
+		runtime = Runtime(trader, quote_interval=0.01).start()
+		try:
+			time.sleep(0.05)  # idle until the market opens
+
+			class Crypto(Strategy):
+				crypto_symbols = ['BTC']
+
+				def __init__(self):
+					self.quotes = []
+
+				def on_quote(self, event):
+					self.quotes.append(event)
+
+			strategy = runtime.add(Crypto())
+			deadline = time.monotonic() + 5
+			while len(strategy.quotes) < 2 and time.monotonic() < deadline:
+				time.sleep(0.01)
+			assert(len(strategy.quotes) >= 2)
+		finally:
+			runtime.stop()
+
+
+class TestQuoteBoard(TestCase):
+
+	def test_torn_rows_are_retried(self):
+		trader = _trader()
+		with QuotePublisher(trader, ['AAPL', 'MSFT'], name=f'robinhood_test_{os.getpid()}') as publisher, \
+				QuoteBoard(publisher.name) as board:
+			publisher.publish()
+			layout = publisher._layout
+
+			def torn(row, read):
+				"""What a reader sees of stores out of order: a new mark, but the bid, sequence and checksum of the old row"""
+				bid, mark = layout.values[row, 0] + 1.0, layout.values[row, 2] + 1.0
+				layout.values[row, 2] = mark
+
+				def complete():
+					time.sleep(0.05)
+					layout.values[row, 0] = bid
+					layout.check[row:row + 1] = _checksums(layout.values[row:row + 1], layout.times[row:row + 1])
+
+				thread = threading.Thread(target=complete)
+				thread.start()
+				quote = read()  # only once the row is complete
+				assert(quote.bid == bid and quote.mark == mark)
+				thread.join()
+
+			torn(0, lambda: board.quote('AAPL'))
+			torn(1, lambda: board.quotes(['AAPL', 'MSFT'])[1])
+
+	def test_row_left_mid_write(self):
+		trader = _trader()
+		with QuotePublisher(trader, ['AAPL', 'MSFT'], name=f'robinhood_test_{os.getpid()}') as publisher, \
+				QuoteBoard(publisher.name, timeout=0.05) as board:
+			publisher.publish()
+			publisher._layout.seq[1] += 1  # the publisher died while writing the row of MSFT
+			assert(board.quote('AAPL').symbol == 'AAPL')
+			self.assertRaises(Exception, board.quote, 'MSFT')
+			self.assertRaises(Exception, board.quotes, ['AAPL', 'MSFT'])
+			self.assertRaises(Exception, board.snapshot)
+			publisher._layout.seq[1] += 1
+			assert(board.quote('MSFT').symbol == 'MSFT')
+
+	def test_readers_in_other_processes(self):
+		import subprocess
+		script = os.path.join(tempfile.mkdtemp(), 'board.py')
+		with open(script, 'w') as file:
+			file.write('''
+import multiprocessing, os, subprocess, sys
+sys.path.insert(0, sys.argv[1])
+from robinhood import Trader
+from robinhood.transport import InMemoryTransport
+from robinhood.quote_board import QuotePublisher, QuoteBoard
+
+def read(name):
+	with QuoteBoard(name) as board:
+		assert board.quote('AAPL').symbol == 'AAPL'
+
+if __name__ == '__main__':
+	trader = Trader(api_url='http://simulator', transport=InMemoryTransport())
+	trader.login('user', 'password')
+	with QuotePublisher(trader, ['AAPL'], name=f'robinhood_test_{os.getpid()}') as publisher:
+		publisher.publish()
+		# children share the publisher's resource tracker
+		for method in ('fork', 'spawn'):
+			process = multiprocessing.get_context(method).Process(target=read, args=(publisher.name,))
+			process.start()
+			process.join()
+			assert process.exitcode == 0
+		# an unrelated process has a tracker of its own, its exit must not remove the board
+		# (attaching here would register the board with the publisher's tracker again)
+		for _ in range(2):
+			subprocess.run([sys.executable, '-c', f'import sys; sys.path.insert(0, {sys.argv[1]!r}); '
+							f'from robinhood.quote_board import QuoteBoard; QuoteBoard({publisher.name!r}).quote("AAPL")'],
+						   check=True)
+''')
+		root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+		result = subprocess.run([sys.executable, script, root], capture_output=True, text=True, timeout=60)
+		assert(result.returncode == 0), result.stderr
+		assert('KeyError' not in result.stderr and 'leaked' not in result.stderr), result.stderr
+
+
+class TestLatency(TestCase):
+
+	def test_pickle(self):
+		pickle.dumps(Trader())
+
+		trader = _trader(fill_delay=3600)
+		order = trader.buy('AAPL', 1, price=1.0)
+		trader.transport = RequestsTransport()  # the in-memory simulator is not picklable
+		loaded = pickle.loads(pickle.dumps(trader))
+		assert(len(loaded.latency) == 1)
+		loaded.latency.record(loaded.latency.traces[0])  # recorded once
+		assert(len(loaded.latency) == 1)
+		assert(len(loaded.latency.to_frame()) == 1)
+		assert(loaded.latency.traces[0].order_id == order._dict['id'])
+
+	def test_session_round_trip(self):
+		simulator = Simulator(fill_delay=0)
+		trader = _trader(simulator.handle)
+		for _ in range(3):
+			trader.buy('AAPL', 1)
+		frame = trader.latency.to_frame()
+		trader.transport = RequestsTransport()
+		path = os.path.join(tempfile.mkdtemp(), 'session')
+		trader.save_session(path)
+
+		loaded = Trader.load_session(path)
+		pd.testing.assert_frame_equal(loaded.latency.to_frame(), frame)
+		loaded.transport = InMemoryTransport(simulator.handle)
+		loaded.transport.headers = {'Authorization': 'Bearer ' + loaded.auth_token}
+		loaded.buy('AAPL', 1)  # keeps recording after the load
+		assert(len(loaded.latency) == 4)
+		for trace in list(loaded.latency.traces):
+			loaded.latency.record(trace)
+		assert(len(loaded.latency) == 4)
+
+
+def _utc(*args):
+	return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+class TestMarketCalendar(TestCase):
+	# the simulator's New York hours, in January (UTC-5): extended 14:00-23:00Z, regular 14:30-21:00Z
+
+	def test_sessions(self):
+		trader = _trader()
+		calendar = trader.calendar
+		friday = (2020, 1, 3)
+		assert(calendar.hours('2020-01-03') == (_utc(*friday, 14), _utc(*friday, 14, 30), _utc(*friday, 21),
+												 _utc(*friday, 23)))
+		assert(calendar.hours('2020-01-04') is None)
+		requests = trader.transport.requests
+		calendar.hours('2020-01-03')
+		assert(trader.transport.requests == requests)  # cached
+
+		for at, session in [((13, 59), CLOSED), ((14, 0), EXTENDED), ((14, 29, 59), EXTENDED), ((14, 30), REGULAR),
+							((20, 59, 59), REGULAR), ((21, 0), EXTENDED), ((22, 59, 59), EXTENDED), ((23, 0), CLOSED)]:
+			assert(calendar.session(_utc(*friday, *at)) == session)
+		assert(calendar.session(_utc(2020, 1, 4, 15)) == CLOSED)  # saturday
+		assert(calendar.is_open(now=_utc(*friday, 15)) and not calendar.is_open(now=_utc(*friday, 22)))
+		assert(calendar.is_open(extended=True, now=_utc(*friday, 22)))
+
+		assert(calendar.next_boundary(_utc(*friday, 14, 10)) == _utc(*friday, 14, 30))
+		assert(calendar.next_boundary(_utc(*friday, 23, 30)) == _utc(2020, 1, 6, 14))  # over the weekend
+		assert(calendar.next_open(now=_utc(*friday, 22)) == _utc(*friday, 22))
+		assert(calendar.next_open(extended=False, now=_utc(*friday, 15)) == _utc(*friday, 15))
+		assert(calendar.next_open(extended=False, now=_utc(*friday, 22)) == _utc(2020, 1, 6, 14, 30))
+		assert(calendar.next_open(now=_utc(2020, 1, 4, 12)) == _utc(2020, 1, 6, 14))
+
+		calendar.trader = Trader()  # the in-memory simulator is not picklable
+		loaded = pickle.loads(pickle.dumps(calendar))
+		assert(loaded._hours == calendar._hours)
+		assert(loaded.session(_utc(*friday, 15)) == REGULAR)  # from the hours loaded
+
+	def test_delay(self):
+		calendar = _trader().calendar
+		friday = (2020, 1, 3)
+		assert(calendar.delay(5, now=_utc(*friday, 15)) == 5)
+		assert(calendar.delay(5, now=_utc(*friday, 20, 59, 58)) == 2)   # cut short at the close
+		assert(calendar.delay(5, now=_utc(*friday, 14, 10)) == 50)      # extended hours, slowed down
+		assert(calendar.delay(5, now=_utc(*friday, 14, 29, 30)) == 30)  # up to the open
+		assert(calendar.delay(5, now=_utc(2020, 1, 4, 12)) == _utc(2020, 1, 6, 14) - _utc(2020, 1, 4, 12))
+
+		stop = threading.Event()
+		stop.set()
+		start = time.monotonic()
+		assert(calendar.sleep(3600, stop) is True)  # returns as soon as stopped, whatever the session
+		assert(time.monotonic() - start < 1)
+
+		def unreachable(*args, **kwargs):
+			raise ConnectionError()
+		calendar._hours.clear()
+		calendar.trader._req_get = unreachable
+		assert(calendar.delay(5, now=_utc(2020, 1, 4, 12)) == 5)  # without the hours, polls as usual
+
+	def test_always_open(self):
+		trader = _trader()
+		assert(trader.crypto.calendar is ALWAYS_OPEN)
+		assert(ALWAYS_OPEN.session() == REGULAR and ALWAYS_OPEN.is_open())
+		assert(ALWAYS_OPEN.next_boundary() is None and ALWAYS_OPEN.next_open(now=1.0) == 1.0)
+		assert(ALWAYS_OPEN.delay(5) == 5)
+		assert(ALWAYS_OPEN.sleep(0.01) is False)
+		stop = threading.Event()
+		stop.set()
+		assert(ALWAYS_OPEN.sleep(3600, stop) is True)
+
+
+class TestDaemon(TestCase):
+
+	def test_round_trip(self):
+		import socket
+		trader = _trader(fill_delay=3600)
+		path = os.path.join(tempfile.mkdtemp(), 'robinhood.sock')
+		daemon = Daemon(trader, path, refresh_interval=None, warm=False).serve(background=True)
+		try:
+			assert(os.stat(path).st_mode & 0o777 == 0o600)
+			with DaemonClient(path) as client:
+				assert(client.ping() == 'pong')
+				assert(client.quote('AAPL')['symbol'] == 'AAPL')
+				assert([quote['symbol'] for quote in client.quotes(['AAPL', 'MSFT'])] == ['AAPL', 'MSFT'])
+				assert(client.quote('BTC', crypto=True)['symbol'] == 'BTCUSD')
+
+				order = client.buy('AAPL', 1, price=1.0)
+				assert(client.order(order['id'])['state'] in ('unconfirmed', 'confirmed'))
+				assert([o['id'] for o in client.orders(open=True)] == [order['id']])
+				assert(client.cancel(order['id'])['state'] == 'cancelled')
+				other = client.buy('MSFT', 1, price=1.0)
+				assert([o['id'] for o in client.cancel_all()['canceled']] == [other['id']])
+
+				frame = client.history('AAPL', 'day', 'month', frame=True)
+				assert(len(frame) and frame.index.tz is not None and 'close' in frame.columns)
+
+				with self.assertRaises(DaemonError) as raised:
+					client.call('nope')
+				assert(raised.exception.type == 'Exception')
+
+				# concurrent threads share the connection
+				results = []
+				threads = [threading.Thread(target=lambda: results.append(client.ping())) for _ in range(8)]
+				for thread in threads:
+					thread.start()
+				for thread in threads:
+					thread.join()
+				assert(results == ['pong'] * 8)
+
+				with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as raw:
+					raw.connect(path)
+					raw.sendall(b'{not json\n')
+					assert(json.loads(raw.makefile('rb').readline())['type'] == 'ValueError')
+
+				stats = client.stats()
+				assert(stats['requests'] == daemon.requests and stats['errors'] == 1)
+		finally:
+			daemon.stop()
+		assert(not os.path.exists(path))
+
+	def test_permissions(self):
+		directory = tempfile.mkdtemp()
+		os.chmod(directory, 0o777)
+		self.assertRaises(Exception, _private_directory, os.path.join(directory, 'robinhood.sock'))
+		os.chmod(directory, 0o700)
+		_private_directory(os.path.join(directory, 'robinhood.sock'))
+		_private_directory(os.path.join(directory, 'new', 'robinhood.sock'))  # created 0700
+		assert(os.stat(os.path.join(directory, 'new')).st_mode & 0o777 == 0o700)
+
+		path = os.path.join(directory, 'robinhood.sock')
+		open(path, 'w').close()
+		_check_owner(path)
+		if os.getuid() == 0:  # only root can hand a file to another user
+			os.chown(path, 12345, -1)
+			self.assertRaises(Exception, _check_owner, path)
+			self.assertRaises(Exception, DaemonClient(path).ping)
+
+	def test_to_json(self):
+		trader = _trader(fill_delay=3600)
+		quote = trader.quote('AAPL')
+		order = trader.buy('AAPL', 1, price=1.0)
+		json_quote = _to_json(quote)
+		assert(json_quote['symbol'] == 'AAPL' and json_quote['time_ns'] == quote.time_ns)
+		assert(_to_json(order)['id'] == order._dict['id'])
+		assert(_to_json(trader.orders())[0]['id'] == order._dict['id'])
+		assert(_to_json({'a': (np.int64(1), np.float64(0.5), None, True)}) == {'a': [1, 0.5, None, True]})
+		assert(_to_json(datetime(2020, 1, 1)) == '2020-01-01 00:00:00')
+
+		df = pd.DataFrame({'close': [1.0, np.nan]}, index=pd.DatetimeIndex(['2020-01-01', '2020-01-02'], tz='UTC'))
+		assert(_to_json(df) == {'index': [1577836800 * 10 ** 9, 1577923200 * 10 ** 9], 'columns': ['close'],
+								'data': [[1.0], [None]]})
+		json.dumps(_to_json(trader.historical_quotes('AAPL', 'day', 'month')))
+
+
+class TestConnectionWarmer(TestCase):
+
+	def wait_for(self, condition, timeout=5):
+		deadline = time.monotonic() + timeout
+		while not condition() and time.monotonic() < deadline:
+			time.sleep(0.01)
+		assert(condition())
+
+	def test_connections_are_kept(self):
+		server = serve(Simulator(), port=0, background=True)
+		try:
+			trader = Trader(api_url='http://127.0.0.1:{}'.format(server.server_address[1]))
+			trader.login('user', 'password')
+			warmer = trader.warm_connections(interval=0.05, connections=2)
+			host = list(trader.connection_stats())[0]
+			# the stocks and crypto urls are served by the same host here, 2 requests at once each
+			# (a request that finishes before another starts hands its connection on, hence at most 4)
+			assert(1 <= trader.connection_stats()[host]['connections'] <= 4)
+			self.wait_for(lambda: warmer.rounds >= 4)
+			stats = warmer.stats()['hosts'][host]
+			assert(stats['connections'] <= 4 and stats['idle'] == stats['connections'])
+			assert(stats['requests'] >= 16)  # reused, no new connection per round
+			assert(pickle.loads(pickle.dumps(trader))._warmer is None)
+			trader.warm_connections(interval=None)
+			assert(trader._warmer is None and not warmer._thread.is_alive())
+		finally:
+			server.shutdown()
+
+	def test_rewarm_after_a_failure(self):
+		simulator = Simulator(fill_delay=0)
+		failing = threading.Event()
+
+		def handler(method, url, data, headers):
+			if failing.is_set():
+				raise ConnectionError('connection reset')
+			return simulator.handle(method, url, data, headers)
+
+		trader = _trader(handler)
+		warmer = trader.warm_connections(interval=3600, connections=2)
+		assert(warmer.rounds == 1 and warmer.errors == 0)
+
+		failing.set()
+		self.assertRaises(ConnectionError, trader.quote, 'AAPL')  # re-warms at once, not after an hour
+		self.wait_for(lambda: warmer.errors == 4)
+		assert(warmer.rewarms == 1)
+		failing.clear()
+		self.wait_for(lambda: warmer.rounds == 3)  # the failed round is retried a second later
+		assert(warmer.errors == 4)
+		trader.warm_connections(interval=None)
+
+
+class TestRisk(TestCase):
+
+	def test_pickle(self):
+		trader = Trader()
+		trader.risk = RiskEngine(trader, max_order_value=1000)
+		loaded = pickle.loads(pickle.dumps(trader))
+		assert(loaded.risk.max_order_value == 1000)
+		assert(loaded.risk.trader is loaded)
+
+	def test_limits(self):
+		trader = _trader(fill_delay=3600)
+		trader.risk = RiskEngine(trader, max_order_value=1000)
+		self.assertRaises(RiskRejected, trader.buy, 'AAPL', 20, price=100.0)
+		self.assertRaises(RiskRejected, trader.sell, 'AAPL', 11, price=100.0)  # 10 held
+		order = trader.buy('AAPL', 5, price=100.0)
+		assert(trader.risk.reserved_cash == 500.0)
+		trader.cancel(order._dict)
+		trader.order(order._dict)
+		assert(trader.risk.reserved_cash == 0.0)
+
+	def test_positions_on_every_page(self):
+		trader = _trader(page_size=1)
+		for symbol in ['AAPL', 'MSFT', 'TSLA']:
+			trader.buy(symbol, 2)
+		risk = RiskEngine(trader)
+		risk.sync()
+		assert(len(risk.positions) == 3)
+		for symbol in ['AAPL', 'MSFT', 'TSLA']:
+			risk.release(risk.check(trader.instrument(symbol)['url'], 'sell', 2, 100.0))
+
+	def test_checks_reserve(self):
+		trader = _trader(fill_delay=3600)
+		risk = RiskEngine(trader, buying_power_buffer=100000 - 1500)
+		instrument = trader.instrument('AAPL')['url']
+		key = risk.check(instrument, 'buy', 10, 100.0)
+		# a concurrent order cannot spend the same buying power
+		self.assertRaises(RiskRejected, risk.check, instrument, 'buy', 10, 100.0)
+		risk.release(key)
+		risk.check(instrument, 'buy', 10, 100.0)
+
+	def test_background_resync(self):
+		simulator = Simulator(fill_delay=3600)
+		trader, other = _trader(simulator.handle), _trader(simulator.handle)
+		risk = RiskEngine(trader, resync_interval=0.1)
+		instrument = trader.instrument('AAPL')['url']
+		risk.release(risk.check(instrument, 'buy', 1, 100.0))
+		requests = trader.transport.requests
+		for _ in range(10):
+			risk.release(risk.check(instrument, 'buy', 1, 100.0))  # no requests in the order path
+		assert(trader.transport.requests == requests)
+
+		other.buy('AAPL', 3, price=1.0)  # placed elsewhere, only seen by a resync
+		deadline = time.monotonic() + 5
+		while risk.exposure(instrument) != 13 and time.monotonic() < deadline:
+			time.sleep(0.02)
+		assert(risk.exposure(instrument) == 13)
+		risk.close()
+		trader.transport = RequestsTransport()  # the in-memory simulator is not picklable
+		assert(pickle.loads(pickle.dumps(risk)).exposure(instrument) == 13)
+
+
+class TestQuoteCache(TestCase):
+
+	def test_single_flight(self):
+		release = threading.Event()
+		fetched = []
+
+		def fetch(key):
+			fetched.append(key)
+			release.wait()
+			return key.lower()
+
+		cache = QuoteCache(fetch)
+		results = []
+		threads = [threading.Thread(target=lambda: results.append(cache.get('AAPL'))) for _ in range(8)]
+		for thread in threads:
+			thread.start()
+		deadline = time.monotonic() + 5
+		while cache.misses + cache.coalesced < 8 and time.monotonic() < deadline:
+			time.sleep(0.001)
+		release.set()
+		for thread in threads:
+			thread.join()
+		assert(fetched == ['AAPL'])
+		assert(results == ['aapl'] * 8)
+		assert(cache.stats()['coalesced'] == 7)
+
+	def test_max_age(self):
+		trader = _trader()
+		requests = trader.transport.requests
+		quote = trader.quote('AAPL', max_age=60)
+		assert(trader.quote('aapl', max_age=60) is quote)
+		assert(trader.transport.requests == requests + 1)
+		assert(trader.quote('AAPL') is not quote)  # no max_age: always a request
+		assert(trader.quote('AAPL', max_age=0.0) is not quote)
+		assert(trader.transport.requests == requests + 3)
+		assert(trader.quote_stats()['hits'] == 1)
+
+	def test_lru_eviction(self):
+		cache = QuoteCache(lambda key: key.lower(), max_size=2)
+		cache.get('A')
+		cache.get('B')
+		cache.get('A', max_age=60)  # A is now the most recent
+		cache.get('C')
+		cache.get('A', max_age=60)
+		assert(cache.hits == 2)
+		cache.get('B', max_age=60)  # evicted
+		assert(cache.misses == 4)
+		assert(cache.stats()['size'] == 2)
+
+
+if __name__ == '__main__':
+	unittest.main()